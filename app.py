@@ -8,11 +8,18 @@ from flask_jwt_extended import JWTManager
 
 # Local imports
 from init import db
+from blocklist import blocklist
+from metrics import init_metrics
+from routing import init_routing, replica_binds
+from db_pool import engine_options, init_db_pool, time_pool_checkouts
 from controllers.comp_contr import company_blp
 from controllers.proj_contr import project_blp
 from controllers.test_contr import test_blp
 from controllers.user_contr import user_blp
 from controllers.cli_contr import db_commands
+from controllers.metrics_contr import metrics_blp
+from controllers.search_contr import search_blp
+from controllers.job_contr import job_blp
 
 
 def create_app():
@@ -54,17 +61,65 @@ def create_app():
 
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False    # Deprecated
+    # Optional read replicas (comma separated URIs): GET requests read from
+    #   them, writes and reads right after a write use the primary (routing.py)
+    app.config["SQLALCHEMY_BINDS"] = replica_binds(os.getenv("DATABASE_REPLICA_URIS"))
+    # Seconds a client keeps reading from the primary after it writes
+    app.config["REPLICA_STICKY_SECONDS"] = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+    # Connection pool size, overflow, timeout, recycle and pre-ping from the
+    #   DATABASE_POOL_* variables, SQLAlchemy's defaults if unset (db_pool.py)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(os.environ)
+    # Statements running longer than this are cancelled, 0 for no limit
+    app.config["DATABASE_STATEMENT_TIMEOUT_MS"] = int(os.getenv("DATABASE_STATEMENT_TIMEOUT_MS", 0))
+    # Request and connection pool metrics, served at /metrics (metrics.py).
+    #   With them, the engines' pool classes time the connection checkouts
+    app.config["METRICS_ENABLED"] = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    time_pool_checkouts(app)
 
 
     # ------------- Initialized Flask SQLAlchemy extension ------------------ #
     # Take flask app as argument & connect it to SQLAlchemy
     db.init_app(app)
+    init_routing(app)
     api = Api(app)
 
 
+    # ------------------ Request Metrics Configuration ---------------------- #
+    # Server-Timing response headers and the /metrics histograms (metrics.py)
+    init_metrics(app)
+    # Connection pool metrics, and the statement timeout of the engines
+    init_db_pool(app)
+
+
+    # ------------------ Password Hashing Configuration --------------------- #
+    # pbkdf2 hashes are computed in a pool of worker processes (see hashing.py).
+    #   PASSWORD_HASH_WORKERS=0 hashes on the request thread instead. Changing
+    #   PASSWORD_HASH_ROUNDS rehashes existing passwords as users log in.
+
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS",
+                                                        os.cpu_count() or 1))
+    hash_rounds = os.getenv("PASSWORD_HASH_ROUNDS")
+    app.config["PASSWORD_HASH_ROUNDS"] = int(hash_rounds) if hash_rounds else None
+
+
+    # --------------------- Background Jobs Configuration ------------------- #
+    # Long running deletes run in worker threads (see jobs.py). JOB_WORKERS=0
+    #   runs them on the request thread instead. A running job that hasn't
+    #   saved progress for JOB_LEASE_SECONDS can be resumed by another worker.
+
+    app.config["JOB_WORKERS"] = int(os.getenv("JOB_WORKERS", 1))
+    app.config["JOB_BATCH_SIZE"] = int(os.getenv("JOB_BATCH_SIZE", 1000))
+    app.config["JOB_LEASE_SECONDS"] = int(os.getenv("JOB_LEASE_SECONDS", 300))
+
+
     # --------------------------- JWT CONFIGURATION ------------------------- #
 
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
+    # How often each process reloads revoked tokens from the database
+    app.config["JWT_BLOCKLIST_SYNC_SECONDS"] = int(os.getenv("JWT_BLOCKLIST_SYNC_SECONDS", 10))
+    # Size and time to live (seconds) of the current user lookup cache
+    app.config["USER_CACHE_SIZE"] = int(os.getenv("USER_CACHE_SIZE", 1024))
+    app.config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", 60))
     jwt = JWTManager(app)
 
 
@@ -119,6 +174,66 @@ def create_app():
         )
 
 
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        """If Token is revoked:
+
+        Callback function that checks if a JWT token is in the blocklist.
+        The check runs against the in-process copy of the blocklist, so it
+        doesn't query the database on every request.
+
+        Args:
+            jwt_header: The header of the JWT.
+            jwt_payload: The payload of the JWT.
+
+        Returns:
+            bool: True if the token has been revoked.
+        """
+        return blocklist.is_revoked(jwt_payload["jti"])
+
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        """If Token is revoked:
+
+        Callback function that is called when a revoked JWT token is used.
+
+        Args:
+            jwt_header: The header of the JWT.
+            jwt_payload: The payload of the JWT.
+
+        Returns:
+            A tuple containing a JSON response and a status code.
+        """
+        return (
+            jsonify({"description": "The token has been revoked.",
+                     "error": "token_revoked"}),
+            401,
+        )
+
+
+    @jwt.user_lookup_error_loader
+    def user_lookup_error_callback(jwt_header, jwt_payload):
+        """If User is not found:
+
+        Callback function that is called when the token's user no longer
+        exists. The user is only looked up by the views that need it (see
+        user_cache.current_cached_user), not on every @jwt_required() route.
+
+        Args:
+            jwt_header: The header of the JWT.
+            jwt_payload: The payload of the JWT.
+
+        Returns:
+            A tuple containing a JSON response and a status code.
+        """
+        return (
+            jsonify({"description": "The user of this token no longer exists.",
+                     "error": "user_not_found"}),
+            401,
+        )
+
+
     @jwt.unauthorized_loader
     def missing_token_callback(error):
         """If Token is missing:
@@ -172,6 +287,9 @@ def create_app():
     api.register_blueprint(project_blp)
     api.register_blueprint(test_blp)
     api.register_blueprint(db_commands)  # Shows as 'db' in Swagger-UI
+    api.register_blueprint(metrics_blp)
+    api.register_blueprint(search_blp)
+    api.register_blueprint(job_blp)
 
 
     return app
\ No newline at end of file
@@ -0,0 +1,116 @@
+# ASGI entry point: async read endpoints in front of the Flask app
+
+# Library and package imports
+import json
+import logging
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import HTTPException, InternalServerError
+from werkzeug.sansio.request import Request
+
+# Local imports
+from app import create_app
+from async_db import AsyncDatabase
+from routing import STICKY_COOKIE
+from controllers.async_contr import ASYNC_ROUTES
+
+logger = logging.getLogger(__name__)
+
+
+def _request(scope):
+    """Build a (sans-IO) werkzeug Request from an ASGI HTTP scope."""
+    headers = Headers([(name.decode("latin-1"), value.decode("latin-1"))
+                       for name, value in scope["headers"]])
+    client = scope.get("client")
+    return Request(scope["method"], scope.get("scheme", "http"), scope.get("server"),
+                   scope.get("root_path", ""), scope["path"], scope.get("query_string", b""),
+                   headers, client[0] if client else None)
+
+
+def _error_payload(error):
+    """The JSON body of an HTTP error, as flask-smorest's error handler builds it."""
+    payload = {"code": error.code, "status": error.name}
+    data = getattr(error, "data", None) or {}
+    if "message" in data:
+        payload["message"] = data["message"]
+    if "errors" in data:
+        payload["errors"] = data["errors"]
+    return payload
+
+
+async def _send(send, method, status, data, headers):
+    body = b""
+    response_headers = [(name.lower().encode("latin-1"), str(value).encode("latin-1"))
+                        for name, value in headers.items()]
+    if status != 304:
+        # Compact JSON with a trailing newline, like Flask's JSON responses
+        body = (json.dumps(data, separators=(",", ":")) + "\n").encode()
+        response_headers += [(b"content-type", b"application/json"),
+                             (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": b"" if method == "HEAD" else body})
+
+
+def _match(path):
+    for pattern, view in ASYNC_ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            return view, [int(value) for value in match.groups()]
+    return None, None
+
+
+def create_asgi_app():
+    """ASGI App Factory Function:
+
+    Creates the Flask application (see app.create_app) and wraps it in an
+    ASGI application. GET and HEAD requests to the company, project and
+    test read endpoints are served by the async views of
+    controllers/async_contr.py through SQLAlchemy's asyncio engine
+    (aiosqlite for SQLite, asyncpg for PostgreSQL); every other request is
+    passed to the Flask app, which runs in a thread pool.
+
+    Run it with an ASGI server, e.g.:
+        uvicorn --factory asgi:create_asgi_app
+
+    Returns:
+        app: The ASGI application.
+    """
+    flask_app = create_app()
+    database = AsyncDatabase(flask_app)
+    wsgi_app = WsgiToAsgi(flask_app)
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await database.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await lifespan(receive, send)
+            return
+
+        view, args = (None, None)
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            view, args = _match(scope["path"])
+        if view is None:
+            await wsgi_app(scope, receive, send)
+            return
+
+        request = _request(scope)
+        try:
+            async with database.session(request.cookies.get(STICKY_COOKIE)) as session:
+                data, status, headers = await view(request, session, *args)
+        except HTTPException as error:
+            data, status, headers = _error_payload(error), error.code, {}
+        except Exception:
+            logger.exception("Exception on %s %s", scope["method"], scope["path"])
+            error = InternalServerError()
+            data, status, headers = _error_payload(error), error.code, {}
+        await _send(send, scope["method"], status, data, headers)
+
+    return app
@@ -0,0 +1,89 @@
+# Async engines and sessions of the ASGI read endpoints (see asgi.py)
+
+# Library and Package imports
+import itertools
+import time
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+# Local imports
+from init import db
+from db_pool import instrument_engine, set_statement_timeout, timed_pool_options
+from routing import REPLICA_BIND_PREFIX, is_sticky
+
+# The async endpoints use the same databases as the Flask app, through the
+# asyncio driver of each dialect: aiosqlite for local SQLite files and
+# asyncpg for PostgreSQL. Requests are routed like routing.py does: to a
+# replica, unless the client wrote in the last REPLICA_STICKY_SECONDS.
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_url(url):
+    """Return the URL of the async driver for a database URL:
+
+    Args:
+        url (URL): The SQLAlchemy URL of a (sync) engine.
+
+    Returns:
+        URL: The same database with the async driver.
+
+    Raises:
+        ValueError: If the database has no supported async driver.
+    """
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend} databases.")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+class AsyncDatabase:
+    """Async engines of the primary and replica databases of a Flask app:
+
+    Each engine has the app's pool settings and statement timeout, and its
+    pool metrics are labelled 'async_primary', 'async_replica_0', ...
+    """
+    def __init__(self, app):
+        # Without the sync engines' pool class, async drivers need their own
+        options = {name: value for name, value
+                   in (app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {}).items()
+                   if name != "poolclass"}
+        metrics_enabled = app.config.get("METRICS_ENABLED", True)
+        timeout_ms = app.config.get("DATABASE_STATEMENT_TIMEOUT_MS", 0)
+
+        self.engines = {}
+        with app.app_context():
+            # The app's engines have the resolved URLs (e.g. relative SQLite paths)
+            for key, engine in db.engines.items():
+                url, label = async_url(engine.url), f"async_{key or 'primary'}"
+                if metrics_enabled:
+                    async_engine = create_async_engine(
+                        url, **options, **timed_pool_options(url, label))
+                    instrument_engine(async_engine.sync_engine, label)
+                else:
+                    async_engine = create_async_engine(url, **options)
+                if timeout_ms:
+                    set_statement_timeout(async_engine.sync_engine, timeout_ms)
+                self.engines[key] = async_engine
+
+        self.replicas = [self.engines[key] for key in sorted(
+            key for key in self.engines if key and key.startswith(REPLICA_BIND_PREFIX))]
+        self._next_replica = itertools.count()
+        self._sessionmaker = async_sessionmaker(expire_on_commit=False)
+
+    def session(self, sticky_cookie=None):
+        """Open a session on a replica, or on the primary for a client that just wrote:
+
+        Args:
+            sticky_cookie (str): The client's STICKY_COOKIE value, if any.
+
+        Returns:
+            AsyncSession: A new session, to use as an async context manager.
+        """
+        engine = self.engines[None]
+        if self.replicas and not is_sticky(sticky_cookie, time.time()):
+            engine = self.replicas[next(self._next_replica) % len(self.replicas)]
+        return self._sessionmaker(bind=engine)
+
+    async def dispose(self):
+        """Close the connections of every engine."""
+        for engine in self.engines.values():
+            await engine.dispose()
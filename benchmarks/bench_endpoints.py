@@ -0,0 +1,243 @@
+"""Endpoint benchmark suite:
+
+Creates the app against a local SQLite database seeded with
+'flask db seed --scale' data and calls every blueprint route through the
+Flask test client. For each endpoint it reports p50/p95/p99 latency,
+throughput and the number of SQL statements per request, and saves the
+results as JSON.
+
+Given a baseline results file, it exits with status 1 if any endpoint got
+slower than the baseline by more than the threshold percentage.
+
+Usage:
+    python benchmarks/bench_endpoints.py --output results.json
+    python benchmarks/bench_endpoints.py --baseline results.json --threshold 20
+"""
+
+# Library and Package imports
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Local imports
+from app import create_app
+from init import db
+from seeding import seed_scale
+from hashing import shutdown_pool
+from jobs import shutdown_jobs
+
+
+# Password of every seeded user (see seeding.py)
+PASSWORD = "123456"
+
+
+def _admin_headers(state):
+    return {"Authorization": f"Bearer {state['admin_token']}"}
+
+
+def _project(i):
+    return {"name": f"Bench project {i}", "budget": 1000.0, "client": "Benchmark",
+            "description": f"Benchmark project {i}", "company_id": 1}
+
+
+# Benchmark cases, run in this order: (name, method, path, json body, headers)
+#   path, body and headers are functions of (iteration, state). 'state' holds
+#   the seeded row counts and the tokens. Rows created by earlier cases get
+#   the IDs after the seeded ones, which is how the delete cases find them.
+CASES = [
+    ("POST /login", "POST", lambda i, s: "/login",
+     lambda i, s: {"username": "user1", "email": "user1@email.com.au", "password": PASSWORD},
+     None),
+    ("POST /refresh", "POST", lambda i, s: "/refresh", None,
+     lambda i, s: {"Authorization": f"Bearer {s['refresh_token']}"}),
+    ("POST /register", "POST", lambda i, s: "/register",
+     lambda i, s: {"username": f"bench{i}", "email": f"bench{i}@email.com", "password": PASSWORD},
+     None),
+    ("GET /user/<id>", "GET", lambda i, s: f"/user/{i % s['users'] + 1}", None, None),
+    ("GET /company", "GET", lambda i, s: "/company", None, None),
+    ("GET /company/<id>", "GET", lambda i, s: f"/company/{i % s['companies'] + 1}", None, None),
+    ("POST /company", "POST", lambda i, s: "/company",
+     lambda i, s: {"name": f"Bench company {i}", "registration_number": f"BENCH{i}",
+                   "industry_sector": "Benchmarking", "services": "Load testing"},
+     None),
+    ("GET /company/export", "GET", lambda i, s: "/company/export", None, None),
+    ("GET /company/stats", "GET", lambda i, s: "/company/stats", None, None),
+    ("GET /company/<id>/stats", "GET",
+     lambda i, s: f"/company/{i % s['companies'] + 1}/stats", None, None),
+    ("GET /search", "GET", lambda i, s: "/search?q=retaining wall", None, None),
+    ("GET /company/<id>/test", "GET",
+     lambda i, s: f"/company/{i % s['companies'] + 1}/test", None, None),
+    ("POST /company/<id>/test", "POST", lambda i, s: "/company/1/test",
+     lambda i, s: {"name": f"Bench test {i}", "test_type": "Benchmark"}, None),
+    ("GET /test/<id>", "GET", lambda i, s: f"/test/{i % s['tests'] + 1}", None, None),
+    ("GET /test/export", "GET", lambda i, s: "/test/export", None, None),
+    ("GET /project", "GET", lambda i, s: "/project", None, None),
+    ("GET /project/<id>", "GET", lambda i, s: f"/project/{i % s['projects'] + 1}", None, None),
+    ("POST /project", "POST", lambda i, s: "/project", lambda i, s: _project(i), None),
+    ("POST /project/bulk", "POST", lambda i, s: "/project/bulk",
+     lambda i, s: [_project(f"{i}-{n}") for n in range(50)], None),
+    ("PUT /project/<id>", "PUT", lambda i, s: f"/project/{i % s['projects'] + 1}",
+     lambda i, s: {"name": f"Updated project {i}", "budget": 2000.0 + i,
+                   "description": "Updated by benchmark"},
+     None),
+    ("GET /project/export", "GET", lambda i, s: "/project/export", None, None),
+    ("POST /project/<id>/test/<id>", "POST",
+     lambda i, s: f"/project/{s['projects'] - i}/test/{s['tests'] - i}", None, None),
+    ("DELETE /project/<id>/test/<id>", "DELETE",
+     lambda i, s: f"/project/{s['projects'] - i}/test/{s['tests'] - i}", None,
+     lambda i, s: _admin_headers(s)),
+    ("PUT /project/<id>/tests", "PUT", lambda i, s: f"/project/{i % s['projects'] + 1}/tests",
+     lambda i, s: {"test_ids": [i % s["tests"] + 1, (i + 1) % s["tests"] + 1]}, None),
+    ("DELETE /project/<id>", "DELETE", lambda i, s: f"/project/{s['projects'] - i}", None,
+     lambda i, s: _admin_headers(s)),
+    ("DELETE /test/<id>", "DELETE", lambda i, s: f"/test/{s['tests'] + i + 1}", None,
+     lambda i, s: _admin_headers(s)),
+    ("DELETE /company/<id>", "DELETE", lambda i, s: f"/company/{s['companies'] + i + 1}", None,
+     lambda i, s: _admin_headers(s)),
+    ("DELETE /user/<id>", "DELETE", lambda i, s: f"/user/{s['users'] + i + 1}", None,
+     lambda i, s: _admin_headers(s)),
+    ("POST /logout", "POST", lambda i, s: "/logout", None,
+     lambda i, s: {"Authorization": f"Bearer {s['logout_tokens'][i]}"}),
+]
+
+# Endpoints that stream whole tables run fewer iterations
+EXPORT_ITERATIONS = 5
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_suite(scale, iterations, seed):
+    """Seed a temporary database, run every case and return the results."""
+    db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.environ["DATABASE_URI"] = f"sqlite:///{db_file}"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-benchmark-secret")
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    os.environ.setdefault("JOB_WORKERS", "0")   # Time the whole company delete
+
+    app = create_app()
+    client = app.test_client()
+    statements = [0]
+
+    with app.app_context():
+        db.create_all()
+        counts = seed_scale(scale, seed=seed)
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda *args: statements.__setitem__(0, statements[0] + 1))
+
+    state = {"companies": counts["companies"], "projects": counts["projects"],
+             "tests": counts["tests"], "users": counts["users"]}
+    tokens = client.post("/login", json={"username": "user1", "email": "user1@email.com.au",
+                                         "password": PASSWORD}).json
+    state["admin_token"] = tokens["access_token"]
+    state["refresh_token"] = tokens["refresh_token"]
+    state["logout_tokens"] = [client.post("/refresh", headers={
+        "Authorization": f"Bearer {state['refresh_token']}"}).json["access_token"]
+        for _ in range(iterations)]
+
+    results = {}
+    for name, method, path, body, headers in CASES:
+        runs = EXPORT_ITERATIONS if name.endswith("/export") else iterations
+        latencies = []
+        errors = 0
+        statements[0] = 0
+
+        started = time.perf_counter()
+        for i in range(runs):
+            start = time.perf_counter()
+            response = client.open(path(i, state), method=method,
+                                   json=body(i, state) if body else None,
+                                   headers=headers(i, state) if headers else None)
+            response.get_data()
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        results[name] = {
+            "iterations": runs,
+            "errors": errors,
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "throughput_rps": round(runs / elapsed, 1),
+            "sql_statements": round(statements[0] / runs, 1),
+        }
+
+    shutdown_pool()
+    shutdown_jobs()
+    os.remove(db_file)
+    return results
+
+
+def compare(results, baseline, threshold, metric):
+    """Return the endpoints that got slower than the baseline by more than threshold %."""
+    regressions = []
+    for name, base in baseline["endpoints"].items():
+        current = results.get(name)
+        if current is None or not base[metric]:
+            continue
+        change = (current[metric] - base[metric]) / base[metric] * 100
+        if change > threshold:
+            regressions.append((name, base[metric], current[metric], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=200,
+                        help="Number of seeded companies (default 200)")
+    parser.add_argument("--iterations", type=int, default=100,
+                        help="Requests per endpoint (default 100)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this results JSON file")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="Allowed slowdown against the baseline in %% (default 20)")
+    parser.add_argument("--metric", default="p50_ms",
+                        choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    args = parser.parse_args()
+
+    results = run_suite(args.scale, args.iterations, args.seed)
+
+    print(f"{'endpoint':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'req/s':>9}{'SQL':>6}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<34}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['throughput_rps']:>9.1f}{r['sql_statements']:>6.1f}{r['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": {"created": datetime.now(timezone.utc).isoformat(),
+                                "python": platform.python_version(),
+                                "scale": args.scale, "iterations": args.iterations,
+                                "seed": args.seed},
+                       "endpoints": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.metric)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {args.metric} {before:.2f} -> {after:.2f} (+{change:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No endpoint slower than the baseline by more than {args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Login throughput benchmark:
+
+Runs concurrent POST /login requests against a local SQLite database, with
+the password hashing worker pool and with hashing on the request thread,
+and reports logins per second and the latency of GET /company requests
+made at the same time.
+
+Usage:
+    python benchmarks/bench_login.py [--logins 200] [--threads 8]
+"""
+
+# Library and Package imports
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Local imports
+from app import create_app
+from init import db
+from hashing import shutdown_pool
+
+
+def run(workers, logins, threads):
+    """Run one benchmark round and return (logins/sec, p50 GET ms, p95 GET ms)."""
+    db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.environ["DATABASE_URI"] = f"sqlite:///{db_file}"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-benchmark-secret")
+    os.environ["PASSWORD_HASH_WORKERS"] = str(workers)
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post("/register", json={"username": "bench", "email": "bench@email.com",
+                                   "password": "123456"})
+
+    per_thread = logins // threads
+    done = threading.Event()
+    get_latencies = []
+
+    def login_worker():
+        c = app.test_client()
+        for _ in range(per_thread):
+            response = c.post("/login", json={"username": "bench", "email": "bench@email.com",
+                                              "password": "123456"})
+            assert response.status_code == 200, response.json
+
+    def get_worker():
+        c = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            c.get("/company")
+            get_latencies.append((time.perf_counter() - start) * 1000)
+
+    login_threads = [threading.Thread(target=login_worker) for _ in range(threads)]
+    reader = threading.Thread(target=get_worker)
+
+    start = time.perf_counter()
+    reader.start()
+    for thread in login_threads:
+        thread.start()
+    for thread in login_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    reader.join()
+
+    shutdown_pool()
+    os.remove(db_file)
+
+    quantiles = statistics.quantiles(get_latencies, n=20) if len(get_latencies) > 1 else [0] * 19
+    return per_thread * threads / elapsed, quantiles[9], quantiles[18]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{'mode':<20}{'logins/s':>10}{'GET p50 ms':>12}{'GET p95 ms':>12}")
+    for label, workers in (("inline", 0), (f"pool ({args.workers})", args.workers)):
+        rate, p50, p95 = run(workers, args.logins, args.threads)
+        print(f"{label:<20}{rate:>10.1f}{p50:>12.2f}{p95:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
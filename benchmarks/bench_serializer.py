@@ -0,0 +1,101 @@
+"""Compiled serializer benchmark:
+
+Checks that the compiled serializers (serializers.py) return exactly the
+same data as marshmallow for every schema in schemas.py, then times
+ProjectSchema, PlainCompanySchema and PlainTestSchema dumps of 10k rows
+with marshmallow and with the compiled serializer.
+
+No database is needed, the rows are built in memory.
+
+Usage:
+    python benchmarks/bench_serializer.py [--rows 10000]
+"""
+
+# Library and Package imports
+import argparse
+import os
+import sys
+import time
+from marshmallow import Schema
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Local imports
+import schemas
+from models import CompanyModel, ProjectModel, TestModel, UserModel
+
+
+def build_rows(count):
+    """Build 'count' projects with their company and two tests each."""
+    companies = [CompanyModel(id=n, name=f"Company {n}", registration_number=f"REG{n}",
+                              industry_sector="Geotechnical Engineering",
+                              services="Soil Testing") for n in range(1, 101)]
+    tests = [TestModel(id=n, name=f"Test {n}", description=None if n % 3 else f"Test {n}",
+                       test_type="Geotechnical", test_method="AS1289.6.3.1",
+                       company=companies[n % 100]) for n in range(1, 201)]
+    projects = [ProjectModel(id=n, name=f"Project {n}", budget=1000 + n * 1.5,
+                             description=f"Project {n}" if n % 2 else None,
+                             client="Brisbane City Council", company=companies[n % 100],
+                             tests=[tests[n % 200], tests[(n + 7) % 200]])
+                for n in range(1, count + 1)]
+    users = [UserModel(id=n, username=f"user{n}", email=f"user{n}@email.com.au",
+                       password="hash", is_admin=n % 2 == 0, company=companies[n % 100])
+             for n in range(1, 51)]
+    return companies, tests, projects, users
+
+
+def check_equivalence(companies, tests, projects, users):
+    """Assert compiled and marshmallow output are equal for every schema."""
+    samples = {
+        schemas.PlainProjectSchema: projects, schemas.ProjectSchema: projects,
+        schemas.PlainCompanySchema: companies, schemas.CompanySchema: companies,
+        schemas.PlainTestSchema: tests, schemas.TestSchema: tests,
+        schemas.UserSchema: users, schemas.ProjectUpdateSchema: projects,
+        schemas.TestAndProjectSchema: [{"message": "Linked", "project": projects[0],
+                                        "test": tests[0]}],
+        schemas.BulkProjectResultSchema: [
+            {"index": 0, "status": "created", "project": {"id": 1, "name": "P", "budget": 1.0,
+                                                          "client": "C", "description": None}},
+            {"index": 1, "status": "error", "message": "Company does not exist."}],
+    }
+    for schema_cls, rows in samples.items():
+        schema = schema_cls()
+        expected = Schema.dump(schema, rows, many=True)
+        assert schema.dump(rows, many=True) == expected, schema_cls.__name__
+        assert schema.dump(rows[0]) == Schema.dump(schema, rows[0]), schema_cls.__name__
+        status = "compiled" if schema.__dict__.get("_compiled_dump") else "marshmallow"
+        print(f"  {schema_cls.__name__:<26} identical output ({status})")
+
+
+def time_dump(dump, rows, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dump(rows)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    companies, tests, projects, users = build_rows(args.rows)
+    print("Equivalence:")
+    check_equivalence(companies, tests, projects, users)
+
+    many_companies = (companies * (args.rows // len(companies) + 1))[:args.rows]
+    many_tests = (tests * (args.rows // len(tests) + 1))[:args.rows]
+    print(f"\n{'schema (many=True)':<28}{'marshmallow ms':>16}{'compiled ms':>13}{'speedup':>9}")
+    for schema_cls, rows in ((schemas.ProjectSchema, projects),
+                             (schemas.PlainCompanySchema, many_companies),
+                             (schemas.PlainTestSchema, many_tests)):
+        schema = schema_cls(many=True)
+        before = time_dump(lambda r: Schema.dump(schema, r), rows)
+        after = time_dump(schema.dump, rows)
+        print(f"{schema_cls.__name__:<28}{before:>16.1f}{after:>13.1f}{before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# JWT revocation blocklist
+
+# Library and Package imports
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import delete, select
+
+# Local imports
+from init import db
+from models.token_blocklist import TokenBlocklistModel
+from routing import use_primary
+
+# Seconds before the newest row seen that each sync reads again. A row's
+#   created_at is set when it is inserted, but transactions can commit in a
+#   different order, so a row may show up after a newer one has already been
+#   loaded. No revoking transaction takes anywhere near this long.
+SYNC_OVERLAP_SECONDS = 60
+
+def _utc_from_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
+class TokenBlocklist:
+    """Blocklist of revoked JWTs:
+
+    Revoked tokens are stored in the token_blocklist table so every process
+    (and restarts) see them. Checking a token on every @jwt_required() call
+    against the table would cost a query per request, so each process keeps
+    the revoked JTIs in a dict and checks against that in O(1).
+
+    The dict is refreshed from the table at most once every
+    JWT_BLOCKLIST_SYNC_SECONDS, loading only the rows created since the
+    newest one seen (less SYNC_OVERLAP_SECONDS, in case one of them
+    committed late). Tokens revoked in this process are added straight
+    away; tokens revoked in another process are picked up at the next sync.
+
+    Entries are kept until the token they block would have expired anyway,
+    then they are dropped from the dict and the table.
+    """
+    def __init__(self):
+        self._entries = {}      # jti -> expiry timestamp
+        self._last_created = None
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+
+    def _is_stale(self):
+        return time.monotonic() - self._last_sync >= current_app.config.get(
+            "JWT_BLOCKLIST_SYNC_SECONDS", 10)
+
+    def is_revoked(self, jti):
+        """Return True if the token with the given JTI has been revoked."""
+        if self._is_stale():
+            with self._lock:
+                # Another thread may have synced while this one waited
+                if self._is_stale():
+                    self._sync()
+        return jti in self._entries
+
+    def revoke(self, jti, expires):
+        """Revoke a token:
+
+        Args:
+            jti (str): The token's unique identifier ('jti' claim).
+            expires (int): The token's expiry timestamp ('exp' claim).
+        """
+        entry = TokenBlocklistModel(jti=jti, expires_at=_utc_from_timestamp(expires))
+        db.session.add(entry)
+        db.session.commit()
+        # Under the lock, as sync() iterates over the entries
+        with self._lock:
+            self._entries[jti] = expires
+
+    def sync(self):
+        """Load new revocations from the table and drop expired entries."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        # Called with the lock held
+        with use_primary():
+            now = time.time()
+            query = select(TokenBlocklistModel.jti, TokenBlocklistModel.expires_at,
+                           TokenBlocklistModel.created_at)
+            if self._last_created is not None:
+                query = query.where(TokenBlocklistModel.created_at
+                                    > self._last_created - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+            # Read from the primary: a lagging replica would let revoked
+            #   tokens through, and the rows it's missing would be skipped
+            for jti, expires_at, created_at in db.session.execute(query):
+                self._entries[jti] = expires_at.replace(tzinfo=timezone.utc).timestamp()
+                if self._last_created is None or created_at > self._last_created:
+                    self._last_created = created_at
+
+            expired = [jti for jti, expires in self._entries.items() if expires <= now]
+            if expired:
+                for jti in expired:
+                    del self._entries[jti]
+                db.session.execute(delete(TokenBlocklistModel).where(
+                    TokenBlocklistModel.expires_at <= _utc_from_timestamp(now)))
+                db.session.commit()
+
+            self._last_sync = time.monotonic()
+
+
+# Blocklist shared by the whole process
+blocklist = TokenBlocklist()
@@ -0,0 +1,142 @@
+# Library and package imports
+import binascii
+import re
+from flask_smorest import abort
+from marshmallow import EXCLUDE, ValidationError
+from sqlalchemy import select
+
+
+# Local imports
+from models import CompanyModel, ProjectModel, TestModel
+from schemas import (CompanySchema, ProjectSchema, TestSchema, PageArgsSchema,
+                     FieldsArgsSchema, CompanyFilterArgsSchema, ProjectFilterArgsSchema,
+                     TestFilterArgsSchema)
+from pagination import keyset_query, page_rows, next_page_headers
+from filtering import apply_filters, sort_column
+from sparse import sparse_schema, sparse_load
+from etags import resource_etag, etag_headers
+
+
+# Async versions of the GET endpoints of companies, projects and tests,
+# served by the ASGI app (asgi.py) in front of the Flask app. They take the
+# same query arguments and return the same JSON, headers and ETags as the
+# views of comp_contr, proj_contr and test_contr, but run their SQL through
+# an AsyncSession, so a worker serves other requests while it waits on the
+# database. Each view returns (data, status, headers) like a flask-smorest
+# view, and errors are raised with flask-smorest's abort().
+
+# Full response schemas, used when there are no 'fields'/'expand' arguments
+_SCHEMAS = {ProjectSchema: ProjectSchema(), CompanySchema: CompanySchema(),
+            TestSchema: TestSchema()}
+
+_ARG_SCHEMAS = {}
+
+
+def _parse_args(request, schema_cls):
+    """Load query arguments like @blp.arguments(schema_cls, location="query")."""
+    schema = _ARG_SCHEMAS.get(schema_cls)
+    if schema is None:
+        schema = _ARG_SCHEMAS[schema_cls] = schema_cls()
+    try:
+        return schema.load(request.args.to_dict(), unknown=EXCLUDE)
+    except ValidationError as error:
+        abort(422, errors={"query": error.messages})
+
+
+async def _get_page(request, session, query, model, schema_cls, page_args, filter_args,
+                    field_args):
+    schema = sparse_schema(schema_cls, field_args)
+    sort, descending = sort_column(model, filter_args["sort"])
+    query = sparse_load(query, schema_cls, model, schema, keep=(sort,))
+    query = apply_filters(query, model, filter_args)
+    try:
+        query, keys = keyset_query(query, model.id, page_args["limit"], page_args.get("after"),
+                                   sort, descending)
+    except (ValueError, TypeError, binascii.Error):
+        abort(400, message="Invalid 'after' cursor.")
+
+    rows, next_cursor = page_rows((await session.scalars(query)).all(), keys,
+                                  page_args["limit"])
+    headers = next_page_headers(request.base_url, request.args.to_dict(), next_cursor,
+                                page_args["limit"])
+    return (schema or _SCHEMAS[schema_cls]).dump(rows, many=True), 200, headers
+
+
+async def _get_one(request, session, model, schema_cls, row_id, etag_name, not_found=None):
+    field_args = _parse_args(request, FieldsArgsSchema)
+    version = await session.scalar(select(model.version).where(model.id == row_id))
+    if version is None:
+        abort(404, **({"message": not_found} if not_found else {}))
+    schema = sparse_schema(schema_cls, field_args)
+
+    etag = resource_etag(etag_name, row_id, version, field_args)
+    if etag in request.if_none_match:
+        return None, 304, etag_headers(etag)
+
+    query = sparse_load(select(model).where(model.id == row_id), schema_cls, model, schema)
+    row = await session.scalar(query)
+    if row is None:
+        abort(404, **({"message": not_found} if not_found else {}))
+    return (schema or _SCHEMAS[schema_cls]).dump(row), 200, etag_headers(etag)
+
+
+async def get_company_list(request, session):
+    """Get list of all Companies (async): see CompanyList.get."""
+    page_args = _parse_args(request, PageArgsSchema)
+    filter_args = _parse_args(request, CompanyFilterArgsSchema)
+    field_args = _parse_args(request, FieldsArgsSchema)
+    return await _get_page(request, session, select(CompanyModel), CompanyModel,
+                           CompanySchema, page_args, filter_args, field_args)
+
+
+async def get_company(request, session, company_id):
+    """Get Company by ID (async): see Company.get."""
+    return await _get_one(request, session, CompanyModel, CompanySchema, company_id,
+                          "companies")
+
+
+async def get_project_list(request, session):
+    """Get list of all Projects (async): see ProjectList.get."""
+    page_args = _parse_args(request, PageArgsSchema)
+    filter_args = _parse_args(request, ProjectFilterArgsSchema)
+    field_args = _parse_args(request, FieldsArgsSchema)
+    return await _get_page(request, session, select(ProjectModel), ProjectModel,
+                           ProjectSchema, page_args, filter_args, field_args)
+
+
+async def get_project(request, session, project_id):
+    """Get Project by ID (async): see Project.get."""
+    return await _get_one(request, session, ProjectModel, ProjectSchema, project_id,
+                          "projects", not_found="Project does not exist.")
+
+
+async def get_tests_in_company(request, session, company_id):
+    """Get List of Tests requested by Company (async): see TestsInCompany.get."""
+    page_args = _parse_args(request, PageArgsSchema)
+    filter_args = _parse_args(request, TestFilterArgsSchema)
+    field_args = _parse_args(request, FieldsArgsSchema)
+
+    if await session.scalar(select(CompanyModel.id).where(CompanyModel.id == company_id)) is None:
+        abort(404)
+
+    return await _get_page(request, session,
+                           select(TestModel).where(TestModel.company_id == company_id),
+                           TestModel, TestSchema, page_args, filter_args, field_args)
+
+
+async def get_test(request, session, test_id):
+    """Get info on a Test by ID (async): see Test.get."""
+    return await _get_one(request, session, TestModel, TestSchema, test_id, "tests")
+
+
+# GET routes served by the async views: path pattern -> view. The IDs are
+# converted to int, as asyncpg doesn't cast strings to integer parameters;
+# any other path (or ID) goes to the Flask app.
+ASYNC_ROUTES = [
+    (re.compile(r"/company"), get_company_list),
+    (re.compile(r"/company/(\d+)"), get_company),
+    (re.compile(r"/company/(\d+)/test"), get_tests_in_company),
+    (re.compile(r"/project"), get_project_list),
+    (re.compile(r"/project/(\d+)"), get_project),
+    (re.compile(r"/test/(\d+)"), get_test),
+]
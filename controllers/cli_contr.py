@@ -1,19 +1,55 @@
 # Libraries and package imports
+import click
 from flask_smorest import Blueprint
-from passlib.hash import pbkdf2_sha256
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateIndex
 
 # Local imports
 from init import db
 from models.company import CompanyModel
-from models.project import ProjectModel
+from models.project import ProjectModel, PROJECT_KEY
 from models.test import TestModel
 from models.project_test import ProjectTest
 from models.user import UserModel
+from models.search_index import rebuild_search_index
+from models.stats import rebuild_company_stats, verify_company_stats
+from jobs import resume_jobs
+from migrations import (index_names, migrate_cascade_deletes, migrate_project_key,
+                        migrate_row_versions, migrate_token_blocklist)
+from routing import sync_sqlite_replicas
+from hashing import hash_password
+from seeding import seed_scale
 
 
 db_commands = Blueprint("db", __name__)
 
 
+# Query shapes run by the app's controllers, checked by 'flask db index-advisor'
+QUERY_SHAPES = {
+    "Projects of a company": select(ProjectModel).where(ProjectModel.company_id == 1),
+    "Project unique key (ProjectList.post, ProjectBulk.post)": select(ProjectModel).where(
+        *(column == value for column, value in zip(PROJECT_KEY, (1, "name", "description")))),
+    "Tests of a company (TestsInCompany.get)": select(TestModel).where(
+        TestModel.company_id == 1).order_by(TestModel.id),
+    "Users of a company": select(UserModel).where(UserModel.company_id == 1),
+    "Tests linked to a project": select(ProjectTest.test_id).where(
+        ProjectTest.project_id == 1),
+    "Projects linked to a test": select(ProjectTest.project_id).where(
+        ProjectTest.test_id == 1),
+    "User login lookup (UserLogin.post)": select(UserModel).where(
+        UserModel.username == "username"),
+    "Projects by client (ProjectList.get?client=)": select(ProjectModel).where(
+        ProjectModel.client == "client").order_by(ProjectModel.id),
+    "Projects by budget range (ProjectList.get?budget_min=&sort=budget)": select(
+        ProjectModel).where(ProjectModel.budget >= 1000).order_by(ProjectModel.budget,
+                                                                   ProjectModel.id),
+    "Companies by sector (CompanyList.get?industry_sector=)": select(CompanyModel).where(
+        CompanyModel.industry_sector == "sector").order_by(CompanyModel.id),
+    "Tests of a company by type (TestsInCompany.get?test_type=)": select(TestModel).where(
+        TestModel.company_id == 1, TestModel.test_type == "type").order_by(TestModel.id),
+}
+
+
 @db_commands.cli.command('create')
 def create_tables():
     """Create tables in the database:
@@ -54,7 +90,12 @@ def drop_tables():
     print("Tables dropped")
 
 @db_commands.cli.command('seed')
-def seed_tables():
+@click.option('--scale', type=int, default=0,
+              help="Generate this many companies (with their projects, tests, "
+                   "users and links) instead of the sample data.")
+@click.option('--seed', 'random_seed', type=int, default=0,
+              help="Random seed for --scale. The same seed gives the same data.")
+def seed_tables(scale, random_seed):
     """ Seed tables in the database:
 
     Function command for the Flask application's command-line interface (CLI),
@@ -67,14 +108,27 @@ def seed_tables():
     After data is added, the session is committed to the database.
 
     This function also hashes the passwords for the users using the
-    'pbkdf2_sha256' hashing algorithm from the 'passlib' library.
+    'pbkdf2_sha256' hashing algorithm from the 'passlib' library, through
+    the hashing worker pool.
 
     Upon seeded the tables, a confirmation message "Tables seeded" is
     outputted to the console.
 
+    With '--scale N' it instead generates N companies with a realistic spread
+    of projects, tests, users and links for load testing (see seeding.py).
+    Rows are bulk inserted (COPY on PostgreSQL, executemany on SQLite) and
+    one password hash ('123456') is reused for every user.
+
     Usage:
         Run 'flask db seed' in the terminal to execute this command.
+        Run 'flask db seed --scale 100000 --seed 1' for a large data set.
     """
+    if scale:
+        counts = seed_scale(scale, seed=random_seed,
+                            progress=lambda done, total: print(f"  {done}/{total} companies"))
+        print("Tables seeded: " + ", ".join(f"{count} {table}"
+                                            for table, count in counts.items()))
+        return
 
     companies = [
         CompanyModel(
@@ -92,7 +146,7 @@ def seed_tables():
         UserModel(
             username="Admin",
             email="admin@email.com.au",
-            password=pbkdf2_sha256.hash("123456"),
+            password=hash_password("123456"),
             is_admin=True,
             # company_id=companies[0].id
 
@@ -100,7 +154,7 @@ def seed_tables():
         UserModel(
             username="User 1",
             email="user1@email.com.au",
-            password=pbkdf2_sha256.hash("123456"),
+            password=hash_password("123456"),
             company_id=companies[0].id
         )
     ]
@@ -143,3 +197,271 @@ def seed_tables():
     db.session.commit()
     print("Tables seeded")
 
+
+def _explain(statement):
+    """Run EXPLAIN on a statement and return the plan lines and if it scans:
+
+    Uses 'EXPLAIN QUERY PLAN' on SQLite and 'EXPLAIN' on PostgreSQL. A plan
+    line with a full table scan ('SCAN <table>' on SQLite, 'Seq Scan' on
+    PostgreSQL) is reported as a sequential scan.
+    """
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        plan = [row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+        scans = [line for line in plan
+                 if line.startswith("SCAN") and "USING" not in line]
+    else:
+        plan = [row[0] for row in db.session.execute(text("EXPLAIN " + sql))]
+        scans = [line for line in plan if "Seq Scan" in line]
+    return plan, scans
+
+
+def _missing_indexes():
+    """Return the indexes declared on the models that the database lacks."""
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = index_names(table.name)
+        missing.extend(index for index in table.indexes if index.name not in existing)
+    return missing
+
+
+@db_commands.cli.command('index-advisor')
+@click.option('--apply', is_flag=True,
+              help="Create the missing indexes instead of printing their DDL.")
+def index_advisor(apply):
+    """Find and create missing indexes:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'index-advisor' command.
+
+    This command runs EXPLAIN on each of the query shapes the controllers use
+    (QUERY_SHAPES) and reports the ones that scan a whole table. It then
+    compares the indexes declared on the models with the indexes in the
+    database, and prints the CREATE INDEX statement of each missing one, or
+    creates them with '--apply'.
+
+    Note PostgreSQL may still choose a sequential scan on a small table even
+    when an index exists, so run it against a database with realistic data.
+
+    Usage:
+        Run 'flask db index-advisor' in the terminal to execute this command.
+        Run 'flask db index-advisor --apply' to create the missing indexes.
+    """
+    print("Query plans:")
+    for label, statement in QUERY_SHAPES.items():
+        plan, scans = _explain(statement)
+        status = "SEQUENTIAL SCAN" if scans else "ok"
+        print(f"  [{status}] {label}")
+        for line in scans:
+            print(f"      {line}")
+
+    missing = _missing_indexes()
+    if not missing:
+        print("No missing indexes")
+        return
+
+    print("Missing indexes:")
+    for index in missing:
+        if apply:
+            index.create(db.engine)
+            print(f"  Created {index.name}")
+        else:
+            print(f"  {str(CreateIndex(index).compile(db.engine)).strip()};")
+
+    if not apply:
+        print("Run 'flask db index-advisor --apply' to create them")
+
+
+@db_commands.cli.command('search-rebuild')
+def search_rebuild():
+    """Create and rebuild the full-text search index:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'search-rebuild' command.
+
+    'flask db create' sets up the search index of the /search endpoint with
+    the tables, and the database keeps it up to date from then on. This
+    command adds the index to a database created before it existed, or
+    rebuilds it from the projects and tests tables (e.g. after rows were
+    changed with the triggers disabled).
+
+    Usage:
+        Run 'flask db search-rebuild' in the terminal to execute this command.
+    """
+    counts = rebuild_search_index()
+    for table, count in counts.items():
+        print(f"  Indexed {count} {table}")
+    print("Search index rebuilt")
+
+
+@db_commands.cli.command('stats-rebuild')
+@click.option('--check', is_flag=True,
+              help="Only compare the table with the GROUP BY results.")
+def stats_rebuild(check):
+    """Rebuild and check the company statistics:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'stats-rebuild' command.
+
+    The company_stats table behind /company/stats is updated incrementally
+    on every write. This command recomputes it from scratch with GROUP BY
+    queries over the projects, tests and links, then checks the table
+    matches them. With '--check' it only runs the check, and exits with
+    status 1 if any company differs.
+
+    Usage:
+        Run 'flask db stats-rebuild' in the terminal to execute this command.
+        Run 'flask db stats-rebuild --check' to only check the table.
+    """
+    if not check:
+        print(f"Rebuilt the statistics of {rebuild_company_stats()} companies")
+
+    differences = verify_company_stats()
+    for company_id, column, stored, expected in differences:
+        print(f"  Company {company_id}: {column} is {stored}, expected {expected}")
+    if differences:
+        print(f"{len(differences)} differences found")
+        raise SystemExit(1)
+    print("Company statistics match")
+
+
+@db_commands.cli.command('jobs-resume')
+def jobs_resume():
+    """Run the pending background jobs:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'jobs-resume' command.
+
+    Runs the queued jobs and the running jobs whose worker stopped (no
+    progress for JOB_LEASE_SECONDS, e.g. the server was restarted), in this
+    process. Jobs carry on from where they stopped.
+
+    Usage:
+        Run 'flask db jobs-resume' in the terminal to execute this command.
+    """
+    print(f"Ran {resume_jobs()} jobs")
+
+
+@db_commands.cli.command('migrate-versions')
+def migrate_versions():
+    """Add the row version column used by the ETags:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'migrate-versions' command.
+
+    The ETags of the companies, projects and tests come from a version
+    column that every write bumps. This command adds the column to the
+    tables of a database created before that, so the views can read it. It
+    does nothing on an up to date database.
+
+    Usage:
+        Run 'flask db migrate-versions' in the terminal to execute this command.
+    """
+    tables = migrate_row_versions()
+    for table in tables:
+        print(f"  Added the version column to {table}")
+    print("Row versions are up to date" if not tables else "Migration complete")
+
+
+@db_commands.cli.command('migrate-blocklist')
+def migrate_blocklist():
+    """Add the creation time of the revoked tokens:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'migrate-blocklist' command.
+
+    Each process keeps a copy of the revoked tokens and loads the rows of
+    the token_blocklist table created since its last sync. This command
+    adds the created_at column to a table created before that. It does
+    nothing on an up to date database.
+
+    Usage:
+        Run 'flask db migrate-blocklist' in the terminal to execute this command.
+    """
+    added = migrate_token_blocklist()
+    print("Added the created_at column to token_blocklist" if added
+          else "The token blocklist is up to date")
+
+
+@db_commands.cli.command('migrate-cascade')
+def migrate_cascade():
+    """Migrate the foreign keys to ON DELETE CASCADE:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'migrate-cascade' command.
+
+    The foreign keys of projects_tests, projects, tests, users and
+    company_stats are ON DELETE CASCADE, so deleting a project, test or
+    company deletes the rows that belong to it in the same statement. This
+    command changes the foreign keys of a database created before that, and
+    deletes the orphaned rows that earlier deletes left behind. On SQLite
+    the tables are rebuilt, which adds the projects' unique key too, so
+    duplicate projects are listed and nothing is changed. It does nothing
+    on an up to date database.
+
+    Usage:
+        Run 'flask db migrate-cascade' in the terminal to execute this command.
+    """
+    try:
+        tables, deleted = migrate_cascade_deletes()
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    for table, count in deleted.items():
+        if count:
+            print(f"  Deleted {count} orphaned rows from {table}")
+    for table in tables:
+        print(f"  Migrated {table}")
+    print("Foreign keys are up to date" if not tables else "Migration complete")
+
+
+@db_commands.cli.command('migrate-project-key')
+def migrate_project_key_command():
+    """Add the unique key of the projects:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'migrate-project-key' command.
+
+    A company can't have two projects with the same name and description,
+    which is enforced by a unique index that ProjectList.post inserts
+    against with ON CONFLICT. This command replaces the old non-unique index
+    of a database created before that with the unique one. If the database
+    has duplicate projects it lists them and changes nothing. It does
+    nothing on an up to date database.
+
+    Usage:
+        Run 'flask db migrate-project-key' in the terminal to execute this command.
+    """
+    try:
+        created = migrate_project_key()
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    print("Created the projects' unique key" if created else "The projects' unique key is up to date")
+
+
+@db_commands.cli.command('replica-sync')
+def replica_sync():
+    """Copy the SQLite database into the SQLite read replicas:
+
+    Function command for the Flask application's command-line interface (CLI),
+    registered under the 'replica-sync' command.
+
+    With DATABASE_REPLICA_URIS set, GET requests read from the replicas.
+    PostgreSQL replicas are kept up to date by streaming replication; to try
+    the routing out locally with SQLite files instead, this command copies
+    the primary database file into each replica (SQLite backup API), which
+    is the only "replication" they get. Run it again to catch them up.
+
+    Usage:
+        Run 'flask db replica-sync' in the terminal to execute this command.
+    """
+    try:
+        synced = sync_sqlite_replicas(db.engines)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    for key in synced:
+        print(f"  Copied the database to {key}")
+    print("Replicas synced" if synced else "No SQLite replicas configured")
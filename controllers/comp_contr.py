@@ -7,9 +7,18 @@ from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 # Local imports
 from init import db
-from models import CompanyModel
-from schemas import CompanySchema
+from models import CompanyModel, CompanyStatsModel
+from models.versioning import current_version
+from schemas import (CompanySchema, PageArgsSchema, ExportArgsSchema, FieldsArgsSchema,
+                     CompanyFilterArgsSchema, CompanyStatsSchema, JobSchema)
 from decorators import admin_required
+from pagination import paginate
+from filtering import apply_filters, sort_column
+from loaders import eager_load
+from sparse import sparse_schema, sparse_load, sparse_response
+from etags import resource_etag, etag_headers, check_not_modified
+from streaming import stream_export
+from jobs import enqueue_job
 
 
 company_blp = Blueprint("Company", __name__, description="Operations on "
@@ -22,16 +31,40 @@ class CompanyList(MethodView):
     Class CompanyList resources. Contains methods for handling
     HTTP GET and POST requests at the /company endpoint.
     """
+    @company_blp.arguments(PageArgsSchema, location="query")
+    @company_blp.arguments(CompanyFilterArgsSchema, location="query")
+    @company_blp.arguments(FieldsArgsSchema, location="query")
     @company_blp.response(200, CompanySchema(many=True))
-    def get(self):
+    def get(self, page_args, filter_args, field_args):
         """Get list of all Companies:
 
         Method handles the HTTP GET request at the /company endpoint.
 
+        Results are paginated by company ID. Use the 'limit' query argument
+        to set the page size and pass the 'X-Next-Cursor' response header
+        value back as 'after' to get the next page (or follow the 'Link'
+        header).
+
+        Filter with 'industry_sector' and 'services', and sort with 'sort'
+        (e.g. 'sort=name' or 'sort=-name').
+
+        Use 'fields' and 'expand' to only return some fields of each
+        company, e.g. '?fields=id,name' leaves out the nested projects.
+
+        Args:
+            page_args (dict): The 'limit' and 'after' pagination arguments.
+            filter_args (dict): The filter and 'sort' query arguments.
+            field_args (dict): The 'fields' and 'expand' query arguments.
+
         Returns:
-            list: A list of all companies in the database.
+            list: A page of companies in the database.
         """
-        return CompanyModel.query.all()
+        schema = sparse_schema(CompanySchema, field_args)
+        sort, descending = sort_column(CompanyModel, filter_args["sort"])
+        query = sparse_load(CompanyModel.query, CompanySchema, CompanyModel, schema, keep=(sort,))
+        query = apply_filters(query, CompanyModel, filter_args)
+        rows, status, headers = paginate(query, CompanyModel.id, page_args, sort, descending)
+        return sparse_response(rows, schema, many=True), status, headers
 
 
     @company_blp.arguments(CompanySchema)
@@ -73,14 +106,24 @@ class Company(MethodView):
     Class Company resources. Contains methods for handling
     HTTP GET and DELETE requests at the /company/<company_id> endpoint.
     """
+    @company_blp.alt_response(304, description="Not Modified: If-None-Match has the current ETag.")
+    @company_blp.arguments(FieldsArgsSchema, location="query")
     @company_blp.response(200, CompanySchema)
-    def get(self, company_id):
+    def get(self, field_args, company_id):
         """Get Company by ID:
 
         Method handles the HTTP GET request at the /company/<company_id>
         endpoint.
 
+        The response has a strong ETag built from the company's row version.
+        If the request's If-None-Match header matches it, a 304 (Not
+        Modified) is returned before the company is loaded and serialized.
+
+        Use the 'fields' and 'expand' query arguments to only return some
+        of the company's fields, e.g. '?fields=id,name,industry_sector'.
+
         Args:
+            field_args (dict): The 'fields' and 'expand' query arguments.
             company_id (str): The ID of the company to retrieve.
 
         Returns:
@@ -89,31 +132,136 @@ class Company(MethodView):
         Raises:
             HTTPException: If a company with the given ID does not exist (HTTP 404).
         """
-        company = CompanyModel.query.get_or_404(company_id)
-        return company
+        version = current_version(CompanyModel, company_id)
+        if version is None:
+            abort(404)
+        schema = sparse_schema(CompanySchema, field_args)
+        etag = resource_etag("companies", company_id, version, field_args)
+        check_not_modified(etag)
+
+        query = sparse_load(CompanyModel.query, CompanySchema, CompanyModel, schema)
+        company = query.get_or_404(company_id)
+        return sparse_response(company, schema), 200, etag_headers(etag)
 
 
     @jwt_required()
     @admin_required
     @company_blp.doc(security=[{"jwt": []}])
+    @company_blp.response(202, JobSchema)
     def delete(self, company_id):
         """Delete Company by ID:
 
         Method handles the HTTP DELETE request at the /company/<company_id>
         endpoint.
 
+        A company can have any number of projects, tests and users, so it is
+        deleted by a background job (see jobs.py) that removes them in
+        batches, and the company last. The response is returned straight
+        away with the job, and its 'Location' header points at the
+        /jobs/<job_id> endpoint reporting the job's progress. Deleting a
+        company that is already being deleted returns the same job.
+
         Args:
             company_id (str): The ID of the company to delete.
 
         Returns:
-            dict: A message indicating the company was deleted.
+            JobModel: The delete job.
 
         Raises:
             HTTPException: If a company with the given ID does not exist (HTTP 404).
         """
         company = CompanyModel.query.get_or_404(company_id)
-        db.session.delete(company)
-        db.session.commit()
-        return {"message": "Company deleted"}, 200
+        job = enqueue_job("delete_company", company.id)
+        return job, 202, {"Location": f"/jobs/{job.id}"}
+
+
+@company_blp.route("/company/export")
+class CompanyExport(MethodView):
+    """CompanyExport Resource:
+
+    Class CompanyExport resource. Contains a method for handling
+    HTTP GET requests at the /company/export endpoint.
+    """
+    @company_blp.arguments(ExportArgsSchema, location="query")
+    @company_blp.response(200, description="Streamed list of all companies, "
+                                            "one JSON object per line.")
+    def get(self, export_args):
+        """Export all Companies:
+
+        Method handles the HTTP GET request at the /company/export endpoint.
+
+        Streams every company, serialized with CompanySchema, as NDJSON
+        (default) or as a JSON array with '?format=json'.
+
+        Args:
+            export_args (dict): The 'format' query argument.
+
+        Returns:
+            Response: A chunked streaming response.
+        """
+        query = eager_load(CompanyModel.query, CompanySchema, CompanyModel)
+        return stream_export(query.order_by(CompanyModel.id), CompanySchema(),
+                             export_args["format"])
+
 
+@company_blp.route("/company/stats")
+class CompanyStatsList(MethodView):
+    """CompanyStatsList Resource:
 
+    Class CompanyStatsList resource. Contains a method for handling
+    HTTP GET requests at the /company/stats endpoint.
+    """
+    @company_blp.arguments(PageArgsSchema, location="query")
+    @company_blp.response(200, CompanyStatsSchema(many=True))
+    def get(self, page_args):
+        """Get the Statistics of all Companies:
+
+        Method handles the HTTP GET request at the /company/stats endpoint.
+
+        Returns the project count, total and average budget, test count and
+        project/test link count of each company. They are read from the
+        company_stats summary table, which is kept up to date on every
+        write (see models/stats.py), so no projects are loaded.
+
+        Results are paginated by company ID, see 'limit' and 'after'.
+
+        Args:
+            page_args (dict): The 'limit' and 'after' pagination arguments.
+
+        Returns:
+            list: A page of company statistics.
+        """
+        return paginate(CompanyStatsModel.query, CompanyStatsModel.company_id, page_args)
+
+
+@company_blp.route("/company/<string:company_id>/stats")
+class CompanyStats(MethodView):
+    """CompanyStats Resource:
+
+    Class CompanyStats resource. Contains a method for handling
+    HTTP GET requests at the /company/<company_id>/stats endpoint.
+    """
+    @company_blp.response(200, CompanyStatsSchema)
+    def get(self, company_id):
+        """Get the Statistics of a Company by ID:
+
+        Method handles the HTTP GET request at the
+        /company/<company_id>/stats endpoint.
+
+        Args:
+            company_id (str): The ID of the company.
+
+        Returns:
+            CompanyStatsModel: The statistics of the company.
+
+        Raises:
+            HTTPException: If a company with the given ID does not exist (HTTP 404).
+        """
+        stats = db.session.get(CompanyStatsModel, company_id)
+        if stats is None:
+            # Companies get their statistics row on creation, so only a
+            # database that predates the table has none ('flask db stats-rebuild').
+            CompanyModel.query.get_or_404(company_id)
+            stats = CompanyStatsModel(company_id=int(company_id), project_count=0,
+                                      total_budget=0.0, test_count=0, link_count=0)
+        return stats
@@ -0,0 +1,44 @@
+# Library and package imports
+from flask.views import MethodView
+from flask_jwt_extended import jwt_required
+from flask_smorest import Blueprint
+
+# Local imports
+from models import JobModel
+from schemas import JobSchema
+from decorators import admin_required
+
+
+job_blp = Blueprint("Jobs", __name__, description="Background job status")
+
+
+@job_blp.route("/jobs/<string:job_id>")
+class Job(MethodView):
+    """Job Resource:
+
+    Class Job resource. Contains a method for handling
+    HTTP GET requests at the /jobs/<job_id> endpoint.
+    """
+    @jwt_required()
+    @admin_required
+    @job_blp.doc(security=[{"jwt": []}])
+    @job_blp.response(200, JobSchema)
+    def get(self, job_id):
+        """Get the Status of a Background Job:
+
+        Method handles the HTTP GET request at the /jobs/<job_id> endpoint.
+
+        Returns the job's status ('queued', 'running', 'done' or 'failed'),
+        the number of rows it has processed so far per table, and the error
+        message if it failed.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            JobModel: The job.
+
+        Raises:
+            HTTPException: If a job with the given ID does not exist (HTTP 404).
+        """
+        return JobModel.query.get_or_404(job_id)
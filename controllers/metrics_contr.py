@@ -0,0 +1,34 @@
+# Library and package imports
+from flask import Response
+from flask.views import MethodView
+from flask_smorest import Blueprint
+
+# Local imports
+from metrics import render_metrics
+
+
+metrics_blp = Blueprint("Metrics", __name__, description="Prometheus metrics")
+
+
+@metrics_blp.route("/metrics")
+class Metrics(MethodView):
+    """Metrics Resource:
+
+    Class Metrics resource. Contains a method for handling
+    HTTP GET requests at the /metrics endpoint.
+    """
+    @metrics_blp.response(200, description="Metrics in the Prometheus text format.")
+    def get(self):
+        """Get Prometheus metrics:
+
+        Method handles the HTTP GET request at the /metrics endpoint.
+
+        Returns histograms of the request duration, SQL time, number of SQL
+        statements and serialization time per endpoint, and the connection
+        pool metrics per database (see db_pool.py), for Prometheus to
+        scrape. Each process keeps its own metrics.
+
+        Returns:
+            Response: The metrics as text/plain (Prometheus format 0.0.4).
+        """
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
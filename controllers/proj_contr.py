@@ -3,35 +3,119 @@ from flask import jsonify
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required
 from flask_smorest import Blueprint, abort
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 
 # Local imports
 from init import db
 from models import ProjectModel, CompanyModel
-from schemas import ProjectSchema, ProjectUpdateSchema
+from models.project import PROJECT_KEY
+from models.versioning import bump_versions, bump_tests_of_projects, current_version
+from models.stats import move_project_budget, update_company_stats
+from schemas import (ProjectSchema, ProjectUpdateSchema, ProjectReplaceSchema, PageArgsSchema,
+                     ExportArgsSchema, BulkProjectResultSchema, FieldsArgsSchema,
+                     ProjectFilterArgsSchema)
 from decorators import admin_required
+from pagination import paginate
+from filtering import apply_filters, sort_column
+from loaders import eager_load
+from sparse import sparse_schema, sparse_load, sparse_response
+from etags import resource_etag, etag_headers, check_not_modified
+from streaming import stream_export
+from upserts import dialect_insert
 
 
 project_blp = Blueprint("Project", __name__, description="Operations on "
                                                    "Engineering Projects")
 
+DUPLICATE_PROJECT = "A Project with that name already exists in the in this company."
+
+
+def _insert_error_message(company_ids):
+    """Message for an IntegrityError of a project INSERT:
+
+    Duplicates are skipped or checked before the INSERT, so this is most
+    likely the company foreign key (e.g. a company deleted meanwhile),
+    which is checked explicitly. Any other constraint gets its own message.
+
+    Args:
+        company_ids (set): The company IDs of the inserted projects.
+    """
+    existing = set(db.session.scalars(
+        select(CompanyModel.id).where(CompanyModel.id.in_(company_ids))))
+    if existing != set(company_ids):
+        return "Company does not exist."
+    return "A project breaks a database constraint."
+
+
+def _update_project(project_id, changes):
+    """Change some columns of a project with one UPDATE ... RETURNING:
+
+    There is no read before the write: a missing project is an UPDATE that
+    returns no row, and a duplicate name/description is a violation of the
+    projects' unique key. The company's budget statistics and the versions
+    of the company and the linked tests (which embed the project) are
+    updated in the same transaction, as the ORM events only see ORM flushes.
+
+    Args:
+        project_id (str): The ID of the project to update.
+        changes (dict): Column -> new value.
+
+    Returns:
+        ProjectModel: The updated project.
+
+    Raises:
+        HTTPException: If the project does not exist (HTTP 404) or the change
+                       would duplicate another project of the company (HTTP 400).
+    """
+    try:
+        if "budget" in changes:
+            move_project_budget(project_id, changes["budget"])
+        project = db.session.scalar(
+            update(ProjectModel).where(ProjectModel.id == project_id)
+            .values(**changes, version=ProjectModel.version + 1)
+            .returning(ProjectModel)
+        )
+    except IntegrityError:
+        db.session.rollback()
+        abort(400, message=DUPLICATE_PROJECT)
+
+    if project is None:
+        db.session.rollback()
+        abort(404, message="Project does not exist.")
+
+    bump_versions(CompanyModel, {project.company_id})
+    bump_tests_of_projects({project.id})
+    db.session.commit()
+    return project
+
 @project_blp.route("/project/<string:project_id>")
 class Project(MethodView):
     """Project Resources:
 
     Class Project resource. Contains methods for handling
-    HTTP GET, DELETE, and PUT requests at the /project/<project_id> endpoint.
+    HTTP GET, DELETE, PUT and PATCH requests at the /project/<project_id> endpoint.
     """
 
+    @project_blp.alt_response(304, description="Not Modified: If-None-Match has the current ETag.")
+    @project_blp.arguments(FieldsArgsSchema, location="query")
     @project_blp.response(200, ProjectSchema)
-    def get(self, project_id):
+    def get(self, field_args, project_id):
         """Get Project by ID:
 
         Method handles the HTTP GET request at the /project/<project_id>
         endpoint.
 
+        The response has a strong ETag built from the project's row version.
+        If the request's If-None-Match header matches it, a 304 (Not
+        Modified) is returned before the project is loaded and serialized.
+
+        Use the 'fields' and 'expand' query arguments to only return some
+        of the project's fields, e.g. '?fields=id,name&expand=company'.
+
         Args:
+            field_args (dict): The 'fields' and 'expand' query arguments.
             project_id (str): The ID of the project to retrieve.
 
         Returns:
@@ -40,10 +124,18 @@ class Project(MethodView):
         Raises:
             HTTPException: If a project with the given ID does not exist (HTTP 404).
         """
-        project = ProjectModel.query.get(project_id)
+        version = current_version(ProjectModel, project_id)
+        if version is None:
+            abort(404, message="Project does not exist.")
+        schema = sparse_schema(ProjectSchema, field_args)
+        etag = resource_etag("projects", project_id, version, field_args)
+        check_not_modified(etag)
+
+        query = sparse_load(ProjectModel.query, ProjectSchema, ProjectModel, schema)
+        project = query.get(project_id)
         if project is None:
             abort(404, message="Project does not exist.")
-        return project
+        return sparse_response(project, schema), 200, etag_headers(etag)
 
     @jwt_required()
     @admin_required
@@ -81,7 +173,7 @@ class Project(MethodView):
         return {"message": "Project deleted."}
 
 
-    @project_blp.arguments(ProjectUpdateSchema)
+    @project_blp.arguments(ProjectReplaceSchema)
     @project_blp.response(200, ProjectSchema)
     def put(self, project_data, project_id):
         """Update Project by ID:
@@ -89,6 +181,10 @@ class Project(MethodView):
         Method handles the HTTP PUT request at the /project/<project_id>
         endpoint.
 
+        Replaces the name, budget and description of the project (a missing
+        description clears it) with a single UPDATE ... RETURNING statement.
+        Use PATCH to only change some of them.
+
         Args:
             project_data (dict): The updated data of the project.
             project_id (str): The ID of the project to update.
@@ -97,21 +193,38 @@ class Project(MethodView):
             ProjectModel: The updated project.
 
         Raises:
-            HTTPException: If a project with the given ID does not exist (HTTP 404).
+            HTTPException: If a project with the given ID does not exist (HTTP 404)
+                           or the company has a project with the same name and
+                           description (HTTP 400).
         """
-        project = ProjectModel.query.get(project_id)
+        return _update_project(project_id, project_data)
 
-        if project:
-            project.budget = project_data["budget"]
-            project.name = project_data["name"]
-            project.description = project_data["description"]
-        else:
-            project = ProjectModel(id=project_id, **project_data)
+    @project_blp.arguments(ProjectUpdateSchema)
+    @project_blp.response(200, ProjectSchema)
+    def patch(self, project_data, project_id):
+        """Partially Update Project by ID:
 
-        db.session.add(project)
-        db.session.commit()
+        Method handles the HTTP PATCH request at the /project/<project_id>
+        endpoint.
 
-        return project
+        Only changes the fields given in the request (name, budget and/or
+        description), with a single UPDATE ... RETURNING statement.
+
+        Args:
+            project_data (dict): The fields of the project to change.
+            project_id (str): The ID of the project to update.
+
+        Returns:
+            ProjectModel: The updated project.
+
+        Raises:
+            HTTPException: If no fields are given (HTTP 400), a project with the
+                           given ID does not exist (HTTP 404) or the company has
+                           a project with the same name and description (HTTP 400).
+        """
+        if not project_data:
+            abort(400, message="No fields to update.")
+        return _update_project(project_id, project_data)
 
 
 @project_blp.route("/project")
@@ -121,16 +234,43 @@ class ProjectList(MethodView):
     Class ProjectList resource. Contains methods for handling
     HTTP GET and POST requests at the /project endpoint.
     """
+    @project_blp.arguments(PageArgsSchema, location="query")
+    @project_blp.arguments(ProjectFilterArgsSchema, location="query")
+    @project_blp.arguments(FieldsArgsSchema, location="query")
     @project_blp.response(200, ProjectSchema(many=True))
-    def get(self):
+    def get(self, page_args, filter_args, field_args):
         """Get list of all Projects in database:
 
         Method handles the HTTP GET request at the /project endpoint.
 
+        Results are paginated by project ID. Use the 'limit' query argument
+        to set the page size and pass the 'X-Next-Cursor' response header
+        value back as 'after' to get the next page (or follow the 'Link'
+        header).
+
+        Filter with 'company_id', 'client', 'budget_min' and 'budget_max',
+        and sort with 'sort' (e.g. 'sort=-budget' for the largest budgets
+        first), e.g. '/project?company_id=3&budget_min=50000&sort=budget'.
+
+        Use 'fields' to only return some fields of each project and
+        'expand' to choose the nested relationships, e.g.
+        '?fields=id,name,budget&expand=company'. Only the requested columns
+        and relationships are loaded from the database.
+
+        Args:
+            page_args (dict): The 'limit' and 'after' pagination arguments.
+            filter_args (dict): The filter and 'sort' query arguments.
+            field_args (dict): The 'fields' and 'expand' query arguments.
+
         Returns:
-            list: A list of all projects in the database.
+            list: A page of projects in the database.
         """
-        return ProjectModel.query.all()
+        schema = sparse_schema(ProjectSchema, field_args)
+        sort, descending = sort_column(ProjectModel, filter_args["sort"])
+        query = sparse_load(ProjectModel.query, ProjectSchema, ProjectModel, schema, keep=(sort,))
+        query = apply_filters(query, ProjectModel, filter_args)
+        rows, status, headers = paginate(query, ProjectModel.id, page_args, sort, descending)
+        return sparse_response(rows, schema, many=True), status, headers
 
 
     @project_blp.arguments(ProjectSchema)
@@ -147,29 +287,170 @@ class ProjectList(MethodView):
             ProjectModel: The newly created project.
 
         Raises:
-            HTTPException: If a project with the same name already exists in the same company (HTTP 400)
-                           or if an error occurred when creating the project (HTTP 500).
+            HTTPException: If the company does not exist or a project with the same name
+                           already exists in the same company (HTTP 400), or if an error
+                           occurred when creating the project (HTTP 500).
         """
-        # Check if company exists before creating it
-        company = CompanyModel.query.get(project_data["company_id"])
-        if not company:
-            abort(400, message="Company does not exist.")
+        # One INSERT ... ON CONFLICT DO NOTHING RETURNING: a duplicate (the
+        #   projects' unique key) inserts and returns nothing, and a missing
+        #   company fails the foreign key, so a concurrent request can't slip
+        #   a duplicate in between a check and the insert. The company is
+        #   only looked up when the INSERT fails.
+        try:
+            project = db.session.scalar(
+                dialect_insert(ProjectModel).values(**project_data)
+                .on_conflict_do_nothing(index_elements=PROJECT_KEY)
+                .returning(ProjectModel)
+            )
+        except IntegrityError:
+            db.session.rollback()
+            abort(400, message=_insert_error_message({project_data["company_id"]}))
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while inserting the project.")
 
-        # Check if project with same name exists in same company
-        project = ProjectModel.query.filter_by(name=project_data["name"],
-                                         company_id=project_data["company_id"],
-                                         description=project_data["description"]).first()
+        if project is None:
+            db.session.rollback()
+            abort(400, message=DUPLICATE_PROJECT)
 
-        if project:
-            abort(400,
-                  message="A Project with that name already exists in the in this company.")
+        # The INSERT skips the ORM version and statistics events
+        bump_versions(CompanyModel, {project.company_id})
+        update_company_stats({project.company_id: {"project_count": 1,
+                                                   "total_budget": project.budget}})
+        db.session.commit()
+        return project
 
-        project = ProjectModel(**project_data)
 
-        try:
-            db.session.add(project)
-            db.session.commit()
-        except SQLAlchemyError:
-            abort(500, message="An error occurred while inserting the project.")
+@project_blp.route("/project/export")
+class ProjectExport(MethodView):
+    """ProjectExport Resource:
+
+    Class ProjectExport resource. Contains a method for handling
+    HTTP GET requests at the /project/export endpoint.
+    """
+    @project_blp.arguments(ExportArgsSchema, location="query")
+    @project_blp.response(200, description="Streamed list of all projects, "
+                                            "one JSON object per line.")
+    def get(self, export_args):
+        """Export all Projects:
+
+        Method handles the HTTP GET request at the /project/export endpoint.
 
-        return project
\ No newline at end of file
+        Streams every project, serialized with ProjectSchema, as NDJSON
+        (default) or as a JSON array with '?format=json'. Rows are read from
+        the database in batches so the whole table is never held in memory.
+
+        Args:
+            export_args (dict): The 'format' query argument.
+
+        Returns:
+            Response: A chunked streaming response.
+        """
+        query = eager_load(ProjectModel.query, ProjectSchema, ProjectModel)
+        return stream_export(query.order_by(ProjectModel.id), ProjectSchema(),
+                             export_args["format"])
+
+
+@project_blp.route("/project/bulk")
+class ProjectBulk(MethodView):
+    """ProjectBulk Resource:
+
+    Class ProjectBulk resource. Contains a method for handling
+    HTTP POST requests at the /project/bulk endpoint.
+    """
+    @project_blp.arguments(ProjectSchema(many=True))
+    @project_blp.response(200, BulkProjectResultSchema(many=True))
+    def post(self, projects_data):
+        """Create many Projects at once:
+
+        Method handles the HTTP POST request at the /project/bulk endpoint.
+
+        Accepts a list of projects. Instead of one company lookup, one
+        duplicate check and one commit per project, the whole batch runs:
+          - one query to find which company IDs exist,
+          - one query to find which (company, name, description) already exist,
+          - one executemany INSERT of the valid rows, in a single transaction.
+
+        A row that fails the checks is reported back as an error and does
+        not stop the other rows from being created.
+
+        Args:
+            projects_data (list): The projects to be created.
+
+        Returns:
+            list: One result per row, in the same order as the request, with
+                  a 'status' of 'created' (and the project) or 'error' (and
+                  a message).
+        """
+        # Give every row the same keys so the INSERT runs as one executemany
+        # batch instead of being split into groups by parameter set.
+        for row in projects_data:
+            row.setdefault("description", None)
+
+        company_ids = {row["company_id"] for row in projects_data}
+        existing_companies = set(db.session.scalars(
+            select(CompanyModel.id).where(CompanyModel.id.in_(company_ids))
+        ))
+
+        # The projects' unique key, where a missing description counts as ''
+        keys = [(row["company_id"], row["name"], row["description"] or "")
+                for row in projects_data]
+        existing_projects = set(db.session.execute(
+            select(*PROJECT_KEY).where(tuple_(*PROJECT_KEY).in_(set(keys)))
+        ).all()) if keys else set()
+
+        results = []
+        new_rows = []
+        seen = set()
+        for index, (row, key) in enumerate(zip(projects_data, keys)):
+            if row["company_id"] not in existing_companies:
+                message = "Company does not exist."
+            elif key in existing_projects or key in seen:
+                message = DUPLICATE_PROJECT
+            else:
+                seen.add(key)
+                results.append({"index": index, "status": "created", "project": row})
+                new_rows.append(row)
+                continue
+            results.append({"index": index, "status": "error", "message": message})
+
+        if new_rows:
+            try:
+                # RETURNING rows of a multi-row INSERT are not guaranteed to
+                # come back in parameter order, so the new IDs are matched
+                # on the (name, company, description) key, which is unique
+                # within the batch after the checks above.
+                projects = ProjectModel.__table__
+                inserted = db.session.execute(
+                    insert(projects).returning(
+                        projects.c.id, projects.c.name,
+                        projects.c.company_id, projects.c.description),
+                    new_rows,
+                ).all()
+                # Core INSERT skips the ORM version and statistics events,
+                # and the companies embed their projects, so update them here.
+                bump_versions(CompanyModel, {row["company_id"] for row in new_rows})
+                stats = {}
+                for row in new_rows:
+                    delta = stats.setdefault(row["company_id"],
+                                             {"project_count": 0, "total_budget": 0.0})
+                    delta["project_count"] += 1
+                    delta["total_budget"] += row["budget"]
+                update_company_stats(stats)
+                db.session.commit()
+            except IntegrityError:
+                # E.g. a company deleted, or a duplicate created, since the checks
+                db.session.rollback()
+                abort(400, message=_insert_error_message(
+                    {row["company_id"] for row in new_rows}))
+            except SQLAlchemyError:
+                db.session.rollback()
+                abort(500, message="An error occurred while inserting the projects.")
+
+            new_ids = {(name, company_id, description): new_id
+                       for new_id, name, company_id, description in inserted}
+            for row in new_rows:
+                row["id"] = new_ids[(row["name"], row["company_id"],
+                                     row["description"])]
+
+        return results
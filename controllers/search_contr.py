@@ -0,0 +1,76 @@
+# Library and package imports
+from flask.views import MethodView
+from flask_smorest import Blueprint, abort
+
+# Local imports
+from models import ProjectModel, TestModel
+from models.search_index import search_index, search_terms
+from schemas import SearchArgsSchema, SearchResultSchema, PageArgsSchema
+from pagination import page_headers
+
+
+search_blp = Blueprint("Search", __name__, description="Full-text search on "
+                                                 "Projects and Tests")
+
+
+@search_blp.route("/search")
+class Search(MethodView):
+    """Search Resource:
+
+    Class Search resource. Contains a method for handling
+    HTTP GET requests at the /search endpoint.
+    """
+    @search_blp.arguments(SearchArgsSchema, location="query")
+    @search_blp.arguments(PageArgsSchema, location="query")
+    @search_blp.response(200, SearchResultSchema(many=True))
+    def get(self, search_args, page_args):
+        """Search Projects and Tests:
+
+        Method handles the HTTP GET request at the /search endpoint.
+
+        Searches the name, description and client of the projects and the
+        name, description and test method of the tests through the
+        full-text index (see models/search_index.py), e.g.
+        '/search?q=retaining wall' or '/search?q=AS1289'. A result matches
+        if it contains every word of 'q', or a word starting with it, and
+        results are ranked by relevance, best first.
+
+        Results are paginated: pass the 'X-Next-Cursor' response header
+        value back as 'after' to get the next page.
+
+        Args:
+            search_args (dict): The 'q' search string.
+            page_args (dict): The 'limit' and 'after' pagination arguments.
+
+        Returns:
+            list: A page of results with their type, ID, score and the
+                  matching project or test.
+
+        Raises:
+            HTTPException: If 'q' has no words or the cursor is invalid (HTTP 400).
+        """
+        terms = search_terms(search_args["q"])
+        if not terms:
+            abort(400, message="The search has no words.")
+
+        # The cursor is the offset of the next page: ranking needs every
+        #   match to be scored anyway, so there is no index to seek on.
+        after = page_args.get("after") or "0"
+        if not after.isdigit():
+            abort(400, message="Invalid 'after' cursor.")
+        offset, limit = int(after), page_args["limit"]
+
+        hits = search_index(terms, limit + 1, offset)
+        next_cursor = offset + limit if len(hits) > limit else None
+        hits = hits[:limit]
+
+        # Load the matched rows with one query per type
+        rows = {}
+        for kind, model in (("project", ProjectModel), ("test", TestModel)):
+            ids = [hit.id for hit in hits if hit.type == kind]
+            if ids:
+                rows[kind] = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+
+        results = [{"type": hit.type, "id": hit.id, "score": hit.score,
+                    hit.type: rows[hit.type].get(hit.id)} for hit in hits]
+        return results, 200, page_headers(next_cursor, limit)
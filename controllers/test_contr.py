@@ -2,13 +2,24 @@
 from flask.views import MethodView
 from flask_jwt_extended import jwt_required
 from flask_smorest import Blueprint, abort
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 # Local imports
 from init import db
-from models import TestModel, CompanyModel, ProjectModel
-from schemas import TestSchema, TestAndProjectSchema
+from models import TestModel, CompanyModel, ProjectModel, ProjectTest
+from models.versioning import bump_versions, current_version
+from models.stats import update_company_stats
+from schemas import (TestSchema, TestAndProjectSchema, PageArgsSchema,
+                     ExportArgsSchema, ProjectSchema, ProjectTestsSchema,
+                     FieldsArgsSchema, TestFilterArgsSchema)
 from decorators import admin_required
+from pagination import paginate
+from filtering import apply_filters, sort_column
+from loaders import eager_load
+from sparse import sparse_schema, sparse_load, sparse_response
+from etags import resource_etag, etag_headers, check_not_modified
+from streaming import stream_export
 
 
 test_blp = Blueprint("Test", "test", description="Operations on Test for "
@@ -21,22 +32,38 @@ class TestsInCompany(MethodView):
     Class TestsInCompany resource. It contains methods for handling
     HTTP GET and POST requests at the /company/<company_id>/test endpoint.
     """
+    @test_blp.arguments(PageArgsSchema, location="query")
+    @test_blp.arguments(TestFilterArgsSchema, location="query")
+    @test_blp.arguments(FieldsArgsSchema, location="query")
     @test_blp.response(200, TestSchema(many=True))
-    def get(self, company_id):
+    def get(self, page_args, filter_args, field_args, company_id):
         """Get List of Tests requested by Company:
 
         Method handles the HTTP GET request at the
         /company/<company_id>/test endpoint.
 
+        Results are paginated by test ID, see 'limit' and 'after'. Filter
+        with 'test_type' and 'test_method', sort with 'sort' (e.g.
+        'sort=-name'), and use 'fields' and 'expand' to only return some
+        fields of each test.
+
         Args:
+            page_args (dict): The 'limit' and 'after' pagination arguments.
+            filter_args (dict): The filter and 'sort' query arguments.
+            field_args (dict): The 'fields' and 'expand' query arguments.
             company_id (str): The ID of the company to retrieve tests for.
 
         Returns:
-            list: A list of all tests in the company.
+            list: A page of tests in the company.
         """
         company = CompanyModel.query.get_or_404(company_id)
 
-        return company.tests.all()
+        schema = sparse_schema(TestSchema, field_args)
+        sort, descending = sort_column(TestModel, filter_args["sort"])
+        query = sparse_load(company.tests, TestSchema, TestModel, schema, keep=(sort,))
+        query = apply_filters(query, TestModel, filter_args)
+        rows, status, headers = paginate(query, TestModel.id, page_args, sort, descending)
+        return sparse_response(rows, schema, many=True), status, headers
 
     @test_blp.arguments(TestSchema)
     @test_blp.response(201, TestSchema)
@@ -104,7 +131,9 @@ class LinkTestToProject(MethodView):
         project = ProjectModel.query.get_or_404(project_id)
         test = TestModel.query.get_or_404(test_id)
 
-        project.tests.append(test)
+        # Linking twice is a no-op (projects_tests is unique per pair)
+        if test not in project.tests:
+            project.tests.append(test)
 
         try:
             db.session.add(project)
@@ -149,6 +178,85 @@ class LinkTestToProject(MethodView):
         return {"message": "Project removed from Test", "project": project, "test": test}
 
 
+@test_blp.route("/project/<string:project_id>/tests")
+class ProjectTests(MethodView):
+    """Batch Link Tests to Project Resource:
+
+    Class ProjectTests resource. Contains a method for handling HTTP PUT
+    requests at the /project/<project_id>/tests endpoint.
+    """
+    @test_blp.arguments(ProjectTestsSchema)
+    @test_blp.response(200, ProjectSchema)
+    def put(self, link_data, project_id):
+        """Set the Tests linked to a Project:
+
+        Method handles the HTTP PUT request at the
+        /project/<project_id>/tests endpoint.
+
+        The Tests linked to the Project are replaced by the given list of
+        Test IDs in one round trip. The current links are read with one
+        query, then the new links are added with one multi-row INSERT and
+        the links no longer wanted are removed with one DELETE.
+
+        Args:
+            link_data (dict): The 'test_ids' to link to the project.
+            project_id (str): The ID of the project to link the tests to.
+
+        Returns:
+            ProjectModel: The project with its updated tests.
+
+        Raises:
+            HTTPException: If the project or any of the tests do not exist (HTTP 404),
+                           if the links were changed at the same time by another request (HTTP 409)
+                           or if an error occurred when linking the tests (HTTP 500).
+        """
+        project = ProjectModel.query.get_or_404(project_id)
+        wanted = set(link_data["test_ids"])
+
+        found = set(db.session.scalars(
+            select(TestModel.id).where(TestModel.id.in_(wanted))
+        )) if wanted else set()
+        if wanted - found:
+            abort(404, message="Tests do not exist: "
+                               f"{sorted(wanted - found)}.")
+
+        current = set(db.session.scalars(
+            select(ProjectTest.test_id).where(ProjectTest.project_id == project.id)
+        ))
+        to_add = wanted - current
+        to_remove = current - wanted
+
+        try:
+            if to_add:
+                db.session.execute(
+                    insert(ProjectTest.__table__),
+                    [{"project_id": project.id, "test_id": test_id}
+                     for test_id in sorted(to_add)],
+                )
+            if to_remove:
+                db.session.execute(
+                    delete(ProjectTest).where(ProjectTest.project_id == project.id,
+                                              ProjectTest.test_id.in_(to_remove))
+                )
+            if to_add or to_remove:
+                # Core statements skip the ORM version and statistics events
+                bump_versions(ProjectModel, {project.id})
+                bump_versions(TestModel, to_add | to_remove)
+                update_company_stats({project.company_id:
+                                      {"link_count": len(to_add) - len(to_remove)}})
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            abort(409, message="The Tests of this Project were changed by another "
+                               "request, try again.")
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while linking the Tests.")
+
+        query = eager_load(ProjectModel.query, ProjectSchema, ProjectModel)
+        return query.get(project.id)
+
+
 @test_blp.route("/test/<string:test_id>")
 class Test(MethodView):
     """Test Resource:
@@ -156,13 +264,23 @@ class Test(MethodView):
     class represents the Test resource. It contains methods for handling
     HTTP GET and DELETE requests at the /test/<test_id> endpoint.
     """
+    @test_blp.alt_response(304, description="Not Modified: If-None-Match has the current ETag.")
+    @test_blp.arguments(FieldsArgsSchema, location="query")
     @test_blp.response(200, TestSchema)
-    def get(self, test_id):
+    def get(self, field_args, test_id):
         """Get info on a Test by ID:
 
         Method handles the HTTP GET request at the /test/<test_id> endpoint.
 
+        The response has a strong ETag built from the test's row version.
+        If the request's If-None-Match header matches it, a 304 (Not
+        Modified) is returned before the test is loaded and serialized.
+
+        Use the 'fields' and 'expand' query arguments to only return some
+        of the test's fields, e.g. '?fields=id,name&expand=projects'.
+
         Args:
+            field_args (dict): The 'fields' and 'expand' query arguments.
             test_id (str): The ID of the test to retrieve.
 
         Returns:
@@ -171,8 +289,16 @@ class Test(MethodView):
         Raises:
             HTTPException: If a test with the given ID does not exist (HTTP 404).
         """
-        test = TestModel.query.get_or_404(test_id)
-        return test
+        version = current_version(TestModel, test_id)
+        if version is None:
+            abort(404)
+        schema = sparse_schema(TestSchema, field_args)
+        etag = resource_etag("tests", test_id, version, field_args)
+        check_not_modified(etag)
+
+        query = sparse_load(TestModel.query, TestSchema, TestModel, schema)
+        test = query.get_or_404(test_id)
+        return sparse_response(test, schema), 200, etag_headers(etag)
 
     # Swagger UI documentation
     @test_blp.response(
@@ -228,4 +354,33 @@ class Test(MethodView):
             400,
             message="Could not delete Test. Make sure Test is not associated "
                     "with any Projects, then try again.",
-        )
\ No newline at end of file
+        )
+
+
+@test_blp.route("/test/export")
+class TestExport(MethodView):
+    """TestExport Resource:
+
+    Class TestExport resource. Contains a method for handling
+    HTTP GET requests at the /test/export endpoint.
+    """
+    @test_blp.arguments(ExportArgsSchema, location="query")
+    @test_blp.response(200, description="Streamed list of all tests, one "
+                                         "JSON object per line.")
+    def get(self, export_args):
+        """Export all Tests:
+
+        Method handles the HTTP GET request at the /test/export endpoint.
+
+        Streams every test of every company, serialized with TestSchema, as
+        NDJSON (default) or as a JSON array with '?format=json'.
+
+        Args:
+            export_args (dict): The 'format' query argument.
+
+        Returns:
+            Response: A chunked streaming response.
+        """
+        query = eager_load(TestModel.query, TestSchema, TestModel)
+        return stream_export(query.order_by(TestModel.id), TestSchema(),
+                             export_args["format"])
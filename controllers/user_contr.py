@@ -3,9 +3,10 @@ from datetime import timedelta
 from flask import jsonify
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from passlib.hash import pbkdf2_sha256
 from flask_jwt_extended import (
     create_access_token,
+    create_refresh_token,
+    get_jwt,
     get_jwt_identity,
     jwt_required
 )
@@ -14,6 +15,9 @@ from flask_jwt_extended import (
 from init import db
 from models import UserModel
 from schemas import UserSchema
+from hashing import hash_password, verify_password
+from blocklist import blocklist
+from user_cache import current_cached_user
 
 
 user_blp = Blueprint("Users", __name__, description="Operations on users")
@@ -48,7 +52,7 @@ class UserRegister(MethodView):
 
         user = UserModel(
             username=user_data["username"],
-            password=pbkdf2_sha256.hash(user_data["password"]),
+            password=hash_password(user_data["password"]),
             email=user_data["email"],
             is_admin=user_data.get("is_admin", False),
             company_id=user_data.get("company_id", None)
@@ -79,7 +83,7 @@ class UserLogin(MethodView):
             user_data (dict): The data of the user to be logged in.
 
         Returns:
-            dict: An access token for the logged in user.
+            dict: An access token and a refresh token for the logged in user.
 
         Raises:
             HTTPException: If the username or password is incorrect (HTTP 401).
@@ -89,8 +93,17 @@ class UserLogin(MethodView):
 
         # Check if the user exists and the password is correct:
         #   For the body of the if statement to run, the user must exist then
-        #   verify the password making sure it is valid.
-        if user and pbkdf2_sha256.verify(user_data["password"], user.password):
+        #   verify the password making sure it is valid. The hash is checked
+        #   in the hashing worker pool, and is replaced if it was made with
+        #   an out of date number of rounds.
+        valid = False
+        if user:
+            valid, new_hash = verify_password(user_data["password"], user.password)
+            if new_hash:
+                user.password = new_hash
+                db.session.commit()
+
+        if valid:
             # Pass in the user's identity in which case is the user's ID
             additional_claims = {"is_admin": user.is_admin}
             # access_token = create_access_token(identity=user.id, fresh=True)
@@ -98,12 +111,80 @@ class UserLogin(MethodView):
                                                additional_claims=additional_claims,
                                                expires_delta=timedelta(seconds=300),
                                                fresh=True)
-            return {"access_token": access_token}, 200
+            # Long-lived refresh token, exchanged at /refresh for new access
+            #   tokens without logging in (and hashing the password) again.
+            refresh_token = create_refresh_token(identity=user.id,
+                                                 additional_claims=additional_claims,
+                                                 expires_delta=timedelta(days=1))
+            return {"access_token": access_token,
+                    "refresh_token": refresh_token}, 200
 
         abort(401, message="Invalid credentials.")
 
 
 
+# --------------------------- TOKEN REFRESH -------------------------------- #
+
+@user_blp.route("/refresh")
+class TokenRefresh(MethodView):
+    """Token Refresh Resource:
+
+    Class TokenRefresh resource. Contains a method for handling
+    HTTP POST requests at the /refresh endpoint.
+    """
+    @jwt_required(refresh=True)
+    @user_blp.doc(security=[{"jwt": []}])
+    def post(self):
+        """Get a new access token with a refresh token:
+
+        Method handles the HTTP POST request at the /refresh endpoint.
+
+        The refresh token from /login is sent as the Bearer token. The new
+        access token is built from the refresh token's own claims (identity
+        and 'is_admin'), so no database query or password hashing is needed.
+        The new access token is not fresh.
+
+        Returns:
+            dict: A new access token.
+        """
+        additional_claims = {"is_admin": get_jwt()["is_admin"]}
+        access_token = create_access_token(identity=get_jwt_identity(),
+                                           additional_claims=additional_claims,
+                                           expires_delta=timedelta(seconds=300),
+                                           fresh=False)
+        return {"access_token": access_token}, 200
+
+
+
+# --------------------------- USER LOGOUT ---------------------------------- #
+
+@user_blp.route("/logout")
+class UserLogout(MethodView):
+    """User Logout Resource:
+
+    Class UserLogout resource. Contains a method for handling
+    HTTP POST requests at the /logout endpoint.
+    """
+    @jwt_required(verify_type=False)
+    @user_blp.doc(security=[{"jwt": []}])
+    def post(self):
+        """Logout a User or Admin:
+
+        Method handles the HTTP POST request at the /logout endpoint.
+
+        Revokes the token sent as the Bearer token by adding it to the
+        blocklist. Works with access and refresh tokens, so call it with
+        each to revoke both. The entry expires with the token.
+
+        Returns:
+            dict: A message indicating the token was revoked.
+        """
+        jwt_payload = get_jwt()
+        blocklist.revoke(jwt_payload["jti"], jwt_payload["exp"])
+        return {"message": "Successfully logged out."}, 200
+
+
+
 # -------------- TESTING ONLY - NOT FOR PRODUCTION APP --------------------- #
 
 @user_blp.route("/user/<int:user_id>")
@@ -157,15 +238,14 @@ class User(MethodView):
                            or if the current user is trying to delete themselves (HTTP 403)
                            or if a user with the given ID does not exist (HTTP 404).
         """
-        current_user_id = get_jwt_identity()
-        current_user = UserModel.query.get(current_user_id)
-
+        # Usually served from the user cache without any SQL
+        current_user = current_cached_user()
         # user = UserModel.query.get_or_404(user_id)
         if not current_user.is_admin:
             abort(403, message="Only admins can delete users.")
 
         # Prevent admins from deleting themselves
-        if current_user_id == user_id:
+        if current_user.id == user_id:
             abort(403,
                   message="Oops! You can't delete yourself!. Ask the "
                           "Superuser to do it for you."
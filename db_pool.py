@@ -0,0 +1,259 @@
+# Database connection pool settings, statement timeout and pool metrics
+
+# Library and Package imports
+import math
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Local imports
+from init import db
+from metrics import COLLECTORS, Histogram
+
+# Every engine (the primary and the replicas of routing.py) gets the same
+# pool settings. Unset variables keep SQLAlchemy's defaults (5 connections,
+# 10 overflow, 30s checkout timeout, no recycle, no pre-ping).
+#
+# The pool metrics are served at /metrics, labelled by bind ('primary',
+# 'replica_0', ...):
+#   - db_pool_checkout_wait_seconds: time spent getting a connection from
+#     the pool, i.e. waiting for a free one or opening a new one,
+#   - db_pool_connections_in_use / _idle / _overflow: connections checked
+#     out, waiting in the pool, and open beyond the pool size, at scrape time,
+#   - db_pool_*_total: connections opened (and those beyond the pool size),
+#     invalidated (e.g. failed pre-ping), and checkouts that timed out.
+
+# Environment variables setting the create_engine() pool arguments
+POOL_SETTINGS = (
+    ("DATABASE_POOL_SIZE", "pool_size", int),
+    ("DATABASE_MAX_OVERFLOW", "max_overflow", int),
+    ("DATABASE_POOL_TIMEOUT", "pool_timeout", int),
+    ("DATABASE_POOL_RECYCLE", "pool_recycle", int),
+    ("DATABASE_POOL_PRE_PING", "pool_pre_ping", lambda value: value.lower() == "true"),
+)
+
+# Checkout waits are usually well under a millisecond, so finer buckets
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CHECKOUT_WAIT = Histogram("db_pool_checkout_wait_seconds",
+                          "Time spent checking a connection out of the pool.",
+                          WAIT_BUCKETS, ("bind",))
+
+_COUNTERS = (
+    ("connects", "db_pool_connects_total", "Connections opened."),
+    ("overflows", "db_pool_overflow_connects_total",
+     "Connections opened beyond the pool size."),
+    ("invalidations", "db_pool_invalidations_total", "Connections invalidated."),
+    ("timeouts", "db_pool_checkout_timeouts_total",
+     "Checkouts that timed out waiting for a connection."),
+)
+
+_engines = {}                               # bind label -> engine
+_counts = defaultdict(lambda: defaultdict(int))   # bind label -> name -> count
+_counts_lock = threading.Lock()
+_timed_classes = {}
+
+
+def engine_options(environ):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DATABASE_POOL_* variables:
+
+    Args:
+        environ (Mapping): The environment, e.g. os.environ.
+
+    Returns:
+        dict: create_engine() arguments of the variables that are set.
+    """
+    return {argument: convert(environ[name])
+            for name, argument, convert in POOL_SETTINGS if environ.get(name)}
+
+
+def _count(label, name, delta=1):
+    with _counts_lock:
+        _counts[label][name] += delta
+
+
+def _timed_pool_class(pool_class, label):
+    """Subclass of a pool class timing every checkout:
+
+    Pools have no event for the start of a checkout, so the wait is timed
+    around _do_get(). The class is given to create_engine() as 'poolclass'
+    (see timed_pool_options()), and is kept when the pool is recreated
+    (e.g. by engine.dispose()), and so is the bind label it carries.
+    """
+    key = (pool_class, label)
+    if key not in _timed_classes:
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return pool_class._do_get(self)
+            except PoolTimeoutError:
+                _count(label, "timeouts")
+                raise
+            finally:
+                CHECKOUT_WAIT.observe(time.perf_counter() - start, label)
+
+        _timed_classes[key] = type(f"Timed{pool_class.__name__}", (pool_class,),
+                                   {"_do_get": _do_get})
+    return _timed_classes[key]
+
+
+def timed_pool_options(uri, label):
+    """Return the create_engine() arguments timing the checkouts of an engine's pool:
+
+    The pool class is the one the engine would get for the URI (e.g.
+    QueuePool, or NullPool for async SQLite), subclassed to time its
+    checkouts under the bind label. SQLite :memory: databases get a
+    StaticPool from Flask-SQLAlchemy instead, which isn't timed.
+
+    Args:
+        uri (str or URL): The database URI of the engine.
+        label (str): The bind label of the pool metrics, e.g. 'primary'.
+
+    Returns:
+        dict: The 'poolclass' argument.
+    """
+    url = make_url(uri)
+    return {"poolclass": _timed_pool_class(url.get_dialect().get_pool_class(url), label)}
+
+
+def time_pool_checkouts(app):
+    """Give every engine of the app a pool class timing its checkouts:
+
+    Adds the timed pool classes (see timed_pool_options()) to the engine
+    options of the primary database and of each bind, so Flask-SQLAlchemy
+    creates the engines with them. Must be called before db.init_app(), and
+    only does anything with METRICS_ENABLED.
+    """
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI")
+    if uri:
+        options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        options.update(timed_pool_options(uri, "primary"))
+
+    binds = app.config.get("SQLALCHEMY_BINDS") or {}
+    for key, bind in binds.items():
+        bind = bind if isinstance(bind, dict) else {"url": bind}
+        binds[key] = {**bind, **timed_pool_options(bind["url"], key)}
+
+
+def instrument_engine(engine, label):
+    """Count the events of an engine's pool for /metrics:
+
+    The checkout waits are timed by the engine's pool class, see
+    timed_pool_options().
+    """
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        _count(label, "connects")
+        # The pool counts overflow from -pool_size, so > 0 is past the pool size
+        if _pool_stat(engine.pool, "overflow") > 0:
+            _count(label, "overflows")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        _count(label, "in_use")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        _count(label, "in_use", -1)
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        _count(label, "invalidations")
+
+    _engines[label] = engine
+
+
+def set_statement_timeout(engine, timeout_ms):
+    """Cancel statements running for longer than timeout_ms:
+
+    PostgreSQL has a statement_timeout setting. SQLite doesn't, so a
+    progress handler interrupts a statement once its deadline has passed;
+    the deadline covers the execute() call, i.e. until the first row is
+    ready, not the time spent fetching the rest of the rows. The async
+    SQLite driver (aiosqlite) has no progress handler, so it gets no limit.
+    """
+    seconds = timeout_ms / 1000
+
+    if engine.dialect.name == "postgresql":
+        @event.listens_for(engine, "connect")
+        def _set_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+            cursor.close()
+            # SET is undone by a rollback, so it's committed straight away
+            dbapi_connection.commit()
+
+    elif engine.dialect.name == "sqlite" and not engine.dialect.is_async:
+        @event.listens_for(engine, "connect")
+        def _set_progress_handler(dbapi_connection, connection_record):
+            deadline = connection_record.info["statement_deadline"] = [math.inf]
+            dbapi_connection.set_progress_handler(
+                lambda: time.monotonic() > deadline[0], 1000)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _start_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info["statement_deadline"][0] = time.monotonic() + seconds
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _clear_deadline(conn, cursor, statement, parameters, context, executemany):
+            conn.info["statement_deadline"][0] = math.inf
+
+
+def _pool_stat(pool, name):
+    # Only QueuePool has all of these, e.g. SQLite :memory: pools don't
+    method = getattr(pool, name, None)
+    return method() if callable(method) else 0
+
+
+def render_pool_metrics():
+    """Return the pool metrics in the Prometheus text format."""
+    lines = [CHECKOUT_WAIT.render()]
+    with _counts_lock:
+        counts = {label: dict(values) for label, values in _counts.items()}
+
+    gauges = (
+        ("db_pool_connections_in_use", "Connections checked out of the pool.",
+         lambda label, pool: counts.get(label, {}).get("in_use", 0)),
+        ("db_pool_connections_idle", "Connections waiting in the pool.",
+         lambda label, pool: _pool_stat(pool, "checkedin")),
+        ("db_pool_connections_overflow", "Connections open beyond the pool size.",
+         lambda label, pool: max(_pool_stat(pool, "overflow"), 0)),
+        ("db_pool_size", "Size of the pool.",
+         lambda label, pool: _pool_stat(pool, "size")),
+    )
+    for name, documentation, value in gauges:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+        lines += [f'{name}{{bind="{label}"}} {value(label, engine.pool)}'
+                  for label, engine in sorted(_engines.items())]
+
+    for key, name, documentation in _COUNTERS:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{bind="{label}"}} {counts.get(label, {}).get(key, 0)}'
+                  for label in sorted(_engines)]
+    return "\n".join(lines)
+
+
+def init_db_pool(app):
+    """Set up the statement timeout and pool metrics of every engine of the app:
+
+    DATABASE_STATEMENT_TIMEOUT_MS (0 for none) applies to every statement,
+    including those of CLI commands. The pool metrics are only collected
+    with METRICS_ENABLED.
+    """
+    timeout_ms = app.config.get("DATABASE_STATEMENT_TIMEOUT_MS", 0)
+    metrics_enabled = app.config.get("METRICS_ENABLED", True)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if timeout_ms:
+                set_statement_timeout(engine, timeout_ms)
+            if metrics_enabled:
+                instrument_engine(engine, key or "primary")
+
+    if metrics_enabled and render_pool_metrics not in COLLECTORS:
+        COLLECTORS.append(render_pool_metrics)
@@ -0,0 +1,41 @@
+# ETags of the company, project and test resources
+
+# Library and Package imports
+import hashlib
+import json
+from flask import Response, abort, request
+from werkzeug.http import quote_etag
+
+
+def resource_etag(name, row_id, version, field_args):
+    """Return the strong ETag of a company, project or test:
+
+    The ETag is a hash of the row version (see models/versioning.py) and
+    the 'fields' and 'expand' query arguments, so it changes with every
+    write that shows in the JSON, and each representation has its own. The
+    Flask views and the async views (see controllers/async_contr.py) both
+    build it here, so they return the same ETag for the same resource.
+
+    Args:
+        name (str): The table of the resource, e.g. 'projects'.
+        row_id: The ID of the resource.
+        version (int): The row version of the resource.
+        field_args (dict): The 'fields' and 'expand' query arguments.
+
+    Returns:
+        str: The ETag, unquoted.
+    """
+    data = json.dumps([name, str(row_id), version,
+                       field_args.get("fields_"), field_args.get("expand")])
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def etag_headers(etag):
+    """Return the response headers of an ETag."""
+    return {"ETag": quote_etag(etag)}
+
+
+def check_not_modified(etag):
+    """Abort with a 304 (Not Modified) if the request's If-None-Match has the ETag."""
+    if etag in request.if_none_match:
+        abort(Response(status=304, headers=etag_headers(etag)))
@@ -0,0 +1,51 @@
+# Filtering and sorting of the list endpoints
+
+# Library and Package imports
+import operator
+
+# Range filter suffixes: 'budget_min=1000' becomes 'WHERE budget >= 1000'
+RANGE_SUFFIXES = {"_min": operator.ge, "_max": operator.le}
+
+
+def apply_filters(query, model, filter_args):
+    """Add a WHERE clause for each filter query argument:
+
+    The argument schema (e.g. ProjectFilterArgsSchema) is the allow-list of
+    filters, so only its fields ever reach here. Each argument is compared
+    for equality with the model column of the same name, except the '_min'
+    and '_max' arguments which set the bounds of a range on their column.
+
+    Args:
+        query: The SQLAlchemy query (or dynamic relationship) to filter.
+        model: The SQLAlchemy model being queried.
+        filter_args (dict): The parsed filter and 'sort' query arguments.
+
+    Returns:
+        The filtered query.
+    """
+    for name, value in filter_args.items():
+        if name == "sort" or value is None:
+            continue
+
+        column, compare = name, operator.eq
+        for suffix, range_compare in RANGE_SUFFIXES.items():
+            if name.endswith(suffix):
+                column, compare = name[:-len(suffix)], range_compare
+
+        query = query.filter(compare(getattr(model, column), value))
+    return query
+
+
+def sort_column(model, sort):
+    """Turn a 'sort' query argument into a column and direction:
+
+    Args:
+        model: The SQLAlchemy model being queried.
+        sort (str): A column name, prefixed with '-' to sort in descending
+                    order, e.g. '-budget'. Validated by the argument schema.
+
+    Returns:
+        tuple: The column to sort on and True for descending order.
+    """
+    descending = sort.startswith("-")
+    return getattr(model, sort.lstrip("-")), descending
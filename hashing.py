@@ -0,0 +1,112 @@
+# Password hashing service
+
+# Library and Package imports
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from passlib.hash import pbkdf2_sha256
+
+# pbkdf2 is CPU-bound, so hashing on the request thread pins the worker and
+# cheap requests queue up behind every login. The hashes are computed in a
+# pool of worker processes instead: the request thread just waits on the
+# result (releasing the GIL) and other requests keep being served.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _hasher(rounds):
+    return pbkdf2_sha256.using(rounds=rounds) if rounds else pbkdf2_sha256
+
+
+def _hash(password, rounds):
+    return _hasher(rounds).hash(password)
+
+
+def _verify(password, password_hash, rounds):
+    """Verify a password, and rehash it if the rounds have changed:
+
+    Returns:
+        tuple: (True/False, the new hash or None).
+    """
+    hasher = _hasher(rounds)
+    if not hasher.verify(password, password_hash):
+        return False, None
+    if hasher.needs_update(password_hash):
+        return True, hasher.hash(password)
+    return True, None
+
+
+def _config(key, default):
+    try:
+        return current_app.config.get(key, default)
+    except RuntimeError:    # Outside of an app context
+        return default
+
+
+def _get_pool():
+    """Return the worker pool, or None to hash on the calling thread:
+
+    The pool is created on first use with PASSWORD_HASH_WORKERS processes.
+    Set it to 0 to hash inline (e.g. when debugging).
+    """
+    global _pool
+    workers = _config("PASSWORD_HASH_WORKERS", os.cpu_count())
+    if not workers:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def _run(func, *args):
+    pool = _get_pool()
+    if pool is None:
+        return func(*args)
+    return pool.submit(func, *args).result()
+
+
+def hash_password(password):
+    """Hash a password with pbkdf2_sha256 in the worker pool:
+
+    The number of rounds comes from PASSWORD_HASH_ROUNDS (passlib's default
+    if not set).
+
+    Args:
+        password (str): The plain text password.
+
+    Returns:
+        str: The password hash.
+    """
+    return _run(_hash, password, _config("PASSWORD_HASH_ROUNDS", None))
+
+
+def verify_password(password, password_hash):
+    """Verify a password against its hash in the worker pool:
+
+    If the hash was made with a different number of rounds than the current
+    PASSWORD_HASH_ROUNDS, a new hash is also computed so the caller can
+    store it, so existing hashes move over transparently as users log in.
+
+    Args:
+        password (str): The plain text password.
+        password_hash (str): The stored pbkdf2_sha256 hash.
+
+    Returns:
+        tuple: True if the password is valid (else False), and the new hash
+               to store, or None if the stored hash is up to date.
+    """
+    return _run(_verify, password, password_hash,
+                _config("PASSWORD_HASH_ROUNDS", None))
+
+
+def shutdown_pool():
+    """Stop the worker processes (used by benchmarks and tools)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
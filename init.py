@@ -1,4 +1,20 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-# SQLAlchemy database object
-db = SQLAlchemy()
\ No newline at end of file
+# Local imports
+from routing import RoutingSession
+
+# SQLAlchemy database object, reading from a replica in GET requests (routing.py)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+# SQLite only enforces foreign keys, and runs their ON DELETE CASCADE
+#   actions, when they are turned on for each connection.
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
\ No newline at end of file
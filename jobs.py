@@ -0,0 +1,250 @@
+# Background jobs: a small queue of database jobs run by worker threads
+
+# Library and Package imports
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import and_, delete, or_, select, update
+
+# Local imports
+from init import db
+from models import CompanyModel, ProjectModel, TestModel, ProjectTest, UserModel, JobModel
+from models.versioning import bump_versions
+from models.stats import update_company_stats
+from user_cache import user_cache
+
+# Jobs are rows in the jobs table, so they outlive the process that queued
+# them. A job is claimed with a conditional UPDATE (so only one worker runs
+# it), works through its rows in batches, and saves its progress with each
+# batch in the same transaction. Each batch only deletes rows that still
+# exist, so a job that is interrupted can simply be run again: a running job
+# that hasn't saved progress for JOB_LEASE_SECONDS is considered abandoned,
+# and 'flask db jobs-resume' (or queueing it again) picks it up.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _config(key, default):
+    return current_app.config.get(key, default)
+
+
+def _get_executor():
+    """Return the worker threads, or None to run jobs on the calling thread:
+
+    The threads are started on first use, JOB_WORKERS of them. Set it to 0
+    to run jobs inline (e.g. when debugging).
+    """
+    global _executor
+    workers = _config("JOB_WORKERS", 1)
+    if not workers:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=workers,
+                                               thread_name_prefix="job")
+    return _executor
+
+
+def _save_progress(job, key, count):
+    # Assign a new dict: in-place changes to a JSON column aren't tracked
+    job.progress = {**job.progress, key: job.progress.get(key, 0) + count}
+    job.updated_at = _utcnow()
+
+
+def _delete_in_batches(job, model, company_id, batch_size):
+    """Delete the rows of a model in a company, one batch per transaction.
+
+    The Core DELETEs skip the ORM version and statistics events, so each
+    batch also bumps the company's version and takes its rows off the
+    company's statistics. The company's ETag and /company/<id>/stats then
+    follow the job as it runs.
+    """
+    table = model.__table__
+    columns = [table.c.id, *([table.c.budget] if model is ProjectModel else [])]
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(table.c.company_id == company_id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        ids = [row.id for row in rows]
+        db.session.execute(delete(table).where(table.c.id.in_(ids)))
+        bump_versions(CompanyModel, {company_id})
+        if model is ProjectModel:
+            update_company_stats({company_id: {
+                "project_count": -len(rows),
+                "total_budget": -sum(row.budget for row in rows)}})
+        elif model is TestModel:
+            update_company_stats({company_id: {"test_count": -len(rows)}})
+        _save_progress(job, table.name, len(ids))
+        db.session.commit()
+        if model is UserModel:
+            for user_id in ids:
+                user_cache.invalidate(user_id)
+
+
+def _delete_links(job, company_id, batch_size):
+    """Delete the links of a company's projects and tests, one batch per transaction.
+
+    Links count towards the statistics of their project's company (this
+    company, or another one for a link to one of this company's tests), so
+    those are updated, and the linked projects and tests are bumped.
+    """
+    links = ProjectTest.__table__
+    condition = or_(
+        links.c.project_id.in_(select(ProjectModel.id).where(ProjectModel.company_id == company_id)),
+        links.c.test_id.in_(select(TestModel.id).where(TestModel.company_id == company_id)),
+    )
+    while True:
+        rows = db.session.execute(
+            select(links.c.id, links.c.project_id, links.c.test_id, ProjectModel.company_id)
+            .outerjoin(ProjectModel, ProjectModel.id == links.c.project_id)
+            .where(condition).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+
+        db.session.execute(delete(links).where(links.c.id.in_([row.id for row in rows])))
+        bump_versions(ProjectModel, {row.project_id for row in rows})
+        bump_versions(TestModel, {row.test_id for row in rows})
+        companies = Counter(row.company_id for row in rows if row.company_id is not None)
+        update_company_stats({linked: {"link_count": -count}
+                              for linked, count in companies.items()})
+        _save_progress(job, links.name, len(rows))
+        db.session.commit()
+
+
+def delete_company(job):
+    """Job deleting a company with its links, tests, projects and users:
+
+    Rows are deleted with set-based DELETE statements of JOB_BATCH_SIZE rows
+    each, children first, and the company itself last. The foreign keys are
+    ON DELETE CASCADE, so a single DELETE of the company would remove
+    everything too, but in one long transaction holding locks on every row.
+    Rows added to the company while the job runs are removed by the cascade.
+    """
+    company_id = job.target_id
+    batch_size = _config("JOB_BATCH_SIZE", 1000)
+
+    _delete_links(job, company_id, batch_size)
+    for model in (TestModel, ProjectModel, UserModel):
+        _delete_in_batches(job, model, company_id, batch_size)
+
+    deleted = db.session.execute(delete(CompanyModel.__table__).where(
+        CompanyModel.id == company_id)).rowcount
+    _save_progress(job, CompanyModel.__tablename__, deleted)
+    db.session.commit()
+
+
+# Job kinds and the functions running them
+JOB_HANDLERS = {
+    "delete_company": delete_company,
+}
+
+
+def run_job(job_id):
+    """Claim and run a job, if it is queued or was abandoned by its worker:
+
+    Args:
+        job_id (int): The ID of the job.
+
+    Returns:
+        bool: True if the job was run, False if another worker has it or
+              it has already finished.
+    """
+    now = _utcnow()
+    stale = now - timedelta(seconds=_config("JOB_LEASE_SECONDS", 300))
+    claimed = db.session.execute(
+        update(JobModel)
+        .where(JobModel.id == job_id,
+               or_(JobModel.status == "queued",
+                   and_(JobModel.status == "running", JobModel.updated_at < stale)))
+        .values(status="running", updated_at=now)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return False
+
+    job = db.session.get(JobModel, job_id)
+    try:
+        JOB_HANDLERS[job.kind](job)
+        job.status = "done"
+    except Exception as error:
+        current_app.logger.exception("Job %s (%s) failed", job_id, job.kind)
+        db.session.rollback()
+        job = db.session.get(JobModel, job_id)
+        job.status = "failed"
+        job.error = str(error)
+    job.updated_at = job.finished_at = _utcnow()
+    db.session.commit()
+    return True
+
+
+def _run_in_app(app, job_id):
+    with app.app_context():
+        run_job(job_id)
+
+
+def enqueue_job(kind, target_id):
+    """Queue a job and start it in the background:
+
+    If a job of the same kind for the same target is already queued or
+    running, that job is returned instead of queueing a second one.
+
+    Args:
+        kind (str): The kind of job, a key of JOB_HANDLERS.
+        target_id (int): The ID of the row the job works on.
+
+    Returns:
+        JobModel: The queued (or already pending) job.
+    """
+    job = JobModel.query.filter(JobModel.kind == kind, JobModel.target_id == target_id,
+                                JobModel.status.in_(("queued", "running"))).first()
+    if job is not None:
+        return job
+
+    now = _utcnow()
+    job = JobModel(kind=kind, target_id=target_id, status="queued", progress={},
+                   created_at=now, updated_at=now)
+    db.session.add(job)
+    db.session.commit()
+
+    executor = _get_executor()
+    if executor is None:
+        run_job(job.id)
+    else:
+        executor.submit(_run_in_app, current_app._get_current_object(), job.id)
+    return job
+
+
+def resume_jobs():
+    """Run the queued jobs and the running jobs abandoned by their worker:
+
+    Returns:
+        int: The number of jobs run.
+    """
+    stale = _utcnow() - timedelta(seconds=_config("JOB_LEASE_SECONDS", 300))
+    job_ids = db.session.scalars(
+        select(JobModel.id)
+        .where(or_(JobModel.status == "queued",
+                   and_(JobModel.status == "running", JobModel.updated_at < stale)))
+        .order_by(JobModel.id)
+    ).all()
+    return sum(run_job(job_id) for job_id in job_ids)
+
+
+def shutdown_jobs():
+    """Wait for the running jobs and stop the worker threads (used by tools)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
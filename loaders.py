@@ -0,0 +1,91 @@
+# Eager-loading strategies picked from the marshmallow schemas
+
+# Library and Package imports
+from functools import lru_cache
+from marshmallow import fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def _nested_schema(field):
+    """Return the nested schema of a Nested or List(Nested) field, or None."""
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+
+def relationship_options(schema, model):
+    """Walk the dump fields of a schema and build the loader options:
+
+    Every nested field that maps onto a relationship of the model gets an
+    eager loader. Many-to-one relationships (e.g. project.company) are
+    loaded with a JOIN in the same statement, and collections (e.g.
+    project.tests) are loaded with one extra 'SELECT ... WHERE id IN (...)'
+    statement for the whole page. Nested schemas are walked recursively so
+    that their own nested fields are also covered.
+
+    Relationships declared with lazy="dynamic" are queries rather than
+    collections and can't be eager loaded, so they are skipped.
+    """
+    mapper = inspect(model)
+    options = []
+
+    for name, field in schema.dump_fields.items():
+        nested = _nested_schema(field)
+        if nested is None:
+            continue
+
+        relationship = mapper.relationships.get(field.attribute or name)
+        if relationship is None or relationship.lazy == "dynamic":
+            continue
+
+        attribute = getattr(model, relationship.key)
+        if relationship.uselist:
+            loader = selectinload(attribute)
+        else:
+            loader = joinedload(attribute)
+
+        child_options = relationship_options(nested, relationship.mapper.class_)
+        if child_options:
+            loader = loader.options(*child_options)
+        options.append(loader)
+
+    return options
+
+
+@lru_cache(maxsize=None)
+def eager_options(schema_cls, model):
+    """Loader options needed to dump a model with a schema class:
+
+    The options only depend on the schema class and the model, so they are
+    worked out once and cached.
+
+    Args:
+        schema_cls: The marshmallow schema class the rows will be dumped with.
+        model: The SQLAlchemy model being queried.
+
+    Returns:
+        tuple: SQLAlchemy loader options to pass to Query.options().
+    """
+    return tuple(relationship_options(schema_cls(), model))
+
+
+def eager_load(query, schema_cls, model):
+    """Add the eager loader options for a schema to a query:
+
+    Serializing a list of N projects with ProjectSchema would otherwise run
+    one SELECT for the projects plus one per project for its company and one
+    per project for its tests (2N+1 statements). With the loader options it
+    runs a fixed number of statements however many rows are returned.
+
+    Args:
+        query: The SQLAlchemy query (or dynamic relationship) to load from.
+        schema_cls: The marshmallow schema class the rows will be dumped with.
+        model: The SQLAlchemy model being queried.
+
+    Returns:
+        The query with the loader options applied.
+    """
+    return query.options(*eager_options(schema_cls, model))
@@ -0,0 +1,166 @@
+# Per-request instrumentation: Server-Timing headers and Prometheus metrics
+
+# Library and Package imports
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds, in seconds (durations) and statements (queries)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """Minimal Prometheus histogram with labels:
+
+    Only keeps a count per bucket and the sum per label set, so observing
+    a value is a few dictionary updates under a lock.
+    """
+    def __init__(self, name, documentation, buckets, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        """Return the histogram in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = ",".join(f'{name}="{value}"'
+                              for name, value in zip(self.label_names, label_values))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-1]:.6f}")
+        return "\n".join(lines)
+
+
+_LABELS = ("endpoint", "method")
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds",
+                             "Time spent handling the request.", DURATION_BUCKETS, _LABELS)
+DB_DURATION = Histogram("http_request_db_duration_seconds",
+                        "Time spent in SQL statements per request.", DURATION_BUCKETS, _LABELS)
+SERIALIZATION_DURATION = Histogram("http_request_serialization_duration_seconds",
+                                   "Time spent serializing the response per request.",
+                                   DURATION_BUCKETS, _LABELS)
+DB_QUERIES = Histogram("http_request_db_queries",
+                       "Number of SQL statements per request.", QUERY_BUCKETS, _LABELS)
+
+REGISTRY = [REQUEST_DURATION, DB_DURATION, SERIALIZATION_DURATION, DB_QUERIES]
+
+# Extra metric sources (e.g. pool metrics) that render their own text
+COLLECTORS = []
+
+
+def render_metrics():
+    """Return every registered metric in the Prometheus text format."""
+    parts = [metric.render() for metric in REGISTRY]
+    parts.extend(collector() for collector in COLLECTORS)
+    return "\n".join(parts) + "\n"
+
+
+def _timings():
+    """Return the timings of the current request, or None outside a request."""
+    if has_request_context():
+        return g.get("_timings")
+    return None
+
+
+class timed_serialization:
+    """Context manager timing serialization for the current request:
+
+    Nested uses (a schema dumping its nested schemas) are only counted once.
+    """
+    def __enter__(self):
+        timings = _timings()
+        self._outer = timings is not None and not timings["serializing"]
+        if self._outer:
+            timings["serializing"] = True
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._outer:
+            timings = _timings()
+            timings["serializing"] = False
+            timings["serialize"] += time.perf_counter() - self._start
+        return False
+
+
+# The start time is kept on the execution context of the statement, so a
+# statement that fails (no after_cursor_execute) leaves nothing behind
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    timings = _timings()
+    if timings is not None:
+        timings["queries"] += 1
+        timings["db"] += elapsed
+
+
+def _start_timer():
+    g._timings = {"start": time.perf_counter(), "queries": 0, "db": 0.0,
+                  "serialize": 0.0, "serializing": False}
+
+
+def _finish_timer(response):
+    timings = g.pop("_timings", None)
+    if timings is None:
+        return response
+
+    total = time.perf_counter() - timings["start"]
+    labels = (request.url_rule.rule if request.url_rule else "<unmatched>", request.method)
+
+    REQUEST_DURATION.observe(total, *labels)
+    DB_DURATION.observe(timings["db"], *labels)
+    SERIALIZATION_DURATION.observe(timings["serialize"], *labels)
+    DB_QUERIES.observe(timings["queries"], *labels)
+
+    response.headers["Server-Timing"] = ", ".join([
+        f'db;dur={timings["db"] * 1000:.2f};desc="{timings["queries"]} queries"',
+        f'serialize;dur={timings["serialize"] * 1000:.2f}',
+        f'handler;dur={total * 1000:.2f}',
+    ])
+    return response
+
+
+def init_metrics(app):
+    """Time every request of the app:
+
+    Adds a 'Server-Timing' header to each response with the SQL time (and
+    statement count), serialization time and total handler time, and adds
+    the same values to the histograms served at /metrics, labelled by URL
+    rule and method. Set METRICS_ENABLED to False to turn it off.
+    """
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    app.before_request(_start_timer)
+    app.after_request(_finish_timer)
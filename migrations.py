@@ -0,0 +1,260 @@
+# Schema migrations for databases created before a model change
+
+# Library and Package imports
+from sqlalchemy import MetaData, delete, func, inspect, select, text
+from sqlalchemy.schema import AddConstraint, CreateIndex, CreateTable
+
+# Local imports
+from init import db
+from models import (CompanyModel, ProjectModel, TestModel, ProjectTest, UserModel,
+                    CompanyStatsModel, TokenBlocklistModel)
+from models.project import PROJECT_KEY
+from models.search_index import rebuild_search_index
+
+# 'flask db create' builds new databases from the models, so it already
+# has every change. These functions bring an existing database up to date
+# without losing its data, and do nothing if it is already up to date.
+
+# Non-unique index of the duplicate project lookup, replaced by the unique key
+OLD_PROJECT_INDEX = "ix_projects_company_id_name_description"
+
+# Tables with a row version column for the ETags (see models/versioning.py)
+VERSIONED_TABLES = [
+    CompanyModel.__table__,
+    ProjectModel.__table__,
+    TestModel.__table__,
+]
+
+# Tables whose foreign keys are ON DELETE CASCADE, parents first
+CASCADE_TABLES = [
+    ProjectModel.__table__,
+    TestModel.__table__,
+    UserModel.__table__,
+    CompanyStatsModel.__table__,
+    ProjectTest.__table__,
+]
+
+
+def _orphans():
+    """DELETE statements for the rows whose parent row no longer exists."""
+    companies = select(CompanyModel.id)
+    statements = [
+        (model.__table__, delete(model.__table__).where(
+            model.company_id.is_not(None), model.company_id.not_in(companies)))
+        for model in (ProjectModel, TestModel, UserModel, CompanyStatsModel)
+    ]
+    links = ProjectTest.__table__
+    statements.append((links, delete(links).where(
+        links.c.project_id.not_in(select(ProjectModel.id))
+        | links.c.test_id.not_in(select(TestModel.id)))))
+    return statements
+
+
+def index_names(table_name):
+    """Return the names of the indexes of a table in the database:
+
+    SQLAlchemy's SQLite inspector skips expression indexes (like the unique
+    key of the projects), so SQLite's are read from sqlite_master.
+    """
+    if db.engine.dialect.name == "sqlite":
+        with db.engine.connect() as connection:
+            return set(connection.scalars(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+                {"table": table_name}))
+    return {index["name"] for index in inspect(db.engine).get_indexes(table_name)}
+
+
+def _check_duplicate_projects(connection):
+    """Raise a ValueError listing the first duplicate projects, if there are any."""
+    duplicates = connection.execute(
+        select(*PROJECT_KEY, func.count()).group_by(*PROJECT_KEY)
+        .having(func.count() > 1).limit(10)
+    ).all()
+    if duplicates:
+        listed = "; ".join(f"company {company_id}: {name!r} x{count}"
+                           for company_id, name, description, count in duplicates)
+        raise ValueError(f"Duplicate projects (first 10): {listed}. Rename or delete "
+                         f"them, then run the migration again.")
+
+
+def _needs_cascade(inspector, table):
+    return any((foreign_key.get("options") or {}).get("ondelete", "").upper() != "CASCADE"
+               for foreign_key in inspector.get_foreign_keys(table.name))
+
+
+def _rebuild_sqlite_table(connection, table):
+    """Recreate a SQLite table with the model's constraints, keeping its rows:
+
+    SQLite can't change the constraints of a table, so a new table is
+    created, the rows copied over, the old table dropped and the new one
+    renamed, and then the indexes are created again. Only the columns the
+    old table has are copied, so columns added to the model since (like the
+    row version) get their server defaults.
+    """
+    metadata = MetaData()
+    for other in db.metadata.sorted_tables:
+        other.to_metadata(metadata)
+    new_table = table.to_metadata(metadata, name=f"{table.name}__new")
+
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    columns = ", ".join(column.name for column in table.columns if column.name in existing)
+    connection.execute(CreateTable(new_table))
+    connection.exec_driver_sql(f"INSERT INTO {new_table.name} ({columns}) "
+                               f"SELECT {columns} FROM {table.name}")
+    connection.exec_driver_sql(f"DROP TABLE {table.name}")
+    connection.exec_driver_sql(f"ALTER TABLE {new_table.name} RENAME TO {table.name}")
+    for index in table.indexes:
+        connection.execute(CreateIndex(index))
+
+
+def _migrate_sqlite(tables, orphans):
+    connection = db.engine.connect()
+    try:
+        # Only takes effect outside a transaction, hence the explicit BEGIN
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.exec_driver_sql("BEGIN")
+        deleted = {table.name: connection.execute(statement).rowcount
+                   for table, statement in orphans}
+        for table in tables:
+            _rebuild_sqlite_table(connection, table)
+
+        problems = connection.exec_driver_sql("PRAGMA foreign_key_check").all()
+        if problems:
+            connection.rollback()
+            raise RuntimeError(f"Foreign key check failed: {problems[:10]}")
+        connection.commit()
+    finally:
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+        connection.close()
+    return deleted
+
+
+def _migrate_postgresql(tables, orphans):
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        deleted = {table.name: connection.execute(statement).rowcount
+                   for table, statement in orphans}
+        for table in tables:
+            for foreign_key in inspector.get_foreign_keys(table.name):
+                connection.exec_driver_sql(
+                    f'ALTER TABLE {table.name} DROP CONSTRAINT "{foreign_key["name"]}"')
+            for constraint in table.foreign_key_constraints:
+                connection.execute(AddConstraint(constraint))
+    return deleted
+
+
+def migrate_row_versions():
+    """Add the row version column of the companies, projects and tests:
+
+    The ETags of the companies, projects and tests are built from a version
+    column bumped on every write. Existing rows start at version 1, like
+    new ones.
+
+    Returns:
+        list: The names of the tables the column was added to.
+    """
+    inspector = inspect(db.engine)
+    tables = [table for table in VERSIONED_TABLES
+              if inspector.has_table(table.name)
+              and "version" not in {column["name"] for column in inspector.get_columns(table.name)}]
+    with db.engine.begin() as connection:
+        for table in tables:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    return [table.name for table in tables]
+
+
+def migrate_token_blocklist():
+    """Add the created_at column of the token blocklist:
+
+    Each process syncs the revoked tokens created since the newest one it
+    has seen (see blocklist.py). Existing rows get the current time, so
+    the next sync of every process loads them again. SQLite can't add a
+    column with a CURRENT_TIMESTAMP default, so its table is rebuilt.
+
+    Returns:
+        bool: True if the column was added, False if it already existed.
+    """
+    table = TokenBlocklistModel.__table__
+    inspector = inspect(db.engine)
+    if (not inspector.has_table(table.name)
+            or "created_at" in {column["name"] for column in inspector.get_columns(table.name)}):
+        return False
+
+    with db.engine.begin() as connection:
+        if db.engine.dialect.name == "sqlite":
+            _rebuild_sqlite_table(connection, table)
+        else:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN created_at TIMESTAMP NOT NULL "
+                f"DEFAULT CURRENT_TIMESTAMP")
+            existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+    return True
+
+
+def migrate_cascade_deletes():
+    """Make the foreign keys of an existing database ON DELETE CASCADE:
+
+    Rows left behind by earlier deletes (e.g. projects_tests rows of a
+    deleted project) would fail the new constraints, so they are deleted
+    first. PostgreSQL constraints are dropped and added again; SQLite
+    tables are rebuilt (which also recreates the full-text search triggers
+    of the projects and tests tables, so the search index is rebuilt).
+
+    Rebuilding the projects table creates their unique key, so duplicate
+    projects are reported first, as in migrate_project_key().
+
+    Returns:
+        tuple: The names of the migrated tables, and the number of orphaned
+               rows deleted per table.
+
+    Raises:
+        ValueError: If the projects table is rebuilt and has duplicate
+                    projects, listing the first ones.
+    """
+    inspector = inspect(db.engine)
+    tables = [table for table in CASCADE_TABLES
+              if inspector.has_table(table.name) and _needs_cascade(inspector, table)]
+    if not tables:
+        return [], {}
+
+    if db.engine.dialect.name == "sqlite":
+        if ProjectModel.__table__ in tables:
+            with db.engine.connect() as connection:
+                _check_duplicate_projects(connection)
+        deleted = _migrate_sqlite(tables, _orphans())
+        rebuild_search_index()
+    else:
+        deleted = _migrate_postgresql(tables, _orphans())
+    return [table.name for table in tables], deleted
+
+
+def migrate_project_key():
+    """Add the unique key of the projects to an existing database:
+
+    Projects are created with INSERT ... ON CONFLICT on their unique key
+    (company, name and description, see models/project.py), which needs
+    the unique index. It replaces the old non-unique index of the duplicate
+    lookup. Duplicate projects are reported rather than deleted, so they
+    can be renamed or deleted first.
+
+    Returns:
+        bool: True if the index was created, False if it already existed.
+
+    Raises:
+        ValueError: If there are duplicate projects, listing the first ones.
+    """
+    index = next(index for index in ProjectModel.__table__.indexes if index.unique)
+    existing = index_names(ProjectModel.__tablename__)
+    if index.name in existing:
+        return False
+
+    with db.engine.begin() as connection:
+        _check_duplicate_projects(connection)
+        if OLD_PROJECT_INDEX in existing:
+            connection.exec_driver_sql(f"DROP INDEX {OLD_PROJECT_INDEX}")
+        index.create(connection)
+    return True
@@ -2,4 +2,10 @@ from models.company import CompanyModel
 from models.project import ProjectModel
 from models.test import TestModel
 from models.project_test import ProjectTest
-from models.user import UserModel
\ No newline at end of file
+from models.user import UserModel
+from models.token_blocklist import TokenBlocklistModel
+from models.company_stats import CompanyStatsModel
+from models.job import JobModel
+import models.versioning  # Registers the row version session events
+import models.search_index  # Registers the full-text search index DDL
+import models.stats  # Registers the company statistics session events
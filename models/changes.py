@@ -0,0 +1,10 @@
+from sqlalchemy import inspect
+
+
+# Helpers for the session events that look at what a flush changes
+# (models/versioning.py and models/stats.py)
+
+def linked_ids(obj, attribute):
+    """IDs of the rows added to or removed from a collection since the last flush."""
+    history = inspect(obj).attrs[attribute].history
+    return {row.id for row in [*(history.added or ()), *(history.deleted or ())]}
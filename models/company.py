@@ -4,6 +4,13 @@ from init import db
 class CompanyModel(db.Model):
     __tablename__ = "companies"
 
+    # Filters and sorts of CompanyList.get, with the id as the keyset
+    #   pagination tie breaker.
+    __table_args__ = (
+        db.Index("ix_companies_industry_sector_id", "industry_sector", "id"),
+        db.Index("ix_companies_services_id", "services", "id"),
+    )
+
     # Primary key for Companies table
     id = db.Column(db.Integer, primary_key=True)
 
@@ -13,12 +20,23 @@ class CompanyModel(db.Model):
     industry_sector = db.Column(db.String(80), nullable=False)
     services = db.Column(db.String(80), nullable=False)
 
+    # Row version for ETags, bumped on every write (see models/versioning.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
 
-    # One-to-many relationship companies and projects
-    projects = db.relationship("ProjectModel", back_populates="company", lazy="dynamic")
+    # One-to-many relationship companies and projects:
+    #   Not "dynamic" so the projects can be eager loaded when a list of
+    #   companies is serialized with CompanySchema.
+    # The child foreign keys are ON DELETE CASCADE, and passive_deletes leaves
+    #   deleting the children to the database, so deleting a company doesn't
+    #   load its projects, tests and users.
+    projects = db.relationship("ProjectModel", back_populates="company",
+                               cascade="all, delete-orphan", passive_deletes=True)
 
     # One-to-many relationship companies and tests
-    tests = db.relationship("TestModel", back_populates="company", lazy="dynamic")
+    tests = db.relationship("TestModel", back_populates="company", lazy="dynamic",
+                            cascade="all, delete-orphan", passive_deletes=True)
 
     # One-to-many relationship companies and users
-    users = db.relationship("UserModel", back_populates="company", lazy="dynamic")
+    users = db.relationship("UserModel", back_populates="company", lazy="dynamic",
+                            cascade="all, delete", passive_deletes=True)
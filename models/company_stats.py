@@ -0,0 +1,23 @@
+from init import db
+
+
+class CompanyStatsModel(db.Model):
+    __tablename__ = "company_stats"
+
+    # One row per company, kept up to date on every write to its projects,
+    #   tests and links (see models/stats.py).
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"),
+                           primary_key=True)
+
+    # Attributes for Company Stats table
+    project_count = db.Column(db.Integer, nullable=False, default=0)
+    total_budget = db.Column(db.Float(precision=2), nullable=False, default=0.0)
+    test_count = db.Column(db.Integer, nullable=False, default=0)
+    link_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def average_budget(self):
+        """Average project budget, or None for a company without projects."""
+        if not self.project_count:
+            return None
+        return self.total_budget / self.project_count
@@ -0,0 +1,30 @@
+from init import db
+
+
+class JobModel(db.Model):
+    __tablename__ = "jobs"
+
+    # Lookup of the pending job of a target, e.g. to not queue a second
+    #   delete of the same company.
+    __table_args__ = (
+        db.Index("ix_jobs_kind_target_id", "kind", "target_id"),
+    )
+
+    # Primary key for Jobs table
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Attributes for Jobs table
+    kind = db.Column(db.String(40), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    # queued -> running -> done or failed
+    status = db.Column(db.String(20), nullable=False, default="queued", index=True)
+    # Rows processed so far, by table. Saved with every batch, so a job
+    #   that is resumed carries on from where it stopped.
+    progress = db.Column(db.JSON, nullable=False, default=dict)
+    error = db.Column(db.Text, nullable=True)
+
+    # Times in UTC. updated_at is refreshed with every batch, so a running
+    #   job whose updated_at is too old has lost its worker (see jobs.py).
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
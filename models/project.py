@@ -1,9 +1,19 @@
+from sqlalchemy import func, literal_column
+
 from init import db
 
 
 class ProjectModel(db.Model):
     __tablename__ = "projects"
 
+    # The indexes serve the filters and sorts of ProjectList.get, with the id
+    #   as the keyset pagination tie breaker. The unique key is declared below.
+    __table_args__ = (
+        db.Index("ix_projects_client_id", "client", "id"),
+        db.Index("ix_projects_budget_id", "budget", "id"),
+        db.Index("ix_projects_name_id", "name", "id"),
+    )
+
     # Primary key for Projects table
     id = db.Column(db.Integer, primary_key=True)
 
@@ -13,12 +23,29 @@ class ProjectModel(db.Model):
     description = db.Column(db.String(255), nullable=True)
     client = db.Column(db.String(80), nullable=False)
 
+    # Row version for ETags, bumped on every write (see models/versioning.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
 
     # Foreign key to companies table
-    company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), unique=False, nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"),
+                           unique=False, nullable=False)
 
     # One-to-many relationship with CompanyModel class
     company = db.relationship("CompanyModel", back_populates="projects")
 
-    # Many-to-many relationship projects and tests
-    tests = db.relationship("TestModel", back_populates="projects", secondary="projects_tests")
+    # Many-to-many relationship projects and tests:
+    #   The projects_tests rows are deleted by ON DELETE CASCADE.
+    tests = db.relationship("TestModel", back_populates="projects", secondary="projects_tests",
+                            passive_deletes=True)
+
+
+# Unique key of a project: its name and description within its company.
+#   A missing description counts as '' so projects without one are still
+#   duplicates (NULLs are never equal in a unique index). ProjectList.post
+#   inserts with ON CONFLICT on this key, and company_id is the leading
+#   column so it also serves the company_id foreign key lookups.
+PROJECT_KEY = (ProjectModel.company_id, ProjectModel.name,
+               func.coalesce(ProjectModel.description, literal_column("''")))
+
+db.Index("uq_projects_company_id_name_description", *PROJECT_KEY, unique=True)
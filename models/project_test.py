@@ -4,9 +4,17 @@ from init import db
 class ProjectTest(db.Model):
     __tablename__ = "projects_tests"
 
+    # A Test can only be linked to the same Project once
+    __table_args__ = (
+        db.UniqueConstraint("project_id", "test_id", name="uq_projects_tests_project_test"),
+    )
+
     # Primary key for ProjectsTests table
     id = db.Column(db.Integer, primary_key=True)
 
-    # Foreign key relationships to projects and tests tables
-    project_id = db.Column(db.Integer, db.ForeignKey("projects.id"))
-    test_id = db.Column(db.Integer, db.ForeignKey("tests.id"))
\ No newline at end of file
+    # Foreign key relationships to projects and tests tables:
+    #   project_id lookups use the unique (project_id, test_id) constraint,
+    #   test_id lookups get their own index.
+    # Both are ON DELETE CASCADE, so deleting a project or test removes its links.
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.id", ondelete="CASCADE"))
+    test_id = db.Column(db.Integer, db.ForeignKey("tests.id", ondelete="CASCADE"), index=True)
\ No newline at end of file
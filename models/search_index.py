@@ -0,0 +1,155 @@
+import re
+from sqlalchemy import DDL, event, text
+
+from init import db
+from models.project import ProjectModel
+from models.test import TestModel
+
+
+# Full-text search index over projects (name, description, client) and tests
+# (name, description, test_method), used by the /search endpoint.
+#
+# SQLite: one FTS5 'external content' table per searched table. The FTS
+#   tables only hold the index, the text stays in projects/tests, and
+#   triggers keep the index in sync with every INSERT, UPDATE and DELETE,
+#   including the Core bulk inserts that skip the ORM events.
+# PostgreSQL: a GIN index on the tsvector expression of each table. The
+#   database keeps expression indexes in sync itself, and the search query
+#   repeats the same expression so the planner can use the index.
+#
+# The DDL runs after the tables are created by db.create_all(). For a
+# database created before the search index existed, run
+# 'flask db search-rebuild'.
+
+# Searched columns per table, in order of weight (the name ranks highest)
+SEARCH_COLUMNS = {
+    ProjectModel.__table__: ("name", "description", "client"),
+    TestModel.__table__: ("name", "description", "test_method"),
+}
+
+# Result 'type' of each table
+SEARCH_TYPES = {ProjectModel.__table__: "project", TestModel.__table__: "test"}
+
+_SQLITE_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+    {columns}, content='{table}', content_rowid='id', tokenize='porter unicode61'
+)""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new});
+END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old});
+END""",
+    """CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {columns} ON {table} BEGIN
+    INSERT INTO {table}_fts({table}_fts, rowid, {columns}) VALUES ('delete', old.id, {old});
+    INSERT INTO {table}_fts(rowid, {columns}) VALUES (new.id, {new});
+END""",
+)
+
+
+def _tsvector(columns):
+    """The tsvector expression of a table, shared by its index and the query."""
+    weighted = [f"setweight(to_tsvector('english', coalesce({column}, '')), '{weight}')"
+                for column, weight in zip(columns, "ABC")]
+    return " || ".join(weighted)
+
+
+def _sqlite_statements(table):
+    columns = SEARCH_COLUMNS[table]
+    return [ddl.format(table=table.name, columns=", ".join(columns),
+                       new=", ".join(f"new.{c}" for c in columns),
+                       old=", ".join(f"old.{c}" for c in columns))
+            for ddl in _SQLITE_DDL]
+
+
+def _postgresql_statements(table):
+    return [f"CREATE INDEX IF NOT EXISTS ix_{table.name}_search ON {table.name} "
+            f"USING GIN (({_tsvector(SEARCH_COLUMNS[table])}))"]
+
+
+for _table in SEARCH_COLUMNS:
+    for _statement in _sqlite_statements(_table):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+    for _statement in _postgresql_statements(_table):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+    # The triggers are dropped with the table, the FTS table is not
+    event.listen(_table, "before_drop",
+                 DDL(f"DROP TABLE IF EXISTS {_table.name}_fts").execute_if(dialect="sqlite"))
+
+
+def rebuild_search_index():
+    """Create the search index if it is missing and rebuild it from the tables:
+
+    Returns:
+        dict: Number of rows indexed per table.
+    """
+    dialect = db.engine.dialect.name
+    counts = {}
+    for table in SEARCH_COLUMNS:
+        if dialect == "sqlite":
+            for statement in _sqlite_statements(table):
+                db.session.execute(text(statement))
+            db.session.execute(text(f"INSERT INTO {table.name}_fts({table.name}_fts) "
+                                    f"VALUES ('rebuild')"))
+        elif dialect == "postgresql":
+            for statement in _postgresql_statements(table):
+                db.session.execute(text(statement))
+            db.session.execute(text(f"REINDEX INDEX ix_{table.name}_search"))
+        counts[table.name] = db.session.scalar(text(f"SELECT COUNT(*) FROM {table.name}"))
+    db.session.commit()
+    return counts
+
+
+def search_terms(query):
+    """Split a search string into terms, dropping any query syntax characters."""
+    return re.findall(r"\w+", query.lower())
+
+
+def _sqlite_search(terms):
+    # Every term must match, as a prefix ("as1289" matches "AS1289.6.3.1").
+    #   bm25() is lower for better matches, so it's negated into a score.
+    match = " ".join(f'"{term}"*' for term in terms)
+    selects = []
+    for table, columns in SEARCH_COLUMNS.items():
+        weights = ", ".join(["3.0", "1.0", "1.0"][:len(columns)])
+        selects.append(
+            f"SELECT '{SEARCH_TYPES[table]}' AS type, rowid AS id, "
+            f"-bm25({table.name}_fts, {weights}) AS score "
+            f"FROM {table.name}_fts WHERE {table.name}_fts MATCH :match"
+        )
+    return " UNION ALL ".join(selects), {"match": match}
+
+
+def _postgresql_search(terms):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    selects = []
+    for table, columns in SEARCH_COLUMNS.items():
+        vector = _tsvector(columns)
+        selects.append(
+            f"SELECT '{SEARCH_TYPES[table]}' AS type, id, ts_rank({vector}, query) AS score "
+            f"FROM {table.name}, to_tsquery('english', :tsquery) AS query "
+            f"WHERE {vector} @@ query"
+        )
+    return " UNION ALL ".join(selects), {"tsquery": tsquery}
+
+
+def search_index(terms, limit, offset=0):
+    """Find the projects and tests matching every search term, best first:
+
+    Args:
+        terms (list): The search terms, see search_terms().
+        limit (int): The maximum number of results.
+        offset (int): The number of results to skip.
+
+    Returns:
+        list: (type, id, score) rows, where type is 'project' or 'test',
+              ordered by descending score.
+    """
+    if db.engine.dialect.name == "postgresql":
+        statement, params = _postgresql_search(terms)
+    else:
+        statement, params = _sqlite_search(terms)
+
+    statement += " ORDER BY score DESC, type, id LIMIT :limit OFFSET :offset"
+    return db.session.execute(text(statement),
+                              {**params, "limit": limit, "offset": offset}).all()
@@ -0,0 +1,251 @@
+from collections import Counter, defaultdict
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from init import db
+from models.company import CompanyModel
+from models.project import ProjectModel
+from models.test import TestModel
+from models.project_test import ProjectTest
+from models.company_stats import CompanyStatsModel
+from models.changes import linked_ids
+
+
+# Per-company statistics (company_stats table) kept up to date incrementally.
+#
+# Before each flush that touches projects, tests or links, the current
+# contribution of every touched project (1 project, its budget and its
+# links) and test (1 test) to its company is read with one grouped query,
+# and after the flush it is read again. The difference is added to the
+# statistics rows, which covers new, changed, moved and deleted rows without
+# working out what changed attribute by attribute. Links are only counted
+# through their project, so a link change touches the project's statistics.
+#
+# Controllers that write with Core statements (bulk inserts, multi-row link
+# changes) call update_company_stats() themselves, and
+# 'flask db stats-rebuild' recomputes the whole table with GROUP BY queries.
+
+STATS_COLUMNS = ("project_count", "total_budget", "test_count", "link_count")
+
+# Budget sums are floats, so totals kept incrementally may differ slightly
+BUDGET_TOLERANCE = 0.01
+
+_STATS = "company_stats"
+
+
+def update_company_stats(deltas, session=None):
+    """Add deltas to the statistics of companies:
+
+    Args:
+        deltas (dict): Company ID -> {column: delta}, e.g.
+                       {3: {"project_count": 2, "total_budget": 1500.0}}.
+                       A company without a statistics row gets one.
+        session: The session to run the statements in (db.session by default).
+    """
+    session = session or db.session
+    table = CompanyStatsModel.__table__
+    for company_id, delta in deltas.items():
+        values = {column: delta.get(column, 0) for column in STATS_COLUMNS}
+        result = session.execute(
+            update(table).where(table.c.company_id == company_id)
+            .values({column: table.c[column] + value for column, value in values.items()})
+        )
+        if result.rowcount == 0:
+            session.execute(insert(table).values(company_id=company_id, **values))
+
+
+def move_project_budget(project_id, budget, session=None):
+    """Add the change of a project's budget to its company's statistics:
+
+    Runs before the project's own UPDATE. The project row is locked first
+    with a SELECT ... FOR UPDATE (PostgreSQL doesn't allow FOR UPDATE in
+    the UPDATE's subquery), so a concurrent change of the same project
+    waits for this transaction and then reads the new budget. SQLite
+    ignores FOR UPDATE, but it runs one writer at a time and the UPDATE
+    reads the current budget and writes the total in one statement.
+
+    Args:
+        project_id: The ID of the project.
+        budget (float): The project's new budget.
+        session: The session to run the statement in (db.session by default).
+    """
+    session = session or db.session
+    table = CompanyStatsModel.__table__
+    project = ProjectModel.__table__
+    session.execute(select(project.c.id).where(project.c.id == project_id).with_for_update())
+    current_budget = select(project.c.budget).where(project.c.id == project_id).scalar_subquery()
+    session.execute(
+        update(table)
+        .where(table.c.company_id == select(project.c.company_id)
+               .where(project.c.id == project_id).scalar_subquery())
+        .values(total_budget=table.c.total_budget + (budget - current_budget))
+    )
+
+
+def _contributions(session, project_ids, test_ids):
+    """Return what the given projects and tests add to their companies' statistics."""
+    totals = defaultdict(Counter)
+    if project_ids:
+        links = (select(ProjectTest.project_id, func.count().label("links"))
+                 .where(ProjectTest.project_id.in_(project_ids))
+                 .group_by(ProjectTest.project_id).subquery())
+        rows = session.execute(
+            select(ProjectModel.company_id, func.count(), func.sum(ProjectModel.budget),
+                   func.coalesce(func.sum(links.c.links), 0))
+            .outerjoin(links, links.c.project_id == ProjectModel.id)
+            .where(ProjectModel.id.in_(project_ids))
+            .group_by(ProjectModel.company_id)
+        )
+        for company_id, count, budget, link_count in rows:
+            totals[company_id].update(project_count=count, total_budget=budget or 0.0,
+                                      link_count=link_count)
+    if test_ids:
+        rows = session.execute(
+            select(TestModel.company_id, func.count())
+            .where(TestModel.id.in_(test_ids)).group_by(TestModel.company_id)
+        )
+        for company_id, count in rows:
+            totals[company_id].update(test_count=count)
+    return totals
+
+
+@event.listens_for(Session, "before_flush")
+def _read_stats_before(session, flush_context, instances):
+    project_ids, test_ids, deleted_tests = set(), set(), set()
+    pending, new_companies, deleted_companies = [], [], set()
+
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, (ProjectModel, TestModel)):
+                pending.append(obj)
+                if isinstance(obj, TestModel):
+                    project_ids.update(linked_ids(obj, "projects"))
+            elif isinstance(obj, ProjectTest):
+                project_ids.add(obj.project_id)
+            elif isinstance(obj, CompanyModel):
+                new_companies.append(obj)
+
+        for obj in session.dirty:
+            if isinstance(obj, ProjectModel) and session.is_modified(obj):
+                project_ids.add(obj.id)
+            elif isinstance(obj, TestModel) and session.is_modified(obj):
+                test_ids.add(obj.id)
+                project_ids.update(linked_ids(obj, "projects"))
+            elif isinstance(obj, ProjectTest) and session.is_modified(obj):
+                project_ids.update(inspect(obj).attrs.project_id.history.sum())
+
+        for obj in session.deleted:
+            if isinstance(obj, ProjectModel):
+                project_ids.add(obj.id)
+            elif isinstance(obj, TestModel):
+                test_ids.add(obj.id)
+                deleted_tests.add(obj.id)
+            elif isinstance(obj, ProjectTest):
+                project_ids.add(obj.project_id)
+            elif isinstance(obj, CompanyModel):
+                deleted_companies.add(obj.id)
+
+        if deleted_tests:
+            # Deleting a test also deletes its links
+            project_ids.update(session.scalars(
+                select(ProjectTest.project_id).where(ProjectTest.test_id.in_(deleted_tests))
+            ))
+        project_ids.discard(None)
+
+        if not (project_ids or test_ids or pending or new_companies or deleted_companies):
+            return
+
+        before = _contributions(session, project_ids, test_ids)
+        if deleted_companies:
+            session.execute(delete(CompanyStatsModel).where(
+                CompanyStatsModel.company_id.in_(deleted_companies)))
+
+    session.info[_STATS] = (project_ids, test_ids, pending, new_companies,
+                            deleted_companies, before)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_stats_after(session, flush_context):
+    state = session.info.pop(_STATS, None)
+    if state is None:
+        return
+    project_ids, test_ids, pending, new_companies, deleted_companies, before = state
+
+    for obj in pending:
+        (project_ids if isinstance(obj, ProjectModel) else test_ids).add(obj.id)
+    after = _contributions(session, project_ids, test_ids)
+
+    deltas = {company.id: {} for company in new_companies}
+    for company_id in set(before) | set(after):
+        delta = {column: after[company_id][column] - before[company_id][column]
+                 for column in STATS_COLUMNS}
+        if any(delta.values()):
+            deltas[company_id] = delta
+
+    update_company_stats({company_id: delta for company_id, delta in deltas.items()
+                          if company_id is not None and company_id not in deleted_companies},
+                         session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_stats(session, previous_transaction):
+    session.info.pop(_STATS, None)
+
+
+def company_stats_query():
+    """SELECT computing the statistics of every company with GROUP BY queries."""
+    projects = (select(ProjectModel.company_id, func.count().label("project_count"),
+                       func.sum(ProjectModel.budget).label("total_budget"))
+                .group_by(ProjectModel.company_id).subquery())
+    tests = (select(TestModel.company_id, func.count().label("test_count"))
+             .group_by(TestModel.company_id).subquery())
+    links = (select(ProjectModel.company_id, func.count().label("link_count"))
+             .join(ProjectTest, ProjectTest.project_id == ProjectModel.id)
+             .group_by(ProjectModel.company_id).subquery())
+
+    return (
+        select(CompanyModel.id.label("company_id"),
+               func.coalesce(projects.c.project_count, 0).label("project_count"),
+               func.coalesce(projects.c.total_budget, 0.0).label("total_budget"),
+               func.coalesce(tests.c.test_count, 0).label("test_count"),
+               func.coalesce(links.c.link_count, 0).label("link_count"))
+        .outerjoin(projects, projects.c.company_id == CompanyModel.id)
+        .outerjoin(tests, tests.c.company_id == CompanyModel.id)
+        .outerjoin(links, links.c.company_id == CompanyModel.id)
+    )
+
+
+def rebuild_company_stats():
+    """Recompute the statistics of every company from scratch:
+
+    Returns:
+        int: The number of companies.
+    """
+    table = CompanyStatsModel.__table__
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select(
+        ["company_id", *STATS_COLUMNS], company_stats_query()))
+    db.session.commit()
+    return db.session.scalar(select(func.count()).select_from(table))
+
+
+def verify_company_stats():
+    """Compare the statistics table with the GROUP BY results:
+
+    Returns:
+        list: (company ID, column, stored value, expected value) for every
+              difference. A missing statistics row is compared as zeros.
+    """
+    stored = {row.company_id: row for row in db.session.scalars(select(CompanyStatsModel))}
+    differences = []
+    for expected in db.session.execute(company_stats_query()):
+        row = stored.pop(expected.company_id, None)
+        for column in STATS_COLUMNS:
+            value = getattr(row, column) if row is not None else 0
+            wanted = getattr(expected, column)
+            tolerance = BUDGET_TOLERANCE if column == "total_budget" else 0
+            if abs(value - wanted) > tolerance:
+                differences.append((expected.company_id, column, value, wanted))
+    for company_id in stored:
+        differences.append((company_id, "company", "exists", "deleted"))
+    return differences
@@ -4,6 +4,12 @@ from init import db
 class TestModel(db.Model):
     __tablename__ = "tests"
 
+    # Filters of TestsInCompany.get, which always lists one company's tests
+    __table_args__ = (
+        db.Index("ix_tests_company_id_test_type", "company_id", "test_type"),
+        db.Index("ix_tests_company_id_test_method", "company_id", "test_method"),
+    )
+
     # Primary key for Tests table
     id = db.Column(db.Integer, primary_key=True)
 
@@ -13,10 +19,15 @@ class TestModel(db.Model):
     test_type = db.Column(db.String(80), unique=False, nullable=True)
     test_method = db.Column(db.String(80), unique=False, nullable=True)
 
+    # Row version for ETags, bumped on every write (see models/versioning.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
     # Foreign key relationship to companies table
-    company_id = db.Column(db.Integer, db.ForeignKey("companies.id"), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey("companies.id", ondelete="CASCADE"),
+                           nullable=False, index=True)
 
     # One-to-many relationship tests and companies
     company = db.relationship("CompanyModel", back_populates="tests")
     # Many-to-many relationship projects and tests
-    projects = db.relationship("ProjectModel", back_populates="tests", secondary="projects_tests")
+    projects = db.relationship("ProjectModel", back_populates="tests", secondary="projects_tests",
+                               passive_deletes=True)
@@ -0,0 +1,17 @@
+from init import db
+
+
+class TokenBlocklistModel(db.Model):
+    __tablename__ = "token_blocklist"
+
+    # Primary key for Token Blocklist table
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Attributes for Token Blocklist table
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    # Expiry of the revoked token (UTC). Past this the entry can be dropped.
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    # When the token was revoked (UTC, the database's clock). Used to sync
+    #   new entries into the in-process blocklist (see blocklist.py).
+    created_at = db.Column(db.DateTime, nullable=False, index=True,
+                           server_default=db.func.current_timestamp())
@@ -12,7 +12,8 @@ class UserModel(db.Model):
     is_admin = db.Column(db.Boolean, default=False)
 
     # Foreign key to companies table
-    company_id = db.Column(db.Integer, db.ForeignKey('companies.id'))
+    company_id = db.Column(db.Integer, db.ForeignKey('companies.id', ondelete='CASCADE'),
+                           index=True)
 
     # Relationship to CompanyModel
     company = db.relationship('CompanyModel', back_populates='users')
\ No newline at end of file
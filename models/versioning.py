@@ -0,0 +1,141 @@
+from collections import defaultdict
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from init import db
+from models.company import CompanyModel
+from models.project import ProjectModel
+from models.test import TestModel
+from models.project_test import ProjectTest
+from models.changes import linked_ids
+
+
+# Row versions used for the ETags of the company, project and test resources.
+#
+# The JSON of a resource embeds related rows (a project embeds its company
+# and tests, a company embeds its projects and a test embeds its company and
+# projects), so a write to one row also bumps the version of the rows whose
+# JSON it appears in. ORM writes are picked up automatically by the session
+# events below. Controllers that write with Core statements (bulk inserts,
+# multi-row link changes) call bump_versions() themselves.
+
+_BUMPS = "version_bumps"
+
+# Keys for the bumps worked out with a subquery on projects_tests at flush
+_TESTS_OF_PROJECTS = "tests_of_projects"
+_PROJECTS_OF_TESTS = "projects_of_tests"
+
+
+def _bump(session, model, ids):
+    ids = {row_id for row_id in ids if row_id is not None}
+    if ids:
+        table = model.__table__
+        session.execute(
+            update(table).where(table.c.id.in_(ids))
+            .values(version=table.c.version + 1)
+        )
+
+
+def bump_versions(model, ids):
+    """Increment the version of the rows of a model with one UPDATE:
+
+    Args:
+        model: CompanyModel, ProjectModel or TestModel.
+        ids: The primary keys of the rows to bump.
+    """
+    _bump(db.session, model, ids)
+
+
+def _bump_tests_of_projects(session, project_ids):
+    links = ProjectTest.__table__
+    tests = TestModel.__table__
+    session.execute(
+        update(tests)
+        .where(tests.c.id.in_(select(links.c.test_id).where(
+            links.c.project_id.in_(project_ids))))
+        .values(version=tests.c.version + 1)
+    )
+
+
+def bump_tests_of_projects(project_ids):
+    """Increment the version of the tests linked to some projects with one UPDATE:
+
+    Args:
+        project_ids: The primary keys of the projects whose tests to bump.
+    """
+    if project_ids:
+        _bump_tests_of_projects(db.session, project_ids)
+
+
+def current_version(model, row_id):
+    """Return the version of a row, or None if it doesn't exist:
+
+    Reads a single column so the ETag of a resource can be checked before
+    the row and its relationships are loaded and serialized.
+    """
+    return db.session.scalar(select(model.version).where(model.id == row_id))
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_version_bumps(session, flush_context, instances):
+    bumps = session.info.setdefault(_BUMPS, defaultdict(set))
+
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, ProjectModel):
+                bumps[CompanyModel].add(obj.company_id or getattr(obj.company, "id", None))
+                bumps[TestModel].update(linked_ids(obj, "tests"))
+            elif isinstance(obj, TestModel):
+                bumps[ProjectModel].update(linked_ids(obj, "projects"))
+
+        for obj in session.dirty:
+            if not isinstance(obj, (CompanyModel, ProjectModel, TestModel)):
+                continue
+            if not session.is_modified(obj):
+                continue
+            bumps[type(obj)].add(obj.id)
+            if isinstance(obj, ProjectModel):
+                bumps[CompanyModel].add(obj.company_id)
+                bumps[TestModel].update(linked_ids(obj, "tests"))
+                bumps[_TESTS_OF_PROJECTS].add(obj.id)
+            elif isinstance(obj, TestModel):
+                bumps[ProjectModel].update(linked_ids(obj, "projects"))
+                bumps[_PROJECTS_OF_TESTS].add(obj.id)
+
+        for obj in session.deleted:
+            if isinstance(obj, ProjectModel):
+                bumps[CompanyModel].add(obj.company_id)
+                bumps[TestModel].update(session.scalars(
+                    select(ProjectTest.test_id).where(ProjectTest.project_id == obj.id)
+                ))
+            elif isinstance(obj, TestModel):
+                bumps[ProjectModel].update(session.scalars(
+                    select(ProjectTest.project_id).where(ProjectTest.test_id == obj.id)
+                ))
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_version_bumps(session, flush_context):
+    bumps = session.info.pop(_BUMPS, None)
+    if not bumps:
+        return
+
+    for model in (CompanyModel, ProjectModel, TestModel):
+        _bump(session, model, bumps.get(model, ()))
+
+    if bumps.get(_TESTS_OF_PROJECTS):
+        _bump_tests_of_projects(session, bumps[_TESTS_OF_PROJECTS])
+    if bumps.get(_PROJECTS_OF_TESTS):
+        links = ProjectTest.__table__
+        projects = ProjectModel.__table__
+        session.execute(
+            update(projects)
+            .where(projects.c.id.in_(select(links.c.project_id).where(
+                links.c.test_id.in_(bumps[_PROJECTS_OF_TESTS]))))
+            .values(version=projects.c.version + 1)
+        )
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_version_bumps(session, previous_transaction):
+    session.info.pop(_BUMPS, None)
@@ -0,0 +1,172 @@
+# Keyset (cursor) pagination helpers
+
+# Library and Package imports
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+from flask import request
+from flask_smorest import abort
+from sqlalchemy import tuple_
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError(cursor)
+    return values
+
+
+def _cursor_value(value, column):
+    """Check that a value of a cursor has the Python type of its column."""
+    python_type = column.type.python_type
+    if python_type is float and type(value) is int:
+        value = float(value)
+    # type() rather than isinstance(), as a bool is also an int
+    if type(value) is not python_type:
+        raise ValueError(value)
+    return value
+
+
+def keyset_query(query, column, limit, after=None, sort_column=None, descending=False):
+    """Order, seek and limit a query to the rows of one page (plus one):
+
+    Works on a Query as well as a select() statement, which the async
+    endpoints (see asgi.py) execute themselves. See keyset_page().
+
+    Returns:
+        tuple: The query of the page and the keys it is ordered on, for
+               page_rows().
+
+    Raises:
+        ValueError: If the cursor is not valid.
+    """
+    if sort_column is None or sort_column is column:
+        keys = (column,)
+    else:
+        keys = (sort_column, column)
+
+    if after is not None:
+        if len(keys) == 1:
+            seek, value = keys[0], int(after)
+        else:
+            values = [_cursor_value(value, key)
+                      for value, key in zip(_decode_cursor(after), keys)]
+            seek, value = tuple_(*keys), tuple_(*values)
+        query = query.filter(seek < value if descending else seek > value)
+
+    order = [key.desc() for key in keys] if descending else list(keys)
+    return query.order_by(*order).limit(limit + 1), keys
+
+
+def page_rows(rows, keys, limit):
+    """Split the rows fetched by a keyset_query() into the page and the next cursor."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = [getattr(rows[-1], key.key) for key in keys]
+        next_cursor = last[0] if len(keys) == 1 else _encode_cursor(last)
+    return rows, next_cursor
+
+
+def keyset_page(query, column, limit, after=None, sort_column=None, descending=False):
+    """Fetch one page of a query using keyset (cursor) pagination:
+
+    Rows are ordered by the given column (normally the primary key) and
+    only rows after the cursor are selected, so the database seeks straight
+    to the start of the page through the index. Deep pages therefore cost
+    the same as the first one, unlike OFFSET which scans every skipped row.
+
+    When the rows are sorted on another column, the primary key is added as
+    a tie breaker and the cursor holds both values of the last row, e.g.
+    'WHERE (budget, id) > (:budget, :id) ORDER BY budget, id', which an
+    index on (budget) (or (budget, id)) can serve. These cursors are
+    opaque strings, while the cursor of the default order stays the ID.
+
+    One extra row is fetched to find out if there is a next page without
+    running a separate COUNT query.
+
+    Args:
+        query: The SQLAlchemy query to paginate.
+        column: The unique column to order and seek on, e.g. ProjectModel.id.
+        limit (int): The maximum number of rows in the page.
+        after (str): The cursor from the previous page, None for the first page.
+        sort_column: The column to sort on, None to sort on 'column'.
+        descending (bool): Sort in descending order.
+
+    Returns:
+        tuple: The rows in the page and the next cursor (None if this is
+               the last page).
+
+    Raises:
+        ValueError: If the cursor is not valid.
+    """
+    query, keys = keyset_query(query, column, limit, after, sort_column, descending)
+    return page_rows(query.all(), keys, limit)
+
+
+def next_page_headers(base_url, args, next_cursor, limit):
+    """Build the pagination headers of a request, see page_headers().
+
+    Args:
+        base_url (str): The URL of the request without the query string.
+        args (dict): The query string arguments of the request.
+        next_cursor (int): The cursor for the next page, or None.
+        limit (int): The page size used for the current page.
+    """
+    if next_cursor is None:
+        return {}
+
+    args = {**args, "limit": limit, "after": next_cursor}
+    next_url = f"{base_url}?{urlencode(args)}"
+
+    return {
+        "X-Next-Cursor": str(next_cursor),
+        "Link": f'<{next_url}>; rel="next"',
+    }
+
+
+def page_headers(next_cursor, limit):
+    """Build the pagination response headers:
+
+    Adds an 'X-Next-Cursor' header and a RFC 8288 'Link' header pointing
+    at the next page. Any other query string arguments on the request are
+    kept in the next page link.
+
+    Args:
+        next_cursor (int): The cursor for the next page, or None.
+        limit (int): The page size used for the current page.
+
+    Returns:
+        dict: The headers to add to the response (empty on the last page).
+    """
+    return next_page_headers(request.base_url, request.args.to_dict(), next_cursor, limit)
+
+
+def paginate(query, column, page_args, sort_column=None, descending=False):
+    """Paginate a query and return a flask-smorest response tuple:
+
+    Args:
+        query: The SQLAlchemy query to paginate.
+        column: The unique column to order and seek on.
+        page_args (dict): The parsed 'limit' and 'after' query arguments.
+        sort_column: The column to sort on, None to sort on 'column'.
+        descending (bool): Sort in descending order.
+
+    Returns:
+        tuple: The rows, the HTTP status code and the pagination headers.
+
+    Raises:
+        HTTPException: If the 'after' cursor is not valid (HTTP 400).
+    """
+    try:
+        rows, next_cursor = keyset_page(query, column, page_args["limit"],
+                                        page_args.get("after"), sort_column, descending)
+    except (ValueError, TypeError, binascii.Error):
+        abort(400, message="Invalid 'after' cursor.")
+    return rows, 200, page_headers(next_cursor, page_args["limit"])
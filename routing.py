@@ -0,0 +1,154 @@
+# Read replica routing: GET requests read from a replica, writes use the primary
+
+# Library and Package imports
+import itertools
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+# Replicas are extra Flask-SQLAlchemy binds ('replica_0', 'replica_1', ...)
+# built from DATABASE_REPLICA_URIS. No model is bound to them, so
+# db.create_all() leaves them alone: they're filled by the database's own
+# replication (or 'flask db replica-sync' for local SQLite files).
+#
+# A statement is sent to a replica when all of these hold:
+#   - it runs in a GET (or HEAD) request, i.e. the 'get' methods of the views,
+#   - it's a read: flushes and INSERT/UPDATE/DELETE statements always go to
+#     the primary, and once a request has written, the rest of its reads
+#     go to the primary too,
+#   - the client hasn't written in the last REPLICA_STICKY_SECONDS, so a
+#     client reads its own writes despite replication lag. Requests that
+#     write set a cookie saying until when that client reads from the primary,
+#   - it isn't inside use_primary().
+# Everything else (other methods, CLI commands, background jobs) uses the
+# primary. A request sticks to the replica it started reading from.
+
+REPLICA_BIND_PREFIX = "replica_"
+STICKY_COOKIE = "db_primary_until"
+READ_METHODS = ("GET", "HEAD")
+
+_next_replica = itertools.count()
+
+
+def replica_binds(uris):
+    """Build the SQLALCHEMY_BINDS of the replicas:
+
+    Args:
+        uris (str): Comma separated database URIs of the replicas, or None.
+
+    Returns:
+        dict: Bind key -> URI, empty without replicas.
+    """
+    uris = [uri.strip() for uri in (uris or "").split(",") if uri.strip()]
+    return {f"{REPLICA_BIND_PREFIX}{index}": uri for index, uri in enumerate(uris)}
+
+
+def is_sticky(cookie, now):
+    """Return True if a client's STICKY_COOKIE value says it reads from the primary."""
+    try:
+        return float(cookie or 0) > now
+    except ValueError:
+        return False
+
+
+def _mark_write():
+    if has_request_context():
+        g._db_wrote = True
+
+
+def _replica(engines):
+    """Return the replica engine for the current request, or None for the primary."""
+    if not has_request_context() or request.method not in READ_METHODS:
+        return None
+    if g.get("_db_wrote") or g.get("_db_use_primary"):
+        return None
+    if "_db_replica" not in g:
+        keys = sorted(key for key in engines
+                      if key and key.startswith(REPLICA_BIND_PREFIX))
+        if not keys or is_sticky(request.cookies.get(STICKY_COOKIE), time.time()):
+            g._db_replica = None
+        else:
+            g._db_replica = engines[keys[next(_next_replica) % len(keys)]]
+    return g._db_replica
+
+
+class RoutingSession(Session):
+    """Session sending the reads of GET requests to a replica, see above."""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                _mark_write()
+            else:
+                replica = _replica(self._db.engines)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, even in a GET request:
+
+    For reads that must never be stale, e.g. the revoked tokens and the
+    users the JWT checks are based on.
+    """
+    if not has_request_context():
+        yield
+        return
+    previous = g.get("_db_use_primary", False)
+    g._db_use_primary = True
+    try:
+        yield
+    finally:
+        g._db_use_primary = previous
+
+
+def _set_sticky_cookie(response):
+    if g.get("_db_wrote"):
+        seconds = current_app.config.get("REPLICA_STICKY_SECONDS", 5)
+        response.set_cookie(STICKY_COOKIE, f"{time.time() + seconds:.3f}",
+                            max_age=seconds, httponly=True, samesite="Lax")
+    return response
+
+
+def init_routing(app):
+    """Set the read-your-writes cookie on the responses of requests that wrote.
+
+    Does nothing without replicas.
+    """
+    if any(key.startswith(REPLICA_BIND_PREFIX)
+           for key in app.config.get("SQLALCHEMY_BINDS") or {}):
+        app.after_request(_set_sticky_cookie)
+
+
+def sync_sqlite_replicas(engines):
+    """Copy a SQLite primary database into every SQLite replica:
+
+    Stands in for replication when trying out replicas locally with two
+    SQLite files.
+
+    Args:
+        engines (dict): The Flask-SQLAlchemy engines (db.engines).
+
+    Returns:
+        list: The bind keys of the replicas copied to.
+    """
+    primary = engines[None]
+    if primary.dialect.name != "sqlite":
+        raise ValueError("Replicas can only be synced from a SQLite primary.")
+
+    synced = []
+    for key, engine in sorted(engines.items(), key=lambda item: str(item[0])):
+        if not key or not key.startswith(REPLICA_BIND_PREFIX) or engine.dialect.name != "sqlite":
+            continue
+        source = primary.raw_connection()
+        target = engine.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        synced.append(key)
+    return synced
@@ -1,8 +1,27 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, missing, validate
+
+from metrics import timed_serialization
+from serializers import compile_schema
+
+
+# Base for all schemas:
+#   dump() uses a serializer compiled from the schema's fields on first use
+#   (see serializers.py), falling back to marshmallow if the schema can't be
+#   compiled, and is timed for the Server-Timing header and /metrics.
+class BaseSchema(Schema):
+    def dump(self, obj, *, many=None):
+        with timed_serialization():
+            compiled = self.__dict__.get("_compiled_dump", missing)
+            if compiled is missing:
+                compiled = self._compiled_dump = compile_schema(self)
+            if compiled is None:
+                return super().dump(obj, many=many)
+            return compiled(obj, self.many if many is None else many)
+
 
 
 # Plain Project Schema. No information about the company.
-class PlainProjectSchema(Schema):
+class PlainProjectSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     budget = fields.Float(required=True)
@@ -10,7 +29,7 @@ class PlainProjectSchema(Schema):
     client = fields.Str(required=True)
 
 
-class PlainCompanySchema(Schema):
+class PlainCompanySchema(BaseSchema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     registration_number = fields.Str(required=True)
@@ -18,7 +37,7 @@ class PlainCompanySchema(Schema):
     services = fields.Str(required=True)
 
 
-class PlainTestSchema(Schema):
+class PlainTestSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     description = fields.Str()
@@ -26,18 +45,34 @@ class PlainTestSchema(Schema):
     test_method = fields.Str()
 
 
-class ProjectUpdateSchema(Schema):
+# PATCH of a project: only the given fields are changed
+class ProjectUpdateSchema(BaseSchema):
     name = fields.Str()
     budget = fields.Float()
     description = fields.Str()
 
 
+# PUT of a project: replaces all of these fields (a missing description clears it)
+class ProjectReplaceSchema(BaseSchema):
+    name = fields.Str(required=True)
+    budget = fields.Float(required=True)
+    description = fields.Str(load_default=None, allow_none=True)
+
+
 class ProjectSchema(PlainProjectSchema):
     company_id = fields.Int(required=True, load_only=True)
     company = fields.Nested(PlainCompanySchema(), dump_only=True)   # Return company info to the user
     tests = fields.List(fields.Nested(PlainTestSchema()), dump_only=True)
 
 
+# Result of one row of a bulk project create.
+class BulkProjectResultSchema(BaseSchema):
+    index = fields.Int()
+    status = fields.Str()
+    message = fields.Str()
+    project = fields.Nested(PlainProjectSchema())
+
+
 class CompanySchema(PlainCompanySchema):
     projects = fields.List(fields.Nested(PlainProjectSchema()), dump_only=True)
     # tests = fields.List(fields.Nested(PlainTestSchema()), dump_only=True)
@@ -49,13 +84,18 @@ class TestSchema(PlainTestSchema):
     company = fields.Nested(PlainCompanySchema(), dump_only=True)
 
 
-class TestAndProjectSchema(Schema):
+# List of test IDs to link to a project, replacing its current tests.
+class ProjectTestsSchema(BaseSchema):
+    test_ids = fields.List(fields.Int(), required=True)
+
+
+class TestAndProjectSchema(BaseSchema):
     message = fields.Str()
     project = fields.Nested(ProjectSchema)
     test = fields.Nested(TestSchema)
 
 
-class UserSchema(Schema):
+class UserSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     username = fields.Str(required=True)
     email = fields.Email(required=True)
@@ -64,3 +104,90 @@ class UserSchema(Schema):
     company = fields.Nested(PlainCompanySchema(), dump_only=True)
     company_id = fields.Int(load_only=True)
 
+
+# Keyset pagination query arguments used by the list endpoints.
+#   'after' is the ID of the last row, or an opaque cursor for sorted lists.
+class PageArgsSchema(BaseSchema):
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=500))
+    after = fields.Str(load_default=None)
+
+
+def _sort_choices(*names):
+    """Allowed 'sort' values: each column name, ascending or '-' descending."""
+    return [prefix + name for name in names for prefix in ("", "-")]
+
+
+# Filter and sort query arguments of the list endpoints (see filtering.py).
+#   The fields are the allow-list: each one maps onto the column of the same
+#   name, and the '_min'/'_max' suffixes filter a range of that column.
+class ProjectFilterArgsSchema(BaseSchema):
+    company_id = fields.Int()
+    client = fields.Str()
+    budget_min = fields.Float()
+    budget_max = fields.Float()
+    sort = fields.Str(load_default="id",
+                      validate=validate.OneOf(_sort_choices("id", "name", "budget", "client")))
+
+
+class CompanyFilterArgsSchema(BaseSchema):
+    industry_sector = fields.Str()
+    services = fields.Str()
+    sort = fields.Str(load_default="id",
+                      validate=validate.OneOf(_sort_choices("id", "name", "industry_sector")))
+
+
+class TestFilterArgsSchema(BaseSchema):
+    test_type = fields.Str()
+    test_method = fields.Str()
+    sort = fields.Str(load_default="id", validate=validate.OneOf(_sort_choices("id", "name")))
+
+
+# Query arguments for the streaming export endpoints.
+class ExportArgsSchema(BaseSchema):
+    format = fields.Str(load_default="ndjson",
+                        validate=validate.OneOf(["ndjson", "json"]))
+
+
+# Sparse fieldset query arguments, comma separated field names (see sparse.py).
+#   The 'fields' argument is loaded as 'fields_', so the attribute doesn't
+#   shadow the marshmallow module.
+class FieldsArgsSchema(BaseSchema):
+    fields_ = fields.Str(data_key="fields", load_default=None)
+    expand = fields.Str(load_default=None)
+
+
+# Statistics of a company (company_stats table, see models/stats.py).
+class CompanyStatsSchema(BaseSchema):
+    company_id = fields.Int()
+    project_count = fields.Int()
+    total_budget = fields.Float()
+    average_budget = fields.Float()
+    test_count = fields.Int()
+    link_count = fields.Int()
+
+
+# Status of a background job (see jobs.py).
+class JobSchema(BaseSchema):
+    id = fields.Int()
+    kind = fields.Str()
+    target_id = fields.Int()
+    status = fields.Str()
+    progress = fields.Dict(keys=fields.Str(), values=fields.Int())
+    error = fields.Str()
+    created_at = fields.DateTime()
+    updated_at = fields.DateTime()
+    finished_at = fields.DateTime()
+
+
+# Query arguments of the /search endpoint, paginated with PageArgsSchema.
+class SearchArgsSchema(BaseSchema):
+    q = fields.Str(required=True, validate=validate.Length(min=1, max=200))
+
+
+# One search result: a project or a test, with its relevance score.
+class SearchResultSchema(BaseSchema):
+    type = fields.Str()
+    id = fields.Int()
+    score = fields.Float()
+    project = fields.Nested(PlainProjectSchema())
+    test = fields.Nested(PlainTestSchema())
@@ -0,0 +1,167 @@
+# Synthetic data generator for 'flask db seed --scale N'
+
+# Library and Package imports
+import csv
+import io
+import random
+from sqlalchemy import func, insert, select, text
+
+# Local imports
+from init import db
+from models import CompanyModel, ProjectModel, TestModel, ProjectTest, UserModel
+from models.stats import rebuild_company_stats
+from hashing import hash_password
+
+SECTORS = ["Geotechnical Engineering", "Civil Engineering", "Environmental Engineering",
+           "Structural Engineering", "Mining", "Construction"]
+SERVICES = ["Soil Testing", "Concrete Testing", "Site Investigation",
+            "Groundwater Monitoring", "Asphalt Testing", "Rock Mechanics"]
+CLIENTS = ["Brisbane City Council", "Gold Coast City Council", "Main Roads",
+           "Queensland Rail", "Logan City Council", "Private Developer",
+           "Sunshine Coast Council", "Department of Transport"]
+TEST_TYPES = ["Geotechnical", "Concrete", "Asphalt", "Environmental", "Aggregate"]
+TEST_METHODS = ["AS1289.6.3.1", "AS1289.5.4.1", "AS1289.3.6.1", "AS1012.9",
+                "AS1141.11.1", "AS2891.8", "AS1289.6.1.1", "AS1289.2.1.1"]
+PROJECT_KINDS = ["Retaining Wall", "Road Upgrade", "Bridge Footing", "Embankment",
+                 "Pavement Rehabilitation", "Slope Stability", "Building Foundation",
+                 "Culvert Replacement"]
+
+
+def _copy_rows(table, columns, rows):
+    """Bulk load rows into a PostgreSQL table with COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = db.session.connection().connection.dbapi_connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+def _bulk_insert(table, columns, rows):
+    """Insert rows with COPY on PostgreSQL, or one executemany INSERT otherwise."""
+    if not rows:
+        return
+    if db.engine.dialect.name == "postgresql":
+        _copy_rows(table, columns, rows)
+    else:
+        db.session.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _reset_sequences():
+    """Move the PostgreSQL id sequences past the explicitly inserted IDs."""
+    if db.engine.dialect.name != "postgresql":
+        return
+    for model in (CompanyModel, ProjectModel, TestModel, ProjectTest, UserModel):
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def seed_scale(scale, seed=0, batch_size=1000, password="123456", progress=None):
+    """Seed the database with 'scale' companies and their related rows:
+
+    Each company gets a skewed (log-normal) number of projects and tests, so
+    a few companies are very large and most are small, like real data. On
+    average a company has about 12 projects, 6 tests, 2 users, and each
+    project is linked to 0 to 4 of its company's tests.
+
+    IDs are assigned here rather than by the database so the link rows can
+    be generated without reading the inserted rows back. Rows are written
+    'batch_size' companies at a time, with COPY on PostgreSQL and
+    executemany on other databases, one transaction per batch. The password
+    is hashed once and the hash is reused for every user. The company
+    statistics are rebuilt at the end.
+
+    The same 'scale' and 'seed' always produce the same data.
+
+    Args:
+        scale (int): Number of companies to create.
+        seed (int): Random seed.
+        batch_size (int): Number of companies written per transaction.
+        password (str): Password of every generated user.
+        progress (callable): Called with the number of companies written so
+                             far and 'scale' after each batch, if given.
+
+    Returns:
+        dict: Number of rows created per table.
+    """
+    rng = random.Random(seed)
+    password_hash = hash_password(password)
+
+    ids = {model: _next_id(model)
+           for model in (CompanyModel, ProjectModel, TestModel, ProjectTest, UserModel)}
+    counts = {model.__tablename__: 0
+              for model in (CompanyModel, ProjectModel, TestModel, ProjectTest, UserModel)}
+
+    company_columns = ["id", "name", "registration_number", "industry_sector", "services"]
+    project_columns = ["id", "name", "budget", "description", "client", "company_id"]
+    test_columns = ["id", "name", "description", "test_type", "test_method", "company_id"]
+    link_columns = ["id", "project_id", "test_id"]
+    user_columns = ["id", "username", "email", "password", "is_admin", "company_id"]
+
+    for batch_start in range(0, scale, batch_size):
+        companies, projects, tests, links, users = [], [], [], [], []
+
+        for _ in range(min(batch_size, scale - batch_start)):
+            company_id = ids[CompanyModel]
+            ids[CompanyModel] += 1
+            companies.append((company_id, f"Company {company_id}", f"REG{company_id:09d}",
+                              rng.choice(SECTORS), rng.choice(SERVICES)))
+
+            for admin in (True, False):
+                user_id = ids[UserModel]
+                ids[UserModel] += 1
+                users.append((user_id, f"user{user_id}", f"user{user_id}@email.com.au",
+                              password_hash, admin, company_id))
+
+            test_ids = []
+            for _ in range(max(1, int(rng.lognormvariate(1.3, 0.8)))):
+                test_id = ids[TestModel]
+                ids[TestModel] += 1
+                test_ids.append(test_id)
+                method = rng.choice(TEST_METHODS)
+                tests.append((test_id, f"{method} test {test_id}",
+                              f"Test to {method} for site {test_id}",
+                              rng.choice(TEST_TYPES), method, company_id))
+
+            for _ in range(int(rng.lognormvariate(1.8, 1.0))):
+                project_id = ids[ProjectModel]
+                ids[ProjectModel] += 1
+                kind = rng.choice(PROJECT_KINDS)
+                projects.append((project_id, f"{kind} {project_id}",
+                                 round(rng.lognormvariate(10.8, 0.9), 2),
+                                 f"{kind} investigation for project {project_id}",
+                                 rng.choice(CLIENTS), company_id))
+
+                for test_id in rng.sample(test_ids, rng.randint(0, min(4, len(test_ids)))):
+                    links.append((ids[ProjectTest], project_id, test_id))
+                    ids[ProjectTest] += 1
+
+        # Parents first so the foreign keys are satisfied
+        _bulk_insert(CompanyModel.__table__, company_columns, companies)
+        _bulk_insert(UserModel.__table__, user_columns, users)
+        _bulk_insert(TestModel.__table__, test_columns, tests)
+        _bulk_insert(ProjectModel.__table__, project_columns, projects)
+        _bulk_insert(ProjectTest.__table__, link_columns, links)
+        db.session.commit()
+
+        for table, rows in (("companies", companies), ("users", users), ("tests", tests),
+                            ("projects", projects), ("projects_tests", links)):
+            counts[table] += len(rows)
+        if progress is not None:
+            progress(batch_start + len(companies), scale)
+
+    _reset_sequences()
+    db.session.commit()
+
+    # The bulk inserts skip the statistics events, so recompute them once
+    rebuild_company_stats()
+    return counts
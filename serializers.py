@@ -0,0 +1,135 @@
+# Compiled fast-path serializers for the marshmallow schemas
+
+# Library and Package imports
+from functools import partial
+from marshmallow import Schema, fields, missing
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+from marshmallow.utils import ensure_text_type
+
+# marshmallow's Schema.dump asks every field to fetch and format its own
+# value through several layers of method calls. For a list of projects with
+# nested companies and tests that is most of the CPU time of the request.
+#
+# compile_schema() reads the dump fields of a schema once and generates a
+# plain Python function for it, e.g. for PlainCompanySchema:
+#
+#     def dump_one(obj):
+#         if hasattr(obj, "__getitem__"):
+#             return _serialize(obj)
+#         out = {}
+#         v = getattr(obj, "id", _missing)
+#         if v is not _missing:
+#             out["id"] = None if v is None else _int(v)
+#         ...
+#         return out
+#
+# Int, Float and Str fields are formatted inline, Nested and List fields call
+# the compiled function of the nested schema, and any other field falls back
+# to the field's own _serialize(), so the output is the same as marshmallow's.
+# Mappings (dict results) are handed to marshmallow, and schemas using
+# features the compiler doesn't handle (dump hooks, dump_default, dotted or
+# computed attributes, as_string numbers) aren't compiled at all.
+
+_INLINE = {
+    fields.Integer: "None if {v} is None else _int({v})",
+    fields.Float: "None if {v} is None else _float({v})",
+    fields.String: "None if {v} is None else ({v} if type({v}) is str else _text({v}))",
+}
+
+
+def _compilable(schema):
+    """Return True if the schema only uses features the compiler supports."""
+    if type(schema).get_attribute is not Schema.get_attribute:
+        return False
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return False
+    for name, field in schema.dump_fields.items():
+        if not field._CHECK_ATTRIBUTE or field.dump_default is not missing:
+            return False
+        if "." in (field.attribute or name):
+            return False
+        if getattr(field, "as_string", False):
+            return False
+    return True
+
+
+def _one_dumper(schema):
+    """Return a function dumping a single object with the given schema."""
+    compiled = compile_schema(schema)
+    if compiled is None:
+        return partial(schema.dump, many=False)
+    return partial(compiled, many=False)
+
+
+class _Compiler:
+    """Generates the source of the dump function of one schema."""
+    def __init__(self, schema):
+        self.schema = schema
+        self.namespace = {"_missing": missing, "_int": int, "_float": float,
+                          "_text": ensure_text_type, "_serialize": schema._serialize}
+
+    def _name(self, prefix, value):
+        name = f"_{prefix}{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def _nested(self, field, v):
+        schema = field.schema
+        dumper = self._name("nested", _one_dumper(schema))
+        if schema.many or field.many:
+            return f"None if {v} is None else [{dumper}(x) for x in {v}]"
+        return f"None if {v} is None else {dumper}({v})"
+
+    def expression(self, name, field, v="v"):
+        """Python expression formatting the value 'v' of a field."""
+        template = _INLINE.get(type(field))
+        if template is not None:
+            return template.format(v=v)
+        if type(field) is fields.Nested:
+            return self._nested(field, v)
+        if type(field) is fields.List and type(field.inner) in (*_INLINE, fields.Nested):
+            inner = self.expression(name, field.inner, "x")
+            return f"None if {v} is None else [{inner} for x in {v}]"
+        serializer = self._name("field", field._serialize)
+        return f"{serializer}({v}, {name!r}, obj)"
+
+    def source(self):
+        lines = ["def dump_one(obj):",
+                 "    if hasattr(obj, '__getitem__'):",
+                 "        return _serialize(obj)",
+                 "    out = {}"]
+        for name, field in self.schema.dump_fields.items():
+            attribute = field.attribute or name
+            key = field.data_key if field.data_key is not None else name
+            lines += [f"    v = getattr(obj, {attribute!r}, _missing)",
+                      "    if v is not _missing:",
+                      f"        out[{key!r}] = {self.expression(name, field)}"]
+        lines.append("    return out")
+        return "\n".join(lines)
+
+
+def compile_schema(schema):
+    """Compile a schema instance into a fast dump function:
+
+    Args:
+        schema: The marshmallow schema instance.
+
+    Returns:
+        function: dump(obj, many) returning the same data as
+                  schema.dump(obj, many=many), or None if the schema can't
+                  be compiled.
+    """
+    if not _compilable(schema):
+        return None
+
+    compiler = _Compiler(schema)
+    exec(compile(compiler.source(), f"<compiled {type(schema).__name__}>", "exec"),
+         compiler.namespace)
+    dump_one = compiler.namespace["dump_one"]
+
+    def dump(obj, many=False):
+        if many and obj is not None:
+            return [dump_one(item) for item in obj]
+        return dump_one(obj)
+
+    return dump
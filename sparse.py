@@ -0,0 +1,119 @@
+# Sparse fieldsets (?fields=) and opt-in expansion (?expand=)
+
+# Library and Package imports
+from functools import lru_cache
+from flask import jsonify
+from flask_smorest import abort
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+# Local imports
+from loaders import eager_load, relationship_options, _nested_schema
+
+
+def _split(value):
+    return {name.strip() for name in value.split(",") if name.strip()} if value else set()
+
+
+@lru_cache(maxsize=None)
+def _schema_fields(schema_cls):
+    """Return the dump field names of a schema class and its nested ones."""
+    dump_fields = schema_cls().dump_fields
+    relations = frozenset(name for name, field in dump_fields.items()
+                          if _nested_schema(field) is not None)
+    return tuple(dump_fields), relations
+
+
+@lru_cache(maxsize=256)
+def _schema_with_only(schema_cls, only):
+    # Schema instances are reusable, and caching them also keeps their
+    #   compiled serializer (see serializers.py) between requests.
+    return schema_cls(only=only)
+
+
+def sparse_schema(schema_cls, field_args):
+    """Build the schema for the 'fields' and 'expand' query arguments:
+
+    'fields' is a comma separated list of the fields to return, and
+    'expand' a comma separated list of the nested relationships to embed,
+    e.g. '/project?fields=id,name,budget&expand=company'.
+
+    - Without 'fields', every plain field is returned.
+    - Relationships are only embedded if they're listed in 'expand' (or in
+      'fields').
+    - Without either argument the full default representation is used, so
+      existing clients see no change.
+
+    Args:
+        schema_cls: The resource's marshmallow schema class, e.g. ProjectSchema.
+        field_args (dict): The parsed 'fields' (loaded as 'fields_') and 'expand'
+                           query arguments, see FieldsArgsSchema.
+
+    Returns:
+        Schema: A schema limited to the requested fields, or None for the
+                default representation.
+
+    Raises:
+        HTTPException: If a requested field or relationship doesn't exist (HTTP 400).
+    """
+    requested = _split(field_args.get("fields_"))
+    expand = _split(field_args.get("expand"))
+    if not requested and not expand:
+        return None
+
+    dump_fields, relations = _schema_fields(schema_cls)
+
+    unknown = (requested - set(dump_fields)) | (expand - relations)
+    if unknown:
+        abort(400, message=f"Unknown fields: {', '.join(sorted(unknown))}.")
+
+    selected = (requested or set(dump_fields) - relations) | expand
+    only = tuple(name for name in dump_fields if name in selected)
+    return _schema_with_only(schema_cls, only)
+
+
+def sparse_load(query, schema_cls, model, schema, keep=()):
+    """Add loader options for the selected fields to a query:
+
+    With the default representation this is the same as eager_load(). For a
+    sparse schema only the selected columns are read (load_only; the
+    primary key is always read) and only the relationships being embedded
+    are loaded, so unrequested joins and SELECT IN loads are skipped.
+
+    Columns in 'keep' are read even if they aren't selected, e.g. the sort
+    column the next page's cursor is built from. Otherwise it would be
+    lazy loaded, which an AsyncSession can't do.
+
+    Args:
+        query: The SQLAlchemy query (or dynamic relationship) to load from.
+        schema_cls: The resource's marshmallow schema class.
+        model: The SQLAlchemy model being queried.
+        schema: The schema from sparse_schema(), or None.
+        keep: Columns of the model to read in any case.
+
+    Returns:
+        The query with the loader options applied.
+    """
+    if schema is None:
+        return eager_load(query, schema_cls, model)
+
+    columns = inspect(model).column_attrs
+    selected = [name for name in schema.dump_fields if name in columns]
+    options = relationship_options(schema, model)
+    if selected:
+        selected += [column.key for column in keep if column.key not in selected]
+        options.append(load_only(*(getattr(model, name) for name in selected)))
+    return query.options(*options)
+
+
+def sparse_response(result, schema, many=False):
+    """Dump a result with a sparse schema into a JSON response:
+
+    The response is built here because the @blp.response schema of the view
+    is the full one; flask-smorest returns Response objects unchanged. With
+    the default representation (schema is None) the result is returned as
+    it is, for the view's response schema to dump.
+    """
+    if schema is None:
+        return result
+    return jsonify(schema.dump(result, many=many))
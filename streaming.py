@@ -0,0 +1,56 @@
+# Streaming export helpers
+
+# Library and Package imports
+import json
+from flask import Response, stream_with_context
+
+# Number of rows fetched from the database cursor at a time
+EXPORT_BATCH_SIZE = 1000
+
+
+def _ndjson_lines(rows, schema):
+    """Yield one JSON document per row, each terminated by a newline."""
+    for row in rows:
+        yield json.dumps(schema.dump(row)) + "\n"
+
+
+def _json_array_chunks(rows, schema):
+    """Yield a single JSON array, one element at a time."""
+    yield "["
+    separator = ""
+    for row in rows:
+        yield separator + json.dumps(schema.dump(row))
+        separator = ","
+    yield "]\n"
+
+
+def stream_export(query, schema, export_format="ndjson",
+                  batch_size=EXPORT_BATCH_SIZE):
+    """Stream the rows of a query as a chunked HTTP response:
+
+    Rows are read from a server-side cursor in batches of 'batch_size'
+    (stream_results + yield_per) and serialized one at a time with the
+    given marshmallow schema, so memory use stays flat whatever the size
+    of the table. No Content-Length is set, so the response is sent with
+    chunked transfer encoding.
+
+    Args:
+        query: The SQLAlchemy query to export. Should have an ORDER BY.
+        schema: The marshmallow schema instance used to dump each row.
+        export_format (str): 'ndjson' (one JSON object per line) or 'json'
+                             (a single JSON array).
+        batch_size (int): Number of rows fetched per database round trip.
+
+    Returns:
+        Response: The streaming response.
+    """
+    rows = query.execution_options(stream_results=True).yield_per(batch_size)
+
+    if export_format == "json":
+        chunks, mimetype = _json_array_chunks(rows, schema), "application/json"
+    else:
+        chunks, mimetype = _ndjson_lines(rows, schema), "application/x-ndjson"
+
+    # stream_with_context keeps the app context (and the database session)
+    # alive while the generator is consumed after the view has returned.
+    return Response(stream_with_context(chunks), mimetype=mimetype)
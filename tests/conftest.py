@@ -0,0 +1,51 @@
+# Shared fixtures: apps on temporary SQLite databases seeded with seed_scale()
+
+# Library and Package imports
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-test-secret-key-test")
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["JOB_WORKERS"] = "0"
+
+# Local imports
+from app import create_app
+from init import db
+from seeding import seed_scale
+
+
+@pytest.fixture(scope="session")
+def make_app(tmp_path_factory):
+    """Return a function creating an app on a database seeded with 'scale' companies.
+
+    Apps are created once per scale and shared by the tests of the session.
+    """
+    apps = {}
+
+    def make(scale):
+        if scale not in apps:
+            path = tmp_path_factory.mktemp("db") / f"scale_{scale}.db"
+            os.environ["DATABASE_URI"] = f"sqlite:///{path}"
+            app = create_app()
+            app.config["TESTING"] = True
+            with app.app_context():
+                db.create_all()
+                seed_scale(scale, seed=1)
+                db.session.remove()
+            apps[scale] = app
+        return apps[scale]
+
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(20)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,108 @@
+# Async (ASGI) read endpoints, compared with the Flask endpoints
+
+# Library and Package imports
+import asyncio
+import json
+import pytest
+from sqlalchemy import func, select
+
+# Local imports
+from init import db
+import models
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("asgiref")
+
+
+async def _asgi_get(asgi_app, path, query="", headers=()):
+    """Send a GET request to an ASGI app and return (status, headers, JSON body)."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "scheme": "http", "path": path,
+             "query_string": query.encode(), "root_path": "",
+             "server": ("localhost", 80), "client": ("127.0.0.1", 1234),
+             "headers": [(b"host", b"localhost")]
+             + [(name.lower().encode(), value.encode()) for name, value in headers]}
+    await asgi_app(scope, receive, send)
+    start = messages[0]
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], headers, json.loads(body) if body else None
+
+
+@pytest.fixture
+def asgi_app(app, monkeypatch):
+    from asgi import create_asgi_app
+
+    monkeypatch.setenv("DATABASE_URI", app.config["SQLALCHEMY_DATABASE_URI"])
+    return create_asgi_app()
+
+
+PROJECTS = select(func.count(models.ProjectModel.id))
+COMPANIES = select(func.count(models.CompanyModel.id))
+TESTS_OF_COMPANY_1 = select(func.count(models.TestModel.id)).where(
+    models.TestModel.company_id == 1)
+
+
+@pytest.mark.parametrize("path,query,total", [
+    ("/project", "fields=id,name&sort=budget&limit=7", PROJECTS),
+    ("/project", "fields=id,name&sort=-budget&limit=7", PROJECTS),
+    ("/company", "fields=id&sort=-industry_sector&limit=3", COMPANIES),
+    ("/company/1/test", "fields=id&sort=name&limit=2", TESTS_OF_COMPANY_1),
+])
+def test_async_pages_with_fields_and_sort(app, asgi_app, client, path, query, total):
+    """Paging with a sort column that isn't in 'fields' matches the Flask pages."""
+    async def pages():
+        results, next_query = [], query
+        while next_query is not None:
+            status, headers, body = await _asgi_get(asgi_app, path, next_query)
+            assert status == 200, body
+            response = client.get(f"{path}?{next_query}")
+            assert response.status_code == 200
+            assert body == response.get_json()
+            assert headers.get("x-next-cursor") == response.headers.get("X-Next-Cursor")
+
+            results += body
+            cursor = headers.get("x-next-cursor")
+            next_query = f"{query}&after={cursor}" if cursor else None
+        return results
+
+    ids = [row["id"] for row in asyncio.run(pages())]
+    assert len(set(ids)) == len(ids)
+    with app.app_context():
+        assert len(ids) == db.session.scalar(total)
+
+
+def test_async_invalid_cursor_is_rejected(asgi_app):
+    # base64 of [[1], 2]: a list where the budget should be
+    status, headers, body = asyncio.run(
+        _asgi_get(asgi_app, "/project", "sort=budget&after=W1sxXSwgMl0"))
+    assert status == 400
+    assert body["message"] == "Invalid 'after' cursor."
+
+@pytest.mark.parametrize("path,query", [
+    ("/company/1", ""),
+    ("/project/1", ""),
+    ("/project/1", "fields=id,name&expand=company"),
+    ("/test/1", "fields=id"),
+])
+def test_async_etags_match_the_flask_etags(asgi_app, client, path, query):
+    response = client.get(f"{path}?{query}")
+    etag = response.headers["ETag"]
+
+    status, headers, body = asyncio.run(_asgi_get(asgi_app, path, query))
+    assert (status, headers["etag"]) == (200, etag)
+    assert body == response.get_json()
+
+    # Each one honours the other's ETag
+    status, headers, _ = asyncio.run(_asgi_get(asgi_app, path, query,
+                                               [("If-None-Match", etag)]))
+    assert (status, headers["etag"]) == (304, etag)
+    response = client.get(f"{path}?{query}", headers={"If-None-Match": headers["etag"]})
+    assert (response.status_code, response.headers["ETag"]) == (304, etag)
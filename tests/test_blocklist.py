@@ -0,0 +1,69 @@
+# JWT revocation blocklist
+
+# Library and Package imports
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import delete
+
+# Local imports
+from init import db
+from blocklist import TokenBlocklist, _utc_from_timestamp
+from models.token_blocklist import TokenBlocklistModel
+
+
+def test_sync_loads_rows_committed_after_a_newer_row(app):
+    expires = _utc_from_timestamp(int(time.time()) + 3600)
+    now = _utc_from_timestamp(time.time())
+    with app.app_context():
+        blocklist = TokenBlocklist()
+        try:
+            db.session.add(TokenBlocklistModel(jti="newer", expires_at=expires, created_at=now))
+            db.session.commit()
+            blocklist.sync()
+            assert blocklist.is_revoked("newer")
+
+            # A row created before the sync whose transaction committed after it
+            db.session.add(TokenBlocklistModel(jti="older", expires_at=expires,
+                                               created_at=now - timedelta(seconds=5)))
+            db.session.commit()
+            blocklist.sync()
+            assert blocklist.is_revoked("older")
+        finally:
+            db.session.execute(delete(TokenBlocklistModel))
+            db.session.commit()
+
+
+def test_revoke_adds_the_token_straight_away(app):
+    with app.app_context():
+        blocklist = TokenBlocklist()
+        try:
+            blocklist.sync()
+            blocklist.revoke("revoked-here", int(time.time()) + 3600)
+            assert blocklist.is_revoked("revoked-here")
+            assert not blocklist.is_revoked("not-revoked")
+        finally:
+            db.session.execute(delete(TokenBlocklistModel))
+            db.session.commit()
+
+def test_threads_waiting_for_a_stale_blocklist_sync_it_once(app, monkeypatch):
+    blocklist = TokenBlocklist()
+    syncs = []
+
+    def slow_sync():
+        syncs.append(1)
+        time.sleep(0.05)
+        blocklist._last_sync = time.monotonic()
+
+    monkeypatch.setattr(blocklist, "_sync", slow_sync)
+
+    def check():
+        with app.app_context():
+            blocklist.is_revoked("any")
+
+    threads = [threading.Thread(target=check) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(syncs) == 1
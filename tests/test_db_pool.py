@@ -0,0 +1,37 @@
+# Connection pool metrics
+
+# Library and Package imports
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+# Local imports
+from db_pool import CHECKOUT_WAIT, timed_pool_options
+from init import db
+
+
+def _checkouts(label):
+    prefix = f'db_pool_checkout_wait_seconds_count{{bind="{label}"}} '
+    return next((int(line[len(prefix):]) for line in CHECKOUT_WAIT.render().splitlines()
+                 if line.startswith(prefix)), 0)
+
+
+def test_engines_are_created_with_a_timed_pool(app):
+    with app.app_context():
+        pool_class = type(db.engine.pool)
+        assert issubclass(pool_class, QueuePool)
+        assert pool_class is timed_pool_options(db.engine.url, "primary")["poolclass"]
+
+        before = _checkouts("primary")
+        with db.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        assert _checkouts("primary") == before + 1
+
+        # The timed class survives the pool being recreated
+        db.engine.dispose()
+        assert type(db.engine.pool) is pool_class
+
+
+def test_metrics_render_the_checkout_waits(client):
+    client.get("/project/1")
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'db_pool_checkout_wait_seconds_count{bind="primary"}' in body
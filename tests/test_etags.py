@@ -0,0 +1,109 @@
+# ETags of the company, project and test resources
+
+# Library and Package imports
+import pytest
+from sqlalchemy import select
+
+# Local imports
+import models
+from init import db
+
+
+@pytest.fixture
+def app(make_app):
+    # Writes to its own database, away from the counts of the other tests
+    return make_app(5)
+
+
+@pytest.fixture
+def link(app):
+    """A linked project and test, and a test not linked to the project."""
+    with app.app_context():
+        project_id, test_id = db.session.execute(
+            select(models.ProjectTest.project_id, models.ProjectTest.test_id).limit(1)).one()
+        project = db.session.get(models.ProjectModel, project_id)
+        linked = {test.id for test in project.tests}
+        other_id = db.session.scalar(
+            select(models.TestModel.id)
+            .where(models.TestModel.id.not_in(linked)).limit(1))
+        return {"company": project.company_id, "project": project_id,
+                "test": test_id, "other_test": other_id}
+
+
+def _etag(client, path):
+    """Return the ETag of a resource, checking it gives a 304."""
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+    return etag
+
+
+def _assert_changed(client, path, etag):
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    return response.get_json()
+
+
+def test_project_write_changes_the_embedding_etags(client, link):
+    paths = [f"/project/{link['project']}", f"/company/{link['company']}",
+             f"/test/{link['test']}"]
+    etags = [_etag(client, path) for path in paths]
+
+    response = client.patch(f"/project/{link['project']}", json={"budget": 4321.0})
+    assert response.status_code == 200
+
+    for path, etag in zip(paths, etags):
+        _assert_changed(client, path, etag)
+    assert _etag(client, paths[0]) != etags[0]
+
+
+def test_new_project_changes_the_company_etag(client, link):
+    path = f"/company/{link['company']}"
+    etag = _etag(client, path)
+
+    response = client.post("/project", json={"name": "ETag Project", "budget": 10.0,
+                                             "client": "Client", "company_id": link["company"]})
+    assert response.status_code == 201
+
+    company = _assert_changed(client, path, etag)
+    assert "ETag Project" in {project["name"] for project in company["projects"]}
+
+
+def test_bulk_insert_changes_the_company_etag(client, link):
+    path = f"/company/{link['company']}"
+    etag = _etag(client, path)
+
+    response = client.post("/project/bulk", json=[
+        {"name": f"ETag Bulk {number}", "budget": 10.0, "client": "Client",
+         "company_id": link["company"]} for number in range(3)])
+    assert response.status_code == 200
+
+    company = _assert_changed(client, path, etag)
+    assert {"ETag Bulk 0", "ETag Bulk 2"} <= {project["name"] for project in company["projects"]}
+
+
+def test_link_changes_the_project_and_test_etags(client, link):
+    project_path = f"/project/{link['project']}"
+    test_path = f"/test/{link['other_test']}"
+    etags = [_etag(client, project_path), _etag(client, test_path)]
+
+    assert client.post(f"/project/{link['project']}/test/{link['other_test']}").status_code == 201
+
+    project = _assert_changed(client, project_path, etags[0])
+    assert link["other_test"] in {test["id"] for test in project["tests"]}
+    _assert_changed(client, test_path, etags[1])
+
+
+def test_link_batch_changes_the_project_and_test_etags(client, link):
+    paths = [f"/project/{link['project']}", f"/test/{link['test']}"]
+    etags = [_etag(client, path) for path in paths]
+
+    response = client.put(f"/project/{link['project']}/tests", json={"test_ids": []})
+    assert response.status_code == 200
+
+    project = _assert_changed(client, paths[0], etags[0])
+    assert project["tests"] == []
+    test = _assert_changed(client, paths[1], etags[1])
+    assert link["project"] not in {project["id"] for project in test["projects"]}
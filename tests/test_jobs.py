@@ -0,0 +1,38 @@
+# Background company delete job
+
+# Library and Package imports
+from sqlalchemy import func, select
+
+# Local imports
+import jobs
+from init import db
+from models import JobModel, ProjectModel, TestModel
+from models.stats import verify_company_stats
+
+
+def test_company_json_and_stats_follow_a_running_delete(make_app):
+    # Its own database, as the company is deleted
+    app = make_app(4)
+    client = app.test_client()
+    with app.app_context():
+        company_id = db.session.scalar(
+            select(ProjectModel.company_id).group_by(ProjectModel.company_id)
+            .order_by(func.count().desc()).limit(1))
+    etag = client.get(f"/company/{company_id}").headers["ETag"]
+
+    # The job stopped after deleting the links, tests and projects in batches
+    with app.app_context():
+        job = JobModel(kind="delete_company", target_id=company_id, status="running",
+                       progress={}, created_at=jobs._utcnow(), updated_at=jobs._utcnow())
+        db.session.add(job)
+        db.session.commit()
+        jobs._delete_links(job, company_id, 3)
+        jobs._delete_in_batches(job, TestModel, company_id, 3)
+        jobs._delete_in_batches(job, ProjectModel, company_id, 3)
+        assert verify_company_stats() == []
+
+    response = client.get(f"/company/{company_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["projects"] == []
+    stats = client.get(f"/company/{company_id}/stats").get_json()
+    assert (stats["project_count"], stats["test_count"], stats["link_count"]) == (0, 0, 0)
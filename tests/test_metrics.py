@@ -0,0 +1,27 @@
+# Per-request timings of the metrics
+
+# Library and Package imports
+import copy
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Local imports
+import metrics
+from init import db
+
+
+def test_failed_statements_leave_nothing_on_the_connection(app):
+    with app.test_request_context("/project"):
+        metrics._start_timer()
+        with db.engine.connect() as connection:
+            info = copy.deepcopy(connection.info)
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.execute(text("SELECT * FROM missing_table"))
+            connection.execute(text("SELECT 1"))
+            assert connection.info == info
+
+        assert g._timings["queries"] == 1
+        assert g._timings["db"] > 0
@@ -0,0 +1,132 @@
+# Migrations of databases created with the first schema of the API
+
+# Library and Package imports
+import sqlite3
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Local imports
+from app import create_app
+from blocklist import TokenBlocklist
+from init import db
+
+# The tables as 'flask db create' made them before the migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE companies (id INTEGER NOT NULL, name VARCHAR(80) NOT NULL,
+    registration_number VARCHAR(80) NOT NULL, industry_sector VARCHAR(80) NOT NULL,
+    services VARCHAR(80) NOT NULL, PRIMARY KEY (id), UNIQUE (name), UNIQUE (registration_number));
+CREATE TABLE projects (id INTEGER NOT NULL, name VARCHAR(80) NOT NULL, budget FLOAT NOT NULL,
+    description VARCHAR(255), client VARCHAR(80) NOT NULL, company_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(company_id) REFERENCES companies (id));
+CREATE TABLE tests (id INTEGER NOT NULL, name VARCHAR(80) NOT NULL, description VARCHAR(200),
+    test_type VARCHAR(80), test_method VARCHAR(80), company_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(company_id) REFERENCES companies (id));
+CREATE TABLE users (id INTEGER NOT NULL, username VARCHAR(80) NOT NULL, email VARCHAR(120) NOT NULL,
+    password VARCHAR(128) NOT NULL, is_admin BOOLEAN, company_id INTEGER, PRIMARY KEY (id),
+    UNIQUE (username), UNIQUE (email), FOREIGN KEY(company_id) REFERENCES companies (id));
+CREATE TABLE projects_tests (id INTEGER NOT NULL, project_id INTEGER, test_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(project_id) REFERENCES projects (id),
+    FOREIGN KEY(test_id) REFERENCES tests (id));
+
+INSERT INTO companies VALUES (1, 'Rock Labs', 'RL-1', 'Geotechnical', 'Drilling');
+INSERT INTO companies VALUES (2, 'Soil Works', 'SW-2', 'Geotechnical', 'Sampling');
+INSERT INTO projects VALUES (1, 'Bridge Survey', 1500.0, 'Pier foundations', 'City', 1);
+INSERT INTO projects VALUES (2, 'Dam Survey', 2500.0, NULL, 'State', 1);
+INSERT INTO projects VALUES (3, 'Road Survey', 500.0, 'Cut slopes', 'County', 2);
+INSERT INTO tests VALUES (1, 'Triaxial', 'Shear strength', 'Lab', 'Consolidated drained', 1);
+INSERT INTO tests VALUES (2, 'Standard Penetration', NULL, 'Field', 'Hammer blows', 2);
+INSERT INTO projects_tests VALUES (1, 1, 1);
+INSERT INTO projects_tests VALUES (2, 3, 2);
+"""
+
+
+@pytest.fixture
+def baseline_app(tmp_path, monkeypatch):
+    """An app on a database with the baseline schema, plus the tables added since."""
+    path = tmp_path / "baseline.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.close()
+
+    monkeypatch.setenv("DATABASE_URI", f"sqlite:///{path}")
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        # Creates the missing tables only, like 'flask db create'
+        db.create_all()
+    return app
+
+
+def _run(app, *args):
+    result = app.test_cli_runner().invoke(args=["db", *args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_migrate_versions_upgrades_a_baseline_database(baseline_app):
+    client = baseline_app.test_client()
+    with pytest.raises(OperationalError, match="no such column"):
+        client.get("/project/1")
+
+    assert "Added the version column to projects" in _run(baseline_app, "migrate-versions")
+    _run(baseline_app, "stats-rebuild")
+
+    response = client.get("/project/1")
+    assert response.status_code == 200
+    assert response.headers["ETag"]
+    assert len(client.get("/project").get_json()) == 3
+    stats = client.get("/company/1/stats").get_json()
+    assert stats["total_budget"] == pytest.approx(4000.0)
+
+    assert "Row versions are up to date" in _run(baseline_app, "migrate-versions")
+
+
+def test_migrate_cascade_upgrades_a_baseline_database(baseline_app):
+    output = _run(baseline_app, "migrate-cascade")
+    assert "Migrated projects" in output and "Migrated projects_tests" in output
+    with baseline_app.app_context():
+        # The rebuilt tables get the columns added since from their defaults
+        assert db.session.execute(text("SELECT name, version FROM projects WHERE id = 1")).one() \
+            == ("Bridge Survey", 1)
+
+    assert "Added the version column to companies" in _run(baseline_app, "migrate-versions")
+    project = baseline_app.test_client().get("/project/1")
+    assert project.status_code == 200
+    assert project.get_json()["name"] == "Bridge Survey"
+    with baseline_app.app_context():
+        db.session.execute(text("DELETE FROM projects WHERE id = 1"))
+        db.session.commit()
+        assert db.session.scalar(text("SELECT count(*) FROM projects_tests")) == 1
+
+    assert "Foreign keys are up to date" in _run(baseline_app, "migrate-cascade")
+
+
+def test_migrate_cascade_reports_duplicate_projects(baseline_app):
+    with baseline_app.app_context():
+        db.session.execute(text(
+            "INSERT INTO projects VALUES (4, 'Dam Survey', 900.0, NULL, 'State', 1)"))
+        db.session.commit()
+
+    result = baseline_app.test_cli_runner().invoke(args=["db", "migrate-cascade"])
+    assert result.exit_code == 1
+    assert "Duplicate projects (first 10): company 1: 'Dam Survey' x2" in result.output
+    with baseline_app.app_context():
+        assert db.session.scalar(text("SELECT count(*) FROM projects")) == 4
+
+def test_migrate_blocklist_adds_the_creation_time(baseline_app):
+    with baseline_app.app_context():
+        db.session.execute(text("DROP TABLE token_blocklist"))
+        db.session.execute(text(
+            "CREATE TABLE token_blocklist (id INTEGER NOT NULL, jti VARCHAR(36) NOT NULL, "
+            "expires_at DATETIME NOT NULL, PRIMARY KEY (id), UNIQUE (jti))"))
+        db.session.execute(text(
+            "INSERT INTO token_blocklist VALUES (1, 'revoked', '2999-01-01 00:00:00')"))
+        db.session.commit()
+
+    assert "Added the created_at column" in _run(baseline_app, "migrate-blocklist")
+    with baseline_app.app_context():
+        blocklist = TokenBlocklist()
+        blocklist.sync()
+        assert blocklist.is_revoked("revoked")
+    assert "up to date" in _run(baseline_app, "migrate-blocklist")
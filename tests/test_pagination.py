@@ -0,0 +1,39 @@
+# Keyset pagination cursors
+
+# Library and Package imports
+import base64
+import json
+import pytest
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("query", [
+    f"sort=budget&after={_cursor([[1], 2])}",
+    f"sort=budget&after={_cursor(['a', 2])}",
+    f"sort=budget&after={_cursor([1.5, '2'])}",
+    f"sort=budget&after={_cursor([1.5, 2.5])}",
+    f"sort=budget&after={_cursor([True, 2])}",
+    f"sort=name&after={_cursor([1, 2])}",
+    f"sort=budget&after={_cursor([1.5])}",
+    "sort=budget&after=not-a-cursor",
+    "after=abc",
+])
+def test_invalid_cursor_is_rejected(client, query):
+    response = client.get(f"/project?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Invalid 'after' cursor."
+
+
+def test_sorted_pages_follow_the_cursor(client):
+    response = client.get("/project?sort=budget&limit=5")
+    cursor = response.headers["X-Next-Cursor"]
+    next_page = client.get(f"/project?sort=budget&limit=5&after={cursor}").get_json()
+    budgets = [row["budget"] for row in response.get_json() + next_page]
+    assert len(next_page) == 5
+    assert budgets == sorted(budgets)
+
+    # An integer budget in a hand-made cursor is accepted for the float column
+    assert client.get(f"/project?sort=budget&after={_cursor([0, 0])}").status_code == 200
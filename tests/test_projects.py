@@ -0,0 +1,60 @@
+# Project create and update statements
+
+# Library and Package imports
+import pytest
+from sqlalchemy import text
+
+# Local imports
+from init import db
+from models.stats import verify_company_stats
+
+NEW_PROJECT = {"name": "Test Project", "budget": 1000.0, "client": "Client", "company_id": 1}
+
+
+@pytest.fixture
+def failing_insert(app):
+    """Make every project INSERT fail with a constraint error other than the company's."""
+    with app.app_context():
+        db.session.execute(text(
+            "CREATE TRIGGER fail_project_insert BEFORE INSERT ON projects "
+            "BEGIN SELECT RAISE(ABORT, 'failed'); END"))
+        db.session.commit()
+    yield
+    with app.app_context():
+        db.session.execute(text("DROP TRIGGER fail_project_insert"))
+        db.session.commit()
+
+
+def test_create_reports_a_missing_company(client):
+    response = client.post("/project", json={**NEW_PROJECT, "company_id": 99999})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Company does not exist."
+
+
+def test_create_reports_other_constraints_on_their_own(client, failing_insert):
+    response = client.post("/project", json=NEW_PROJECT)
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "A project breaks a database constraint."
+
+    response = client.post("/project/bulk", json=[NEW_PROJECT])
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "A project breaks a database constraint."
+
+
+def test_create_rejects_duplicates(client):
+    project = {**NEW_PROJECT, "name": "Duplicate Check"}
+    assert client.post("/project", json=project).status_code == 201
+    response = client.post("/project", json=project)
+    assert response.status_code == 400
+    assert "already exists" in response.get_json()["message"]
+
+
+def test_budget_update_moves_the_company_statistics(app, client):
+    before = client.get("/company/1/stats").get_json()["total_budget"]
+    project = client.get("/project/1").get_json()
+
+    response = client.patch("/project/1", json={"budget": project["budget"] + 250})
+    assert response.status_code == 200
+    assert client.get("/company/1/stats").get_json()["total_budget"] == pytest.approx(before + 250)
+    with app.app_context():
+        assert verify_company_stats() == []
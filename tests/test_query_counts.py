@@ -0,0 +1,61 @@
+# The list and detail endpoints run a fixed number of SQL statements,
+#   however many rows they return (no N+1 queries)
+
+# Library and Package imports
+import pytest
+from sqlalchemy import event, func, select
+
+# Local imports
+from init import db
+from models.project import ProjectModel
+from models.test import TestModel
+
+SMALL, LARGE = 3, 20
+
+
+def _largest_company(app, model):
+    """ID of the company with the most rows of a model."""
+    with app.app_context():
+        return db.session.scalar(
+            select(model.company_id).group_by(model.company_id)
+            .order_by(func.count().desc(), model.company_id).limit(1))
+
+
+def _statements(app, url):
+    """Return the number of SQL statements of a GET request and its JSON body."""
+    client = app.test_client()
+    client.get(url)     # Warm up (e.g. compiled serializers)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+
+@pytest.mark.parametrize("url", [
+    "/project?limit=100",
+    "/company?limit=100",
+    "/company/{tests_company}/test?limit=100",
+    "/company/{projects_company}",
+])
+def test_statement_count_does_not_grow_with_rows(make_app, url):
+    counts, sizes = [], []
+    for scale in (SMALL, LARGE):
+        app = make_app(scale)
+        count, body = _statements(app, url.format(
+            tests_company=_largest_company(app, TestModel),
+            projects_company=_largest_company(app, ProjectModel)))
+        counts.append(count)
+        sizes.append(len(body) if isinstance(body, list) else len(body["projects"]))
+
+    assert sizes[0] != sizes[1]
+    assert counts[0] == counts[1]
@@ -0,0 +1,133 @@
+# Full-text search and the triggers keeping its index in sync
+
+# Library and Package imports
+import itertools
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+
+# Local imports
+from init import db
+from models.search_index import SEARCH_COLUMNS
+
+
+@pytest.fixture
+def app(make_app):
+    # Writes to its own database, as a company is deleted
+    return make_app(6)
+
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        token = create_access_token(identity=1, additional_claims={"is_admin": True})
+    return {"Authorization": f"Bearer {token}"}
+
+
+_companies = itertools.count(1)
+
+
+@pytest.fixture
+def company_id(client):
+    number = next(_companies)
+    response = client.post("/company", json={
+        "name": f"Search Company {number}", "registration_number": f"SC-{number}",
+        "industry_sector": "Geotechnical", "services": "Drilling"})
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def _search(client, q, **args):
+    response = client.get("/search", query_string={"q": q, **args})
+    assert response.status_code == 200
+    return response
+
+
+def _found(client, q):
+    return {(hit["type"], hit["id"]) for hit in _search(client, q).get_json()}
+
+
+def _project(api, company_id, name, **fields):
+    response = api.post("/project", json={"name": name, "budget": 100.0, "client": "Client",
+                                             "company_id": company_id, **fields})
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def _test(api, company_id, name, **fields):
+    response = api.post(f"/company/{company_id}/test", json={"name": name, **fields})
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def test_insert_update_and_delete_keep_the_index_in_sync(client, admin, company_id):
+    project_id = _project(client, company_id, "Zeolite Quarry")
+    test_id = _test(client, company_id, "Zeolite Abrasion", test_method="Los Angeles")
+    assert _found(client, "zeolite") == {("project", project_id), ("test", test_id)}
+
+    assert client.patch(f"/project/{project_id}", json={"name": "Basalt Quarry"}).status_code == 200
+    assert _found(client, "zeolite") == {("test", test_id)}
+    assert _found(client, "basalt quarry") == {("project", project_id)}
+
+    assert client.delete(f"/project/{project_id}", headers=admin).status_code == 200
+    assert client.delete(f"/test/{test_id}", headers=admin).status_code == 202
+    assert _found(client, "basalt") == set()
+    assert _found(client, "zeolite") == set()
+
+
+def test_cascaded_delete_removes_the_rows_from_the_index(app, client, company_id):
+    _project(client, company_id, "Feldspar Pit")
+    _test(client, company_id, "Feldspar Hardness")
+    assert len(_found(client, "feldspar")) == 2
+
+    with app.app_context():
+        db.session.execute(text("DELETE FROM companies WHERE id = :id"), {"id": company_id})
+        db.session.commit()
+    assert _found(client, "feldspar") == set()
+
+
+def test_name_matches_rank_first(client, company_id):
+    in_client = _project(client, company_id, "Harbour Works", client="Gneiss Holdings")
+    in_name = _project(client, company_id, "Gneiss Outcrop")
+    in_description = _project(client, company_id, "Cliff Survey",
+                              description="Weathered gneiss bands")
+
+    hits = _search(client, "gneiss").get_json()
+    assert [hit["id"] for hit in hits][0] == in_name
+    assert {hit["id"] for hit in hits} == {in_client, in_name, in_description}
+    assert hits == sorted(hits, key=lambda hit: -hit["score"])
+    assert hits[0]["project"]["name"] == "Gneiss Outcrop"
+
+
+def test_pages_follow_the_cursor(client, company_id):
+    ids = {_project(client, company_id, f"Marble Site {number}") for number in range(5)}
+
+    found, after = [], None
+    while True:
+        response = _search(client, "marble", limit=2, **({"after": after} if after else {}))
+        found += [hit["id"] for hit in response.get_json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+    assert sorted(found) == sorted(ids)
+
+    assert client.get("/search", query_string={"q": "marble", "after": "x"}).status_code == 400
+    assert client.get("/search", query_string={"q": "!!"}).status_code == 400
+
+
+def test_search_rebuild_creates_and_fills_a_missing_index(app, client, company_id):
+    project_id = _project(client, company_id, "Dolomite Ridge")
+    with app.app_context():
+        # As on a database created before the search index
+        for table in SEARCH_COLUMNS:
+            for trigger in ("insert", "delete", "update"):
+                db.session.execute(text(f"DROP TRIGGER {table.name}_fts_{trigger}"))
+            db.session.execute(text(f"DROP TABLE {table.name}_fts"))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["db", "search-rebuild"])
+    assert result.exit_code == 0, result.output
+    assert _found(client, "dolomite") == {("project", project_id)}
+
+    test_id = _test(client, company_id, "Dolomite Soundness")
+    assert _found(client, "dolomite") == {("project", project_id), ("test", test_id)}
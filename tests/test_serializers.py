@@ -0,0 +1,79 @@
+# The compiled serializers (serializers.py) return the same data as marshmallow
+
+# Library and Package imports
+import inspect
+from datetime import datetime
+import pytest
+from marshmallow import Schema
+from sqlalchemy import select
+
+# Local imports
+import schemas
+from init import db
+from models import (CompanyModel, ProjectModel, TestModel, UserModel, CompanyStatsModel,
+                    JobModel)
+from serializers import compile_schema
+
+ALL_SCHEMAS = [schema_cls for schema_cls in vars(schemas).values()
+               if inspect.isclass(schema_cls) and issubclass(schema_cls, schemas.BaseSchema)
+               and schema_cls is not schemas.BaseSchema]
+
+
+@pytest.mark.parametrize("schema_cls", ALL_SCHEMAS, ids=lambda schema_cls: schema_cls.__name__)
+def test_every_schema_compiles(schema_cls):
+    # A schema the compiler can't handle would silently fall back to marshmallow
+    assert compile_schema(schema_cls()) is not None
+
+
+def _assert_same_output(schema, rows):
+    assert schema.dump(rows, many=True) == Schema.dump(schema, rows, many=True)
+    for row in rows:
+        assert schema.dump(row) == Schema.dump(schema, row)
+    assert schema.__dict__.get("_compiled_dump"), "not compiled"
+
+
+# Schema (or sparse schema) -> model of the database rows to dump with it
+MODEL_SCHEMAS = [
+    (schemas.PlainProjectSchema, ProjectModel),
+    (schemas.ProjectSchema, ProjectModel),
+    (schemas.ProjectUpdateSchema, ProjectModel),
+    (schemas.PlainCompanySchema, CompanyModel),
+    (schemas.CompanySchema, CompanyModel),
+    (schemas.PlainTestSchema, TestModel),
+    (schemas.TestSchema, TestModel),
+    (schemas.UserSchema, UserModel),
+    (schemas.CompanyStatsSchema, CompanyStatsModel),
+    (lambda: schemas.ProjectSchema(only=("id", "name", "company")), ProjectModel),
+    (lambda: schemas.TestSchema(only=("name", "projects")), TestModel),
+]
+
+
+@pytest.mark.parametrize("schema_cls,model", MODEL_SCHEMAS)
+def test_compiled_output_matches_marshmallow_for_database_rows(app, schema_cls, model):
+    with app.app_context():
+        rows = db.session.scalars(select(model).limit(50)).all()
+        assert rows
+        _assert_same_output(schema_cls(), rows)
+
+
+def test_compiled_output_matches_marshmallow_for_other_values():
+    project = ProjectModel(id=1, name="Project", budget=10, description=None, client="Client",
+                           company=CompanyModel(id=2, name="Company", registration_number="R",
+                                                industry_sector="S", services="S"))
+    test = TestModel(id=3, name="Test", description=None, test_type=None, test_method="M")
+    now = datetime(2024, 3, 29, 10, 30)
+    samples = {
+        schemas.TestAndProjectSchema: [{"message": "Linked", "project": project, "test": test}],
+        schemas.BulkProjectResultSchema: [
+            {"index": 0, "status": "created", "project": {"id": 1, "name": "P", "budget": 1.0,
+                                                          "client": "C", "description": None}},
+            {"index": 1, "status": "error", "message": "Company does not exist."}],
+        schemas.JobSchema: [JobModel(id=1, kind="delete_company", target_id=2, status="done",
+                                     progress={"projects": 3}, created_at=now, updated_at=now,
+                                     finished_at=now)],
+        schemas.SearchResultSchema: [{"type": "project", "id": 1, "score": 1.5,
+                                      "project": project},
+                                     {"type": "test", "id": 3, "score": 0.5, "test": test}],
+    }
+    for schema_cls, rows in samples.items():
+        _assert_same_output(schema_cls(), rows)
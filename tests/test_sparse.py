@@ -0,0 +1,22 @@
+# Sparse fieldsets (?fields=) and expansion (?expand=)
+
+# Local imports
+from schemas import FieldsArgsSchema
+
+
+def test_fields_argument_is_loaded_as_fields_():
+    assert FieldsArgsSchema().load({"fields": "id,name", "expand": "company"}) \
+        == {"fields_": "id,name", "expand": "company"}
+    assert FieldsArgsSchema().load({}) == {"fields_": None, "expand": None}
+
+
+def test_fields_and_expand_limit_the_response(client):
+    project = client.get("/project/1", query_string={"fields": "id,name"}).get_json()
+    assert set(project) == {"id", "name"}
+
+    project = client.get("/project/1", query_string={"fields": "id",
+                                                     "expand": "company"}).get_json()
+    assert set(project) == {"id", "company"}
+
+    response = client.get("/project/1", query_string={"fields": "id,nope"})
+    assert response.status_code == 400
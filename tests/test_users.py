@@ -0,0 +1,49 @@
+# Token refresh and the current user lookup
+
+# Library and Package imports
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import event, select
+
+# Local imports
+from init import db
+from models import UserModel
+from user_cache import user_cache
+
+
+def _admin_id(app):
+    with app.app_context():
+        return db.session.scalar(select(UserModel.id).where(UserModel.is_admin).limit(1))
+
+
+def test_refresh_runs_no_sql(app, client):
+    user_id = _admin_id(app)
+    with app.app_context():
+        token = create_refresh_token(identity=user_id, additional_claims={"is_admin": True})
+        engine = db.engine
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/refresh", headers=headers).status_code == 200  # Syncs the blocklist
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Not even when the user isn't cached
+    user_cache.invalidate(user_id)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.post("/refresh", headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    assert statements == []
+
+
+def test_token_of_a_deleted_user_is_rejected_where_the_user_is_needed(app, client):
+    with app.app_context():
+        token = create_access_token(identity=999999, additional_claims={"is_admin": True},
+                                    fresh=True)
+    response = client.delete(f"/user/{_admin_id(app)}",
+                             headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert response.get_json()["error"] == "user_not_found"
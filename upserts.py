@@ -0,0 +1,28 @@
+# INSERT ... ON CONFLICT statements of the database's dialect
+
+# Library and Package imports
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Local imports
+from init import db
+
+# Both dialects support on_conflict_do_nothing() and on_conflict_do_update()
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def dialect_insert(model):
+    """Return an INSERT into a model's table with ON CONFLICT support:
+
+    Args:
+        model: The model (or table) to insert into.
+
+    Returns:
+        Insert: The INSERT of the primary database's dialect.
+
+    Raises:
+        NotImplementedError: If the dialect has no ON CONFLICT clause.
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f"No INSERT ... ON CONFLICT for {dialect} databases.")
+    return _INSERTS[dialect](model)
@@ -0,0 +1,98 @@
+# Current user lookup cache
+
+# Library and Package imports
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, g
+from flask_jwt_extended import get_jwt, get_jwt_header, get_jwt_identity
+from flask_jwt_extended.exceptions import UserLookupError
+from sqlalchemy import event
+
+# Local imports
+from init import db
+from models.user import UserModel
+from routing import use_primary
+
+
+# Read-only copy of a user record. ORM instances are tied to the session of
+# the request that loaded them, so they can't be shared between requests.
+CachedUser = namedtuple("CachedUser", ["id", "username", "email", "is_admin", "company_id"])
+
+
+class UserCache:
+    """Bounded LRU cache of user records with a time to live:
+
+    Used by current_cached_user() so the user of an authenticated request
+    is usually resolved without any SQL. The cache holds at most
+    USER_CACHE_SIZE users for USER_CACHE_TTL seconds each, and an entry is
+    dropped as soon as that user is updated or deleted through the ORM.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()   # user id -> (expires at, CachedUser)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the CachedUser for a user ID, or None if it doesn't exist."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        # From the primary, or a stale row from a replica would be cached
+        with use_primary():
+            user = db.session.get(UserModel, user_id)
+        if user is None:
+            return None
+
+        record = CachedUser(user.id, user.username, user.email,
+                            bool(user.is_admin), user.company_id)
+        ttl = current_app.config.get("USER_CACHE_TTL", 60)
+        max_size = current_app.config.get("USER_CACHE_SIZE", 1024)
+        with self._lock:
+            self._entries[user_id] = (now + ttl, record)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+        return record
+
+    def invalidate(self, user_id):
+        """Drop a user from the cache."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+# Cache shared by the whole process
+user_cache = UserCache()
+
+
+def current_cached_user():
+    """Return the user of the request's JWT:
+
+    Only the views that need the user call this, rather than a JWT
+    user_lookup_loader resolving it on every @jwt_required() route, so
+    routes that only need the token (e.g. /refresh) never look it up even
+    when its cache entry has expired. The user is kept in 'g' for the rest
+    of the request.
+
+    Returns:
+        CachedUser: The user.
+
+    Raises:
+        UserLookupError: If the user no longer exists, answered with a 401 by
+                         the JWT user_lookup_error_loader (see create_app).
+    """
+    if "current_user" not in g:
+        g.current_user = user_cache.get(get_jwt_identity())
+    if g.current_user is None:
+        raise UserLookupError("The user of this token no longer exists.",
+                              get_jwt_header(), get_jwt())
+    return g.current_user
+
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)